@@ -6,7 +6,28 @@ import plotly.express as px
 import plotly.graph_objects as go
 from PIL import Image
 import numpy as np
+import queue
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as ScoringTimeout
+from churnshield.drift import DriftMonitor, load_reference, uncollected_features
+from churnshield.scoring import risk_band
+from churnshield.customer_index import load_index
+from churnshield.features import encode_frame
+from churnshield.neighbors import load_neighbor_index
+from churnshield.percentile import load_distribution, scoring_version
+from churnshield.thresholds import load_thresholds
+from churnshield.calibration import load_calibrator
+from churnshield.performance import PerformanceMonitor, holdout_baseline
+from churnshield.slices import load_slices
+from churnshield.shadow import ShadowScorer, latest_candidate, summary as shadow_summary
+from churnshield.db import connect
+from churnshield.model import model_version
+from churnshield.dispatch import CAMPAIGNS, enqueue_campaign
+from churnshield.roi import OFFERS, TARGETS, portfolio, simulate, targeted
+from churnshield.clv import HORIZON_MONTHS, customer_value, load_clv
+from churnshield.survival import conditional, load_survival
+from churnshield.executor import ScoringExecutor
+from churnshield.sharedcache import SharedCache
 
 # Load model and features
 @st.cache_resource
@@ -19,6 +40,184 @@ def load_model():
 
 model, feature_names = load_model()
 
+# Calibration table fitted on the notebook's held-out split
+@st.cache_resource
+def load_calibration():
+    return load_calibrator()
+
+calibrator = load_calibration()
+
+# Live data-drift histograms, shared by every session
+@st.cache_resource
+def load_drift_monitor():
+    # The sidebar does not collect MultipleLines, so its flags can't be compared.
+    monitor = DriftMonitor(load_reference(), exclude=uncollected_features(feature_names))
+    monitor.seed_from_db()
+    return monitor
+
+drift_monitor = load_drift_monitor()
+
+# Memory-mapped customer ID index (built from data.csv on first run)
+@st.cache_resource
+def load_customer_index():
+    return load_index()
+
+customer_index = load_customer_index()
+
+# Similar-customer vector index over data.csv
+@st.cache_resource
+def load_similar_customers():
+    return load_neighbor_index()
+
+neighbor_index = load_similar_customers()
+
+# Portfolio score distribution for the current model version
+@st.cache_resource
+def load_score_distribution():
+    return load_distribution()
+
+score_distribution = load_score_distribution()
+
+# Risk cutoffs tuned for this model version (0.7/0.4 until tuned)
+@st.cache_resource
+def load_risk_thresholds():
+    return load_thresholds()
+
+high_threshold, medium_threshold = load_risk_thresholds()
+
+# Every session scores through one bounded queue instead of its own OpenMP team
+@st.cache_resource
+def load_scoring_executor():
+    return ScoringExecutor(model, feature_names, calibrator)
+
+scoring_executor = load_scoring_executor()
+
+# Predictions and attributions shared with the other dashboard processes
+@st.cache_resource
+def load_shared_cache():
+    return SharedCache(), scoring_version(), model_version()
+
+shared_cache, served_scoring_version, served_model_version = load_shared_cache()
+
+def explain(vector):
+    """Per-feature contributions for one encoded vector, via the shared cache.
+
+    Misses are computed on the scoring executor's workers, not on the session thread.
+    """
+    contribs = shared_cache.get_attributions(served_model_version, vector)
+    if contribs is None:
+        contribs = scoring_executor.contributions(vector)
+        shared_cache.put_attributions(served_model_version, vector, contribs)
+    return contribs
+
+# Live performance against recorded churn outcomes
+@st.cache_resource
+def load_performance_monitor():
+    return PerformanceMonitor(high_threshold, medium_threshold,
+                              baseline=holdout_baseline(high_threshold, calibrator))
+
+performance_monitor = load_performance_monitor()
+# New outcomes are read at most every POLL_INTERVAL seconds, by whichever session reruns first
+performance_monitor.poll_if_due()
+
+# Per-segment metrics on the notebook's held-out split
+@st.cache_resource
+def load_segment_metrics():
+    return load_slices()
+
+segment_metrics = load_segment_metrics()
+
+# Newest registry candidate scores live traffic in the background
+@st.cache_resource
+def load_shadow_scorer():
+    candidate = latest_candidate()
+    if candidate is None:
+        return None
+    return ShadowScorer(candidate, feature_names, model_version(), high_threshold, medium_threshold)
+
+shadow_scorer = load_shadow_scorer()
+
+# The agreement summary is an aggregate over the whole table; refresh it at most once a minute
+@st.cache_data(ttl=60)
+def load_shadow_summary():
+    conn = connect()
+    try:
+        return shadow_summary(conn)
+    finally:
+        conn.close()
+
+# Campaign enqueues run off the script thread so a slow DB never stalls a rerun
+@st.cache_resource
+def load_campaign_executor():
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix='campaigns')
+
+campaign_executor = load_campaign_executor()
+
+# Lifetime value of every customer, cached per scoring version
+@st.cache_resource
+def load_customer_value():
+    return load_clv()
+
+customer_value_table = load_customer_value()
+
+# Kaplan-Meier time-to-churn curves per Contract x InternetService x PaymentMethod
+@st.cache_resource
+def load_survival_curves():
+    return load_survival()
+
+survival_table = load_survival_curves()
+
+# Scored customer book for the retention ROI simulator
+@st.cache_resource
+def load_retention_portfolio():
+    return portfolio()
+
+retention_probs, retention_monthly, retention_bands = load_retention_portfolio()
+
+@st.cache_data
+def simulate_offer(offer, target, scenarios):
+    mask = targeted(retention_bands, target)
+    return simulate(retention_probs[mask], retention_monthly[mask], offer, scenarios)
+
+def queue_campaign_button(risk_level):
+    templates = ", ".join(t.replace('_', ' ') for t in CAMPAIGNS[risk_level])
+    # Campaigns are addressed by customer ID, so only stored customers can be queued.
+    record = customer_index.lookup(customer_id)
+    if st.button(f"📨 Queue retention campaign ({templates})", disabled=record is None):
+        campaign_executor.submit(enqueue_campaign, record['customerID'], risk_level,
+                                 {'churn_prob': float(churn_prob)})
+        st.success(f"Campaign queued for {record['customerID']}; the dispatch worker will send it.")
+    if record is None:
+        st.caption(f"\"{customer_id}\" is not a stored customer ID; pick one from the sidebar to queue a campaign.")
+
+# Sidebar defaults live in session state so stored profiles can overwrite them
+for key, value in {'tenure': 12, 'monthly_charges': 70, 'total_charges': 1000,
+                   'paperless_billing': True, 'phone_service': True}.items():
+    st.session_state.setdefault(key, value)
+
+def prefill_profile(record):
+    """Copy a stored customer record into the sidebar widgets' session state."""
+    state = st.session_state
+    state['gender'] = record['gender']
+    state['senior_citizen'] = record['SeniorCitizen'] == '1'
+    state['partner'] = record['Partner'] == 'Yes'
+    state['dependents'] = record['Dependents'] == 'Yes'
+    state['tenure'] = int(min(max(record['tenure'], 0), 72))
+    state['monthly_charges'] = int(min(max(round(record['MonthlyCharges']), 18), 120))
+    total = record['TotalCharges'] if record['TotalCharges'] == record['TotalCharges'] else 0
+    state['total_charges'] = int(min(max(round(total), 0), 9000))
+    state['paperless_billing'] = record['PaperlessBilling'] == 'Yes'
+    state['phone_service'] = record['PhoneService'] == 'Yes'
+    state['contract'] = record['Contract']
+    state['internet_service'] = record['InternetService']
+    state['online_security'] = record['OnlineSecurity']
+    state['online_backup'] = record['OnlineBackup']
+    state['device_protection'] = record['DeviceProtection']
+    state['tech_support'] = record['TechSupport']
+    state['streaming_tv'] = record['StreamingTV']
+    state['streaming_movies'] = record['StreamingMovies']
+    state['payment_method'] = record['PaymentMethod']
+
 # Page configuration
 st.set_page_config(
     page_title="ChurnShield AI",
@@ -330,51 +529,65 @@ with st.sidebar:
     
     # Customer ID and basic info
     customer_id = st.text_input("Customer ID/Name", "Mohd Shami")
+    
+    # Autocomplete stored customers and prefill their profile
+    matches = customer_index.complete(customer_id)
+    if matches:
+        selected_id = st.selectbox("Matching customers", ["—"] + matches)
+        if selected_id != "—" and st.session_state.get('loaded_customer') != selected_id:
+            record = customer_index.lookup(selected_id)
+            if record:
+                prefill_profile(record)
+                st.session_state['loaded_customer'] = selected_id
+        if selected_id != "—":
+            customer_id = selected_id
     join_date = st.date_input("Join Date", datetime.now() - timedelta(days=365))
     
     st.subheader("Demographics")
     col1, col2 = st.columns(2)
     with col1:
-        gender = st.radio("Gender", ("Male", "Female", "Other"))
+        gender = st.radio("Gender", ("Male", "Female", "Other"), key="gender")
     with col2:
-        senior_citizen = st.checkbox("Senior Citizen")
+        senior_citizen = st.checkbox("Senior Citizen", key="senior_citizen")
     
-    partner = st.checkbox("Has Partner")
-    dependents = st.checkbox("Has Dependents")
+    partner = st.checkbox("Has Partner", key="partner")
+    dependents = st.checkbox("Has Dependents", key="dependents")
     
     st.subheader("Account Details")
-    tenure = st.slider('Tenure (months)', 0, 72, 12)
-    monthly_charges = st.slider('Monthly Charges ($)', 18, 120, 70)
-    total_charges = st.slider('Total Charges ($)', 0, 9000, 1000)
+    tenure = st.slider('Tenure (months)', 0, 72, key='tenure')
+    monthly_charges = st.slider('Monthly Charges ($)', 18, 120, key='monthly_charges')
+    total_charges = st.slider('Total Charges ($)', 0, 9000, key='total_charges')
     
     col1, col2 = st.columns(2)
     with col1:
-        paperless_billing = st.checkbox("Paperless Billing", value=True)
+        paperless_billing = st.checkbox("Paperless Billing", key="paperless_billing")
     with col2:
-        phone_service = st.checkbox("Phone Service", value=True)
+        phone_service = st.checkbox("Phone Service", key="phone_service")
     
     st.subheader("Service Details")
-    contract = st.selectbox("Contract Type", ("Month-to-month", "One year", "Two year"))
-    internet_service = st.selectbox("Internet Service", ("Fiber optic", "DSL", "No"))
+    contract = st.selectbox("Contract Type", ("Month-to-month", "One year", "Two year"), key="contract")
+    internet_service = st.selectbox("Internet Service", ("Fiber optic", "DSL", "No"), key="internet_service")
     
     st.markdown("**Additional Services**")
-    online_security = st.selectbox("Online Security", ("Yes", "No", "No internet service"))
-    online_backup = st.selectbox("Online Backup", ("Yes", "No", "No internet service"))
-    device_protection = st.selectbox("Device Protection", ("Yes", "No", "No internet service"))
-    tech_support = st.selectbox("Tech Support", ("Yes", "No", "No internet service"))
-    streaming_tv = st.selectbox("Streaming TV", ("Yes", "No", "No internet service"))
-    streaming_movies = st.selectbox("Streaming Movies", ("Yes", "No", "No internet service"))
+    online_security = st.selectbox("Online Security", ("Yes", "No", "No internet service"), key="online_security")
+    online_backup = st.selectbox("Online Backup", ("Yes", "No", "No internet service"), key="online_backup")
+    device_protection = st.selectbox("Device Protection", ("Yes", "No", "No internet service"), key="device_protection")
+    tech_support = st.selectbox("Tech Support", ("Yes", "No", "No internet service"), key="tech_support")
+    streaming_tv = st.selectbox("Streaming TV", ("Yes", "No", "No internet service"), key="streaming_tv")
+    streaming_movies = st.selectbox("Streaming Movies", ("Yes", "No", "No internet service"), key="streaming_movies")
     
     st.subheader("Payment Details")
     payment_method = st.selectbox("Payment Method", 
                                 ("Electronic check", "Mailed check", 
-                                 "Bank transfer (automatic)", "Credit card (automatic)"))
+                                 "Bank transfer (automatic)", "Credit card (automatic)"),
+                                key="payment_method")
     
     st.markdown("---")
     st.markdown("🔍 Adjust the parameters and see the prediction update in real-time.")
     
     # Add a save profile button
-    if st.button("💾 Save Profile"):
+    save_profile = st.button("💾 Save Profile")
+    if save_profile:
         st.success("Profile saved successfully!")
 
 # Prepare input data
@@ -428,31 +641,87 @@ def prepare_input():
             
     return pd.DataFrame([input_data])[feature_names]
 
-# Make prediction
+# Raw profile in data.csv's column layout (MultipleLines isn't collected)
+def sidebar_record():
+    return {
+        'gender': gender, 'SeniorCitizen': 1 if senior_citizen else 0,
+        'Partner': "Yes" if partner else "No", 'Dependents': "Yes" if dependents else "No",
+        'tenure': tenure, 'PhoneService': "Yes" if phone_service else "No", 'MultipleLines': None,
+        'InternetService': internet_service, 'OnlineSecurity': online_security,
+        'OnlineBackup': online_backup, 'DeviceProtection': device_protection,
+        'TechSupport': tech_support, 'StreamingTV': streaming_tv, 'StreamingMovies': streaming_movies,
+        'Contract': contract, 'PaperlessBilling': "Yes" if paperless_billing else "No",
+        'PaymentMethod': payment_method, 'MonthlyCharges': monthly_charges, 'TotalCharges': total_charges,
+    }
+
+def is_new_prediction(kind, vector):
+    """Whether this session hasn't yet handled ``vector`` for ``kind``.
+
+    Streamlit reruns the script on every widget interaction; this keeps
+    per-prediction side effects to one per distinct profile.
+    """
+    key = f'last_{kind}'
+    digest = np.asarray(vector, dtype=np.float32).tobytes()
+    if st.session_state.get(key) == digest:
+        return False
+    st.session_state[key] = digest
+    return True
+
+# Make prediction: (probability, exact); approximate scores are never cached or shadowed
 def predict_churn(input_df):
-    dtest = xgb.DMatrix(input_df)
-    return model.predict(dtest)[0]
+    vector = input_df.to_numpy(dtype=np.float32)[0]
+    churn_prob = shared_cache.get_probability(served_scoring_version, vector)
+    exact = churn_prob is not None
+    if not exact:
+        try:
+            churn_prob, exact = scoring_executor.score(vector)
+        except ScoringTimeout:
+            churn_prob = scoring_executor.approximate(vector)
+        if exact:
+            shared_cache.put_probability(served_scoring_version, vector, churn_prob)
+    if exact and shadow_scorer is not None and is_new_prediction('shadow', vector):
+        shadow_scorer.submit(vector, churn_prob)
+    return churn_prob, exact
 
 # Main tabs
+# The sidebar profile encoded like data.csv, for the drift monitor and similar-customer search
+profile_vector = encode_frame(pd.DataFrame([sidebar_record()]), feature_names)[0]
+
 tab1, tab2, tab3 = st.tabs(["📊 Prediction", "📈 Analytics", "🛡️ Retention"])
 
 with tab1:
     input_df = prepare_input()
-    churn_prob = predict_churn(input_df)
+    churn_prob, exact = predict_churn(input_df)
+    if not exact:
+        st.warning("⚠️ **Approximate score.** Scoring is busy, so this probability comes from a "
+                   "partial model and can differ from the full one; portfolio rank and customer "
+                   "value are hidden until an exact score is available on a later rerun.")
+    # Monitor the profile encoded like the reference, once per new prediction
+    if is_new_prediction('drift', profile_vector):
+        drift_monitor.update(profile_vector)
+    if exact:
+        portfolio_rank = score_distribution.rank(churn_prob)
+        if save_profile:
+            score_distribution.add(churn_prob)
+        value = customer_value(monthly_charges, tenure, total_charges, churn_prob)
+        rank_html = f"<p>Riskier than <strong>{portfolio_rank * 100:.0f}%</strong> of our customers</p>"
+        value_html = (f"<p>Expected value ({HORIZON_MONTHS} mo): <strong>${value['remaining']:,.0f}</strong></p>"
+                      f"<p>Revenue at risk: <strong>${value['at_risk']:,.0f}</strong></p>")
+    else:
+        rank_html = "<p style=\"color: #ff9800;\">Approximate score: portfolio rank unavailable</p>"
+        value_html = ""
     
     # Risk assessment
-    if churn_prob > 0.7:
-        risk_level = "HIGH"
+    risk_level = risk_band(churn_prob, high_threshold, medium_threshold)
+    if risk_level == "HIGH":
         risk_class = "risk-high"
         gauge_color = "#f44336"
         risk_description = "Immediate action required"
-    elif churn_prob > 0.4:
-        risk_level = "MEDIUM"
+    elif risk_level == "MEDIUM":
         risk_class = "risk-medium"
         gauge_color = "#ff9800"
         risk_description = "Proactive measures recommended"
     else:
-        risk_level = "LOW"
         risk_class = "risk-low"
         gauge_color = "#4CAF50"
         risk_description = "Normal monitoring"
@@ -463,7 +732,7 @@ with tab1:
         value = churn_prob * 100,
         number = {'suffix': "%", 'font': {'size': 40}},
         domain = {'x': [0, 1], 'y': [0, 1]},
-        title = {'text': "Churn Probability", 'font': {'size': 24}},
+        title = {'text': "Churn Probability" if exact else "Churn Probability (approximate)", 'font': {'size': 24}},
         gauge = {
             'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': "white"},
             'bar': {'color': gauge_color},
@@ -471,9 +740,9 @@ with tab1:
             'borderwidth': 2,
             'bordercolor': "gray",
             'steps': [
-                {'range': [0, 40], 'color': '#4CAF50'},
-                {'range': [40, 70], 'color': '#FFC107'},
-                {'range': [70, 100], 'color': '#F44336'}],
+                {'range': [0, medium_threshold * 100], 'color': '#4CAF50'},
+                {'range': [medium_threshold * 100, high_threshold * 100], 'color': '#FFC107'},
+                {'range': [high_threshold * 100, 100], 'color': '#F44336'}],
             'threshold': {
                 'line': {'color': "white", 'width': 4},
                 'thickness': 0.75,
@@ -498,12 +767,67 @@ with tab1:
             <div class="card-title">Risk Assessment</div>
             <p style="font-size: 1.5em; margin-bottom: 5px;" class="{risk_class}">{risk_level} RISK</p>
             <p style="color: #aaa; margin-bottom: 15px;">{risk_description}</p>
+            {rank_html}
             <p style="font-size: 1.2em;">Customer ID: <strong>{customer_id}</strong></p>
             <p>Tenure: <strong>{tenure} months</strong></p>
             <p>Monthly Charges: <strong>${monthly_charges}</strong></p>
+            {value_html}
         </div>
         """, unsafe_allow_html=True)
     
+    # Expected time to churn
+    st.markdown("### ⏳ Expected Survival")
+    segment_curve = survival_table.curve(contract, internet_service, payment_method)
+    months_ahead = np.arange(25)
+    segment_survival = conditional(segment_curve, tenure, 24)
+    customer_survival = conditional(segment_curve, tenure, 24, prob=churn_prob)
+    below_half = np.flatnonzero(customer_survival <= 0.5)
+    
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        st.metric("Still a customer in 12 months", f"{customer_survival[12] * 100:.0f}%")
+        st.metric("Median months to churn", f"{below_half[0]}" if len(below_half) else "24+")
+        st.caption(f"Segment: {contract} · {internet_service} · {payment_method}")
+    with col2:
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=months_ahead, y=segment_survival, name='Segment (Kaplan-Meier)',
+                                 line=dict(color='#90CAF9', dash='dash')))
+        fig.add_trace(go.Scatter(x=months_ahead, y=customer_survival, name='This customer',
+                                 line=dict(color=gauge_color, width=3)))
+        fig.update_layout(
+            height=300,
+            xaxis_title='Months from now',
+            yaxis_title='Survival probability',
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color="white"),
+            xaxis=dict(showgrid=False),
+            yaxis=dict(showgrid=False, range=[0, 1.05])
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    
+    # Similar historical customers
+    st.markdown("### 👥 Similar Customers")
+    neighbor_ids, neighbor_churn, neighbor_dist = neighbor_index.search(profile_vector, k=10)
+    
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        st.metric("Observed churn among 10 most similar", f"{neighbor_churn.mean() * 100:.0f}%")
+        st.metric("Model churn probability", f"{churn_prob * 100:.0f}%")
+    with col2:
+        neighbors = []
+        for cid, churned, dist in zip(neighbor_ids, neighbor_churn, neighbor_dist):
+            record = customer_index.lookup(cid) or {}
+            neighbors.append({
+                'Customer ID': cid,
+                'Tenure': record.get('tenure'),
+                'Contract': record.get('Contract'),
+                'Monthly Charges': record.get('MonthlyCharges'),
+                'Churned': "Yes" if churned else "No",
+                'Distance': round(float(dist), 2),
+            })
+        st.dataframe(pd.DataFrame(neighbors), use_container_width=True, hide_index=True)
+    
     # Key factors
     st.markdown("### 🔍 Key Factors Influencing Prediction")
     feature_impact = {
@@ -562,6 +886,18 @@ with tab1:
         *Note: Impact scores are relative measures of how much each factor contributes to the 
         overall churn probability in this specific prediction.*
         """)
+    
+    with st.expander("🧮 Model Attributions (SHAP)", expanded=False):
+        try:
+            contribs = explain(input_df.to_numpy(dtype=np.float32)[0])
+        except (ScoringTimeout, queue.Full):
+            contribs = None
+            st.info("Scoring is busy: attributions will be shown on the next rerun.")
+        if contribs is not None:
+            top = np.argsort(-np.abs(contribs))[:8]
+            attribution_df = pd.DataFrame({'Feature': np.array(feature_names)[top],
+                                           'Contribution (log-odds)': contribs[top].round(3)})
+            st.dataframe(attribution_df, use_container_width=True, hide_index=True)
 
 with tab2:
     st.header("📈 Customer Analytics")
@@ -616,6 +952,34 @@ with tab2:
         - Limited additional services
         """)
     
+    # Revenue at risk
+    st.markdown("### 💵 Revenue at Risk")
+    st.markdown(f"""
+    Expected revenue over the next {HORIZON_MONTHS} months given each customer's churn probability,
+    and the revenue churn puts at risk compared with keeping every customer for the whole horizon.
+    """)
+    
+    value_totals = customer_value_table.totals()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Expected portfolio revenue", f"${value_totals['remaining'].sum():,.0f}")
+    col2.metric("Revenue at risk", f"${value_totals['at_risk'].sum():,.0f}")
+    col3.metric("At risk in HIGH band", f"${value_totals.loc['HIGH', 'at_risk']:,.0f}")
+    
+    fig = px.bar(value_totals.reset_index(), x='band', y=['remaining', 'at_risk'],
+                 labels={'band': 'Risk band', 'value': 'Revenue ($)', 'variable': ''},
+                 color_discrete_sequence=['#4CAF50', '#F44336'])
+    fig.update_layout(
+        height=350,
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color="white"),
+        xaxis=dict(showgrid=False),
+        yaxis=dict(showgrid=False)
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    with st.expander("📋 Customers with the most revenue at risk", expanded=False):
+        st.dataframe(customer_value_table.top_at_risk().round(2), use_container_width=True, hide_index=True)
+    
     # Churn trends
     st.markdown("### 📉 Churn Trends Analysis")
     
@@ -650,11 +1014,134 @@ with tab2:
     )
     
     st.plotly_chart(fig, use_container_width=True)
+    
+    # Data drift
+    st.markdown("### 🌊 Data Drift Monitor")
+    st.markdown(f"""
+    Scored profiles compared with the training data ({drift_monitor.n} records since startup).
+    PSI above 0.25 or KS above 0.2 raises an alert.
+    """)
+    
+    drift_df = pd.DataFrame(drift_monitor.report())
+    drift_alerts = drift_df[drift_df['status'] == 'alert']
+    if len(drift_alerts):
+        st.error(f"⚠️ Drift detected in {len(drift_alerts)} features: " + ", ".join(drift_alerts['feature']))
+    elif drift_monitor.n:
+        st.success("✅ No significant drift detected")
+    
+    fig = px.bar(drift_df.head(15), x='psi', y='feature', orientation='h',
+                 color='status',
+                 color_discrete_map={'stable': '#4CAF50', 'warning': '#FFC107',
+                                     'alert': '#f44336', 'insufficient data': '#888888'},
+                 labels={'psi': 'Population Stability Index', 'feature': ''})
+    
+    fig.update_layout(
+        height=450,
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color="white"),
+        xaxis=dict(showgrid=False),
+        yaxis=dict(showgrid=False, autorange='reversed')
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    with st.expander("📋 Per-feature drift statistics", expanded=False):
+        st.dataframe(drift_df.round(4), use_container_width=True)
+
+    # Live model performance
+    st.markdown("### 🎯 Live Model Performance")
+    st.markdown(f"""
+    Stored predictions joined with recorded churn outcomes ({performance_monitor.n} labeled so far),
+    in windows of {performance_monitor.window} labels. HIGH-band precision or recall falling more than
+    10 points below the held-out baseline raises an alert.
+    """)
+    
+    live_auc = performance_monitor.auc()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Labeled predictions", f"{performance_monitor.n:,}")
+    col2.metric("Live AUC (binned)", "—" if live_auc is None else f"{live_auc:.3f}")
+    col3.metric("Baseline HIGH precision / recall",
+                f"{performance_monitor.baseline['precision']:.0%} / {performance_monitor.baseline['recall']:.0%}")
+    
+    performance_alerts = performance_monitor.alerts()
+    for alert in performance_alerts:
+        st.error(f"⚠️ {alert['metric'].replace('_', ' ').title()} is {alert['value']:.0%} "
+                 f"(baseline {alert['baseline']:.0%}, last {alert['labels']} labels)")
+    if performance_monitor.n and not performance_alerts:
+        st.success("✅ Live precision and recall are in line with the baseline")
+    
+    performance_df = pd.DataFrame(performance_monitor.report())
+    if performance_monitor.n:
+        windows_df = performance_df[~performance_df['window'].isin(['open', 'all'])]
+        if len(windows_df):
+            fig = px.line(windows_df, x='window', y=['high_precision', 'high_recall'], markers=True,
+                          labels={'value': 'HIGH band', 'window': 'Label window', 'variable': ''})
+            fig.update_layout(
+                height=350,
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)',
+                font=dict(color="white"),
+                xaxis=dict(showgrid=False),
+                yaxis=dict(showgrid=False, range=[0, 1])
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        with st.expander("📋 Per-window confusion-matrix statistics", expanded=False):
+            st.dataframe(performance_df.round(3), use_container_width=True)
+    else:
+        st.info("No churn outcomes recorded yet.")
+
+    # Segment performance
+    st.markdown("### 🧩 Performance by Segment")
+    st.markdown("""
+    Accuracy, recall and calibration of the current model on the held-out test split,
+    broken down by customer segment and pairwise segment crosses.
+    """)
+    st.caption(f"Precision and recall of the HIGH-risk flag (probability > {segment_metrics['cutoff'].iloc[0]:.1%}).")
+    
+    slicing = st.selectbox("Segment by", segment_metrics['slicing'].unique().tolist())
+    slice_df = segment_metrics[segment_metrics['slicing'] == slicing].drop(columns=['slicing', 'cutoff'])
+    
+    fig = px.bar(slice_df.melt(id_vars='segment', value_vars=['accuracy', 'recall']),
+                 x='value', y='segment', color='variable', barmode='group', orientation='h',
+                 labels={'value': '', 'segment': '', 'variable': ''})
+    fig.update_layout(
+        height=max(300, 40 * len(slice_df)),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color="white"),
+        xaxis=dict(showgrid=False, range=[0, 1]),
+        yaxis=dict(showgrid=False)
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(slice_df.round(3), use_container_width=True, hide_index=True)
+
+    # Shadow candidate
+    st.markdown("### 👥 Shadow Candidate Model")
+    shadow_rows = load_shadow_summary()
+    if shadow_scorer is not None:
+        st.markdown(f"Candidate `{shadow_scorer.version}` is scoring live traffic next to the served model.")
+    if shadow_rows:
+        latest = shadow_rows[0]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Shadowed records", f"{latest['records']:,}")
+        col2.metric("Agreement rate", f"{latest['agreement_rate']:.1%}")
+        col3.metric("Band flips", f"{latest['band_flip_rate']:.1%}")
+        if latest['flips']:
+            flips_df = pd.DataFrame(list(latest['flips'].items()), columns=['flip', 'records'])
+            st.dataframe(flips_df.sort_values('records', ascending=False),
+                         use_container_width=True, hide_index=True)
+        with st.expander("📋 All shadowed candidates", expanded=False):
+            st.dataframe(pd.DataFrame(shadow_rows).drop(columns='flips').round(4),
+                         use_container_width=True, hide_index=True)
+    else:
+        st.info("No candidate model has been shadowed yet.")
 
 with tab3:
     st.header("🛡️ Retention Strategies")
     
-    if churn_prob > 0.7:
+    if risk_level == "HIGH":
         st.error("### 🚨 High Risk Customer - Immediate Action Required")
         st.markdown("""
         <div class="card">
@@ -683,7 +1170,9 @@ with tab3:
                 for action in actions:
                     st.write(f"- {action}")
         
-    elif churn_prob > 0.4:
+        queue_campaign_button("HIGH")
+        
+    elif risk_level == "MEDIUM":
         st.warning("### 🟠 Medium Risk Customer - Proactive Measures")
         st.markdown("""
         <div class="card">
@@ -707,6 +1196,8 @@ with tab3:
         4. **Week 4**: Make retention offer based on engagement
         """)
         
+        queue_campaign_button("MEDIUM")
+        
     else:
         st.success("### ✅ Low Risk Customer - Maintain Engagement")
         st.markdown("""
@@ -731,6 +1222,40 @@ with tab3:
         - **Case study** development
         """)
     
+    st.markdown("---")
+    st.markdown("### 💰 Retention ROI Simulator")
+    st.markdown("""
+    Monte Carlo simulation of sending an offer to a whole risk segment of the customer book:
+    churn outcomes, win-backs and the offer's uncertain save rate are redrawn in every scenario.
+    """)
+    
+    col1, col2, col3 = st.columns(3)
+    offer = col1.selectbox("Offer", list(OFFERS), format_func=lambda key: OFFERS[key]['label'])
+    target = col2.selectbox("Target segment", list(TARGETS))
+    scenarios = col3.select_slider("Scenarios", options=[1_000, 5_000, 10_000, 20_000], value=10_000)
+    roi_result = simulate_offer(offer, target, scenarios)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Customers targeted", f"{roi_result['customers']:,}")
+    col2.metric("Median net value", f"${roi_result['net_p50']:,.0f}")
+    col3.metric("Median ROI", f"{roi_result['roi_p50']:.0%}")
+    col4.metric("P(net > 0)", f"{roi_result['p_positive']:.0%}")
+    
+    fig = px.histogram(x=roi_result['net'], nbins=60, labels={'x': 'Net value ($)'})
+    for q, label in [('net_p5', 'P5'), ('net_p50', 'P50'), ('net_p95', 'P95')]:
+        fig.add_vline(x=roi_result[q], line_dash='dash', line_color='#FFC107', annotation_text=label)
+    fig.update_layout(
+        height=350,
+        showlegend=False,
+        yaxis_title='Scenarios',
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color="white"),
+        xaxis=dict(showgrid=False),
+        yaxis=dict(showgrid=False)
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    
     st.markdown("---")
     st.markdown("### 📚 Retention Playbook")
     st.write("""
@@ -0,0 +1 @@
+"""ChurnShield AI back-end helpers shared by the Streamlit dashboard and batch jobs."""
@@ -0,0 +1,157 @@
+"""Batch scoring of customer files.
+
+Files are read in chunks, encoded with the notebook's preprocessing and
+scored with the saved booster; ``--from-store`` skips the encoding and reads
+the feature store's precomputed vectors instead.  Once encoded, customer
+files contain many identical rows (one-hot flags plus a handful of price
+plans), so each chunk is collapsed to its distinct rows before calling the
+booster and the scores are scattered back through the inverse index.
+
+    python -m churnshield.batch data.csv -o scored.parquet --factors
+    python -m churnshield.batch data.csv --from-store
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from churnshield.calibration import load_calibrator
+from churnshield.featurestore import load_store
+from churnshield.features import DATA_PATH, encode_frame, load_feature_names
+from churnshield.model import contributions, load_booster, predict
+from churnshield.scoring import BANDS, band_codes
+from churnshield.thresholds import load_thresholds
+from churnshield.writer import ScoredWriter
+
+CHUNK_SIZE = 100_000
+TOP_FACTORS = 3
+
+# Fixed odd multipliers for the row hash; one per feature column.
+_HASH_MULTIPLIERS = np.random.default_rng(0x5EED).integers(1, 2**63, size=256, dtype=np.uint64) | np.uint64(1)
+
+
+def row_hashes(X):
+    """64-bit hash of every row of a float32 matrix, computed from the raw bits."""
+    bits = np.ascontiguousarray(X, dtype=np.float32).view(np.uint32).astype(np.uint64)
+    mult = _HASH_MULTIPLIERS[:X.shape[1]]
+    with np.errstate(over='ignore'):
+        h = bits * mult
+        # Mix each column's contribution before folding so permuted rows differ.
+        h ^= h >> np.uint64(29)
+        return np.bitwise_xor.reduce(h * mult, axis=1)
+
+
+def unique_rows(X):
+    """Distinct rows of ``X`` as ``(unique_X, inverse)`` with ``unique_X[inverse] == X``."""
+    _, first, inverse = np.unique(row_hashes(X), return_index=True, return_inverse=True)
+    unique_X = X[first]
+    # Hash collisions are astronomically unlikely, but results must be exact.
+    if not np.array_equal(unique_X[inverse], X, equal_nan=True):
+        rows = np.ascontiguousarray(X).view(np.dtype((np.void, X.dtype.itemsize * X.shape[1])))
+        _, first, inverse = np.unique(rows.ravel(), return_index=True, return_inverse=True)
+        unique_X = X[first]
+    return unique_X, inverse.ravel()
+
+
+def score_matrix(booster, X, feature_names, dedup=True, calibrator=None):
+    """Churn probabilities for an encoded matrix, plus dedup statistics."""
+    if dedup and len(X):
+        unique_X, inverse = unique_rows(X)
+        probs = predict(booster, unique_X, feature_names)[inverse]
+    else:
+        unique_X = X
+        probs = predict(booster, X, feature_names)
+    if calibrator is not None:
+        probs = calibrator.apply(probs)
+    return probs, {'rows': len(X), 'unique': len(unique_X)}
+
+
+def top_factors(booster, X, feature_names, k=TOP_FACTORS):
+    """Names of the ``k`` features pushing each row's churn score up the most, ``;``-joined."""
+    contribs = contributions(booster, X, feature_names)
+    top = np.argsort(-contribs, axis=1)[:, :k]
+    names = np.array(feature_names, dtype=object)
+    positive = np.take_along_axis(contribs, top, axis=1) > 0
+    return np.array(['; '.join(names[idx[keep]]) for idx, keep in zip(top, positive)], dtype=object)
+
+
+def score_file(path, booster=None, feature_names=None, chunksize=CHUNK_SIZE,
+               dedup=True, bands_only=False, factors=False):
+    """Yield ``(chunk_result, stats)`` per chunk of a customer CSV.
+
+    ``chunk_result`` holds ``customerID``, ``churn_prob`` (omitted in
+    ``bands_only`` mode), ``risk_level`` and, with ``factors``, the
+    ``top_factors`` behind each score.
+    """
+    if feature_names is None:
+        feature_names = load_feature_names()
+    chunks = ((chunk['customerID'].to_numpy(), encode_frame(chunk, feature_names))
+              for chunk in pd.read_csv(path, chunksize=chunksize))
+    return score_chunks(chunks, booster, feature_names, dedup, bands_only, factors)
+
+
+def score_store(store, booster=None, chunksize=CHUNK_SIZE, dedup=True, bands_only=False, factors=False):
+    """``score_file`` over a feature store's precomputed vectors (customerID order)."""
+    return score_chunks(store.chunks(chunksize), booster, store.feature_names, dedup, bands_only, factors)
+
+
+def score_chunks(chunks, booster=None, feature_names=None, dedup=True, bands_only=False, factors=False):
+    """Score ``(customer_ids, X)`` chunks; see ``score_file``."""
+    if feature_names is None:
+        feature_names = load_feature_names()
+    if booster is None:
+        booster = load_booster()
+    high, medium = load_thresholds()
+    calibrator = load_calibrator()
+
+    for ids, X in chunks:
+        result = pd.DataFrame({'customerID': ids})
+        unique_X, inverse = unique_rows(X) if dedup and len(X) else (X, np.arange(len(X)))
+        probs = calibrator.apply(predict(booster, unique_X, feature_names))[inverse]
+        if not bands_only:
+            result['churn_prob'] = probs
+        result['risk_level'] = BANDS[band_codes(probs, high, medium)]
+        if factors:
+            result['top_factors'] = top_factors(booster, unique_X, feature_names)[inverse]
+        yield result, {'rows': len(X), 'unique': len(unique_X)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a customer CSV with the churn model')
+    parser.add_argument('data', nargs='?', default=DATA_PATH)
+    parser.add_argument('-o', '--output', help='.parquet, .csv.gz or .csv file for the scored rows')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--no-dedup', action='store_true', help='score every row, even duplicates')
+    parser.add_argument('--bands-only', action='store_true', help='only output risk bands, not probabilities')
+    parser.add_argument('--factors', action='store_true', help='add the top contributing features per row')
+    parser.add_argument('--from-store', action='store_true',
+                        help='score the feature store\'s precomputed vectors for this file')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = unique = 0
+    writer = ScoredWriter(args.output) if args.output else None
+    try:
+        options = {'chunksize': args.chunksize, 'dedup': not args.no_dedup,
+                   'bands_only': args.bands_only, 'factors': args.factors}
+        if args.from_store:
+            results = score_store(load_store(args.data), **options)
+        else:
+            results = score_file(args.data, **options)
+        for result, stats in results:
+            rows += stats['rows']
+            unique += stats['unique']
+            if writer:
+                writer.write(result)
+    finally:
+        if writer:
+            writer.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"Scored {rows:,} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    print(f"Distinct encoded rows: {unique:,} (dedup ratio {rows / max(unique, 1):.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
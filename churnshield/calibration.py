@@ -0,0 +1,222 @@
+"""Probability calibration stored as a piecewise-linear lookup table.
+
+The booster was trained on imbalanced data, so its raw outputs are not
+calibrated probabilities.  A calibration map (isotonic via pool-adjacent-
+violators, or Platt scaling) is fitted offline on held-out labeled data and
+exported as a small table of ``(raw, calibrated)`` knots tied to the model
+version and clipped to ``[PROB_FLOOR, 1 - PROB_FLOOR]``, so no score is ever
+certain.  The reported calibration error is cross-fitted: every fold is
+calibrated by a table fitted on the other folds.  Applying it is a single
+``np.interp`` over any number of scores.
+
+    python -m churnshield.calibration fit data.csv --notebook-split
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from churnshield import registry
+from churnshield.features import DATA_PATH, MODEL_PATH, load_feature_names, read_reference
+from churnshield.model import load_booster, model_version, predict
+
+CALIBRATION_PATH = 'app/model/calibration.json'
+PLATT_KNOTS = 201
+PROB_FLOOR = 1e-3
+FOLDS = 5
+SEED = 42
+
+
+def fit_isotonic(scores, y):
+    """Non-decreasing step fit by pool-adjacent-violators, as ``(x, y)`` knots."""
+    order = np.argsort(scores, kind='stable')
+    s, t = np.asarray(scores, dtype=np.float64)[order], np.asarray(y, dtype=np.float64)[order]
+    # Blocks: [sum of labels, count, first score, last score]
+    sums, counts, lo, hi = [], [], [], []
+    for score, label in zip(s, t):
+        sums.append(label)
+        counts.append(1.0)
+        lo.append(score)
+        hi.append(score)
+        while len(sums) > 1 and sums[-2] / counts[-2] >= sums[-1] / counts[-1]:
+            total, n, last = sums.pop(), counts.pop(), hi.pop()
+            lo.pop()
+            sums[-1] += total
+            counts[-1] += n
+            hi[-1] = last
+    level = np.array(sums) / np.array(counts)
+    x = np.column_stack([lo, hi]).ravel()
+    y_out = np.repeat(level, 2)
+    keep = np.r_[True, np.diff(x) > 0]
+    return x[keep], y_out[keep]
+
+
+def fit_platt(scores, y, iterations=50):
+    """Logistic fit on the raw logit, sampled into ``PLATT_KNOTS`` knots."""
+    p = np.clip(np.asarray(scores, dtype=np.float64), 1e-6, 1 - 1e-6)
+    z = np.log(p / (1 - p))
+    t = np.asarray(y, dtype=np.float64)
+    a, b = 1.0, 0.0
+    for _ in range(iterations):
+        q = 1 / (1 + np.exp(-(a * z + b)))
+        w = q * (1 - q) + 1e-12
+        grad = np.array([np.sum((q - t) * z), np.sum(q - t)])
+        hess = np.array([[np.sum(w * z * z), np.sum(w * z)], [np.sum(w * z), np.sum(w)]])
+        step = np.linalg.solve(hess + 1e-9 * np.eye(2), grad)
+        a, b = a - step[0], b - step[1]
+        if np.abs(step).max() < 1e-10:
+            break
+    x = np.linspace(0, 1, PLATT_KNOTS)
+    xz = np.log(np.clip(x, 1e-6, 1 - 1e-6) / (1 - np.clip(x, 1e-6, 1 - 1e-6)))
+    return x, 1 / (1 + np.exp(-(a * xz + b)))
+
+
+def fit_calibrator(scores, y, method='isotonic'):
+    """Fit a calibration table with its endpoints kept off 0 and 1."""
+    x, fitted = fit_isotonic(scores, y) if method == 'isotonic' else fit_platt(scores, y)
+    return Calibrator(x, np.clip(fitted, PROB_FLOOR, 1 - PROB_FLOOR), method)
+
+
+def cross_fit(scores, y, method='isotonic', folds=FOLDS, seed=SEED):
+    """Out-of-fold calibrated scores: each fold mapped by a table fitted on the others.
+
+    Folds are stratified by label.  These are the scores to evaluate a
+    calibration method on; the table that is saved is fitted on everything.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    y = np.asarray(y)
+    rng = np.random.default_rng(seed)
+    fold = np.empty(len(y), dtype=np.int64)
+    for label in np.unique(y):
+        idx = rng.permutation(np.flatnonzero(y == label))
+        fold[idx] = np.arange(len(idx)) % folds
+    out = np.empty(len(y), dtype=np.float64)
+    for k in range(folds):
+        test = fold == k
+        if test.any():
+            out[test] = fit_calibrator(scores[~test], y[~test], method).apply(scores[test])
+    return out
+
+
+class Calibrator:
+    """Monotone piecewise-linear map from raw booster output to calibrated probability."""
+
+    def __init__(self, x=None, y=None, method='identity'):
+        self.x = None if x is None else np.asarray(x, dtype=np.float64)
+        self.y = None if y is None else np.asarray(y, dtype=np.float64)
+        self.method = method
+
+    @property
+    def identity(self):
+        return self.x is None
+
+    @property
+    def version(self):
+        if self.identity:
+            return None
+        return hashlib.sha256(self.x.tobytes() + self.y.tobytes()).hexdigest()[:8]
+
+    def apply(self, scores):
+        if self.identity:
+            return scores
+        calibrated = np.interp(scores, self.x, self.y)
+        return calibrated.astype(np.float32) if np.ndim(calibrated) else float(calibrated)
+
+    def save(self, version, path=CALIBRATION_PATH):
+        with open(path, 'w') as f:
+            json.dump({'model_version': version, 'method': self.method,
+                       'x': self.x.tolist(), 'y': self.y.tolist()}, f)
+
+
+def load_calibrator(path=CALIBRATION_PATH, model_path=MODEL_PATH, registry_dir=registry.REGISTRY_DIR):
+    """Calibration for the model at ``model_path``, or the identity map.
+
+    ``path`` is used when it was fitted for that model, else the model's
+    own table in the registry.
+    """
+    version = model_version(model_path)
+    for candidate in (path, registry.table_path(version, os.path.basename(CALIBRATION_PATH), registry_dir)):
+        if os.path.exists(candidate):
+            with open(candidate) as f:
+                table = json.load(f)
+            if table.get('model_version') == version:
+                return Calibrator(table['x'], table['y'], table['method'])
+    return Calibrator()
+
+
+def scoring_version(model_path=MODEL_PATH, registry_dir=registry.REGISTRY_DIR):
+    """Model version, suffixed with the calibration table's version when one applies."""
+    version = model_version(model_path)
+    calibration = load_calibrator(model_path=model_path, registry_dir=registry_dir).version
+    return f'{version}-{calibration}' if calibration else version
+
+
+def reliability(scores, y, bins=10):
+    """Mean predicted vs observed churn per score decile, and expected calibration error."""
+    edges = np.quantile(scores, np.linspace(0, 1, bins + 1))
+    idx = np.clip(np.searchsorted(edges, scores, side='right') - 1, 0, bins - 1)
+    counts = np.bincount(idx, minlength=bins)
+    predicted = np.bincount(idx, weights=scores, minlength=bins) / np.maximum(counts, 1)
+    observed = np.bincount(idx, weights=y, minlength=bins) / np.maximum(counts, 1)
+    ece = float(np.sum(counts * np.abs(predicted - observed)) / max(counts.sum(), 1))
+    return predicted, observed, ece
+
+
+def notebook_split(data_path=DATA_PATH, feature_names=None):
+    """The held-out 30% of customer_churn.ipynb as ``(df, X, y)``.
+
+    Repeats the notebook's preprocessing and its stratified
+    ``train_test_split(test_size=0.3, random_state=42)``; ``df`` holds the
+    matching raw rows.
+    """
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    from churnshield.features import encode_frame
+
+    if feature_names is None:
+        feature_names = load_feature_names()
+    df = pd.read_csv(data_path)
+    df = df[pd.to_numeric(df['TotalCharges'], errors='coerce').notna()].reset_index(drop=True)
+    X = encode_frame(df, feature_names)
+    y = (df['Churn'] == 'Yes').to_numpy(dtype=np.int8)
+    _, test = train_test_split(np.arange(len(df)), test_size=0.3, random_state=42, stratify=y)
+    return df.iloc[test].reset_index(drop=True), X[test], y[test]
+
+
+def notebook_holdout(data_path=DATA_PATH, feature_names=None):
+    """The held-out 30% of customer_churn.ipynb as ``(X, y)``."""
+    _, X, y = notebook_split(data_path, feature_names)
+    return X, y
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit a calibration table on held-out labeled data')
+    parser.add_argument('command', choices=['fit'])
+    parser.add_argument('data', nargs='?', default=DATA_PATH)
+    parser.add_argument('--method', choices=['isotonic', 'platt'], default='isotonic')
+    parser.add_argument('--notebook-split', action='store_true',
+                        help="use only the notebook's held-out 30%% of the file")
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    feature_names = load_feature_names()
+    if args.notebook_split:
+        X, y = notebook_holdout(args.data, feature_names)
+    else:
+        _, X, y = read_reference(args.data, feature_names)
+    scores = predict(load_booster(), X, feature_names).astype(np.float64)
+    calibrator = fit_calibrator(scores, y, args.method)
+
+    print(f"{args.method}: {len(calibrator.x)} knots, range [{calibrator.y[0]:.4f}, {calibrator.y[-1]:.4f}]")
+    print(f"ECE before: {reliability(scores, y)[2]:.4f}  "
+          f"after ({FOLDS}-fold cross-fitted): {reliability(cross_fit(scores, y, args.method), y)[2]:.4f}")
+    if not args.dry_run:
+        calibrator.save(model_version())
+        print(f"Saved to {CALIBRATION_PATH}")
+
+
+if __name__ == '__main__':
+    main()
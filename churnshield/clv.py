@@ -0,0 +1,202 @@
+"""Customer lifetime value over the scored portfolio.
+
+A customer's calibrated churn probability is read as the chance they leave
+within ``PERIOD_MONTHS`` (the ``VALUE_MONTHS`` year the retention economics
+already use), i.e. a constant monthly hazard ``h = 1 - (1 - p) ** (1 / PERIOD_MONTHS)``,
+so the chance they are still billed ``t`` months from now is ``(1 - h) ** t``.
+Expected remaining value is the discounted sum of ``MonthlyCharges`` over
+``HORIZON_MONTHS`` under that survival; revenue at risk is what the same
+customer would bring if retained for the whole horizon, minus that
+expectation.  Lifetime value adds the revenue already billed
+(``TotalCharges``, or ``tenure * MonthlyCharges`` where it is missing).
+
+The portfolio table is computed from the feature store chunk by chunk and
+cached per scoring version in ``app/index/clv/``; it is rebuilt when the
+customer file changes.
+
+    python -m churnshield.clv build
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from churnshield.batch import score_matrix
+from churnshield.calibration import load_calibrator
+from churnshield.features import DATA_PATH, MODEL_PATH
+from churnshield.featurestore import CHUNK_SIZE, STORE_DIR, load_store
+from churnshield.model import load_booster
+from churnshield.percentile import scoring_version
+from churnshield.scoring import BANDS, band_codes
+from churnshield.thresholds import VALUE_MONTHS, load_thresholds
+
+CLV_DIR = 'app/index/clv'
+HORIZON_MONTHS = 60
+PERIOD_MONTHS = VALUE_MONTHS
+# Monthly discount rate, about 12.7% a year.
+MONTHLY_DISCOUNT = 0.01
+COLUMNS = ('ids', 'probs', 'bands', 'historical', 'remaining', 'at_risk')
+
+
+def _annuity(ratio, horizon):
+    """``sum(ratio ** t for t in 1..horizon)``, elementwise."""
+    ratio = np.asarray(ratio, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total = ratio * (1 - ratio ** horizon) / (1 - ratio)
+    return np.where(np.isclose(ratio, 1.0), float(horizon), total)
+
+
+def monthly_hazard(probs, period=PERIOD_MONTHS):
+    """Constant monthly churn hazard implied by a ``period``-month churn probability."""
+    probs = np.clip(np.asarray(probs, dtype=np.float64), 0.0, 1.0)
+    return 1 - (1 - probs) ** (1 / period)
+
+
+def expected_value(monthly, probs, horizon=HORIZON_MONTHS, discount=MONTHLY_DISCOUNT):
+    """``(remaining, at_risk)``: expected discounted revenue and the part churn puts at risk."""
+    monthly = np.asarray(monthly, dtype=np.float64)
+    hazard = monthly_hazard(probs)
+    remaining = monthly * _annuity((1 - hazard) / (1 + discount), horizon)
+    retained = monthly * _annuity(np.full_like(hazard, 1 / (1 + discount)), horizon)
+    return remaining, retained - remaining
+
+
+def customer_value(monthly, tenure, total, prob, horizon=HORIZON_MONTHS, discount=MONTHLY_DISCOUNT):
+    """Lifetime value breakdown for one customer, as shown on the dashboard."""
+    remaining, at_risk = expected_value([monthly], [prob], horizon, discount)
+    historical = total if total == total and total > 0 else tenure * monthly
+    return {'historical': float(historical), 'remaining': float(remaining[0]),
+            'at_risk': float(at_risk[0]), 'lifetime': float(historical + remaining[0])}
+
+
+class CLVTable:
+    """Per-customer value columns for the whole portfolio, sorted by customerID."""
+
+    def __init__(self, ids, probs, bands, historical, remaining, at_risk, meta):
+        self.ids = ids
+        self.probs = probs
+        self.bands = bands
+        self.historical = historical
+        self.remaining = remaining
+        self.at_risk = at_risk
+        self.meta = meta
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lookup(self, customer_id):
+        """Value breakdown for a stored customer, or None."""
+        key = np.asarray([customer_id], dtype=self.ids.dtype)
+        pos = int(np.searchsorted(self.ids, key)[0])
+        if pos >= len(self) or self.ids[pos] != key[0]:
+            return None
+        return {'historical': float(self.historical[pos]), 'remaining': float(self.remaining[pos]),
+                'at_risk': float(self.at_risk[pos]),
+                'lifetime': float(self.historical[pos] + self.remaining[pos])}
+
+    def totals(self):
+        """Customers, remaining value and revenue at risk per risk band."""
+        frame = pd.DataFrame({'band': BANDS[np.asarray(self.bands)],
+                              'customers': 1,
+                              'remaining': np.asarray(self.remaining),
+                              'at_risk': np.asarray(self.at_risk)})
+        by_band = frame.groupby('band')[['customers', 'remaining', 'at_risk']].sum()
+        return by_band.reindex(BANDS[::-1]).fillna(0)
+
+    def top_at_risk(self, n=20):
+        order = np.argsort(-np.asarray(self.at_risk))[:n]
+        return pd.DataFrame({'customerID': self.ids[order].astype(str),
+                             'churn_prob': np.asarray(self.probs[order]),
+                             'risk_level': BANDS[self.bands[order]],
+                             'remaining': np.asarray(self.remaining[order]),
+                             'at_risk': np.asarray(self.at_risk[order])})
+
+    def save(self, path):
+        tmp = path + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name in COLUMNS:
+            np.save(os.path.join(tmp, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        columns = [np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in COLUMNS]
+        return cls(*columns, meta)
+
+
+def clv_path(version, directory=CLV_DIR):
+    return os.path.join(directory, version)
+
+
+def build_clv(data_path=DATA_PATH, model_path=MODEL_PATH, store_dir=STORE_DIR, directory=CLV_DIR,
+              horizon=HORIZON_MONTHS, discount=MONTHLY_DISCOUNT, chunksize=CHUNK_SIZE):
+    """Score the feature store chunk by chunk and cache the value table for this scoring version."""
+    store = load_store(data_path, store_dir)
+    booster = load_booster(model_path)
+    calibrator = load_calibrator(model_path=model_path)
+    high, medium = load_thresholds(model_path=model_path)
+    column = {name: store.feature_names.index(name) for name in ('tenure', 'MonthlyCharges', 'TotalCharges')}
+
+    parts = {name: [] for name in COLUMNS[1:]}
+    for start in range(0, len(store), chunksize):
+        X = np.asarray(store.X[start:start + chunksize])
+        probs, _ = score_matrix(booster, X, store.feature_names, calibrator=calibrator)
+        tenure = np.nan_to_num(X[:, column['tenure']]).astype(np.float64)
+        monthly = np.nan_to_num(X[:, column['MonthlyCharges']]).astype(np.float64)
+        total = X[:, column['TotalCharges']].astype(np.float64)
+        remaining, at_risk = expected_value(monthly, probs, horizon, discount)
+        parts['probs'].append(probs.astype(np.float32))
+        parts['bands'].append(band_codes(probs, high, medium).astype(np.int8))
+        parts['historical'].append(np.where(np.isnan(total) | (total <= 0), tenure * monthly, total))
+        parts['remaining'].append(remaining)
+        parts['at_risk'].append(at_risk)
+
+    version = scoring_version(model_path)
+    meta = {'version': version, 'horizon': horizon, 'discount': discount, 'rows': len(store),
+            'source_size': store.meta['source_size'], 'source_mtime': store.meta['source_mtime']}
+    table = CLVTable(np.asarray(store.ids), *(np.concatenate(parts[name]) for name in COLUMNS[1:]), meta)
+    os.makedirs(directory, exist_ok=True)
+    table.save(clv_path(version, directory))
+    return CLVTable.load(clv_path(version, directory))
+
+
+def load_clv(data_path=DATA_PATH, model_path=MODEL_PATH, store_dir=STORE_DIR, directory=CLV_DIR):
+    """The value table for the current scoring version and customer file, built on first use."""
+    path = clv_path(scoring_version(model_path), directory)
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        table = CLVTable.load(path)
+        stat = os.stat(data_path)
+        if ((table.meta['source_size'], table.meta['source_mtime']) == (stat.st_size, stat.st_mtime)
+                and (table.meta['horizon'], table.meta['discount']) == (HORIZON_MONTHS, MONTHLY_DISCOUNT)):
+            return table
+    return build_clv(data_path, model_path, store_dir, directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Customer lifetime value over the scored portfolio')
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('data', nargs='?', default=DATA_PATH)
+    parser.add_argument('--horizon', type=int, default=HORIZON_MONTHS, help='months of future revenue')
+    parser.add_argument('--discount', type=float, default=MONTHLY_DISCOUNT, help='monthly discount rate')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = build_clv(args.data, horizon=args.horizon, discount=args.discount)
+    print(f"{len(table):,} customers valued in {time.perf_counter() - start:.2f}s "
+          f"-> {clv_path(table.meta['version'])}")
+    print(table.totals().round(0).to_string())
+    print(f"revenue at risk over {args.horizon} months: ${float(np.sum(table.at_risk)):,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Risk-band crossing detector between scoring snapshots.
+
+Joins the ``previous`` and ``current`` rescoring snapshots by customerID
+and emits an event for every customer whose band rose into HIGH.  Both
+snapshots are sorted by customerID and memory-mapped, so the join is a
+block-wise sorted merge: each block of the current snapshot binary-searches
+only the matching range of the previous one, and memory stays bounded by
+``BLOCK_SIZE`` whatever the customer count.  Events are streamed into the
+``crossing_outbox`` table one block per transaction; re-running the same
+pair of snapshots inserts nothing new.
+
+    python -m churnshield.crossings
+"""
+import argparse
+import time
+
+import numpy as np
+
+from churnshield.db import DB_PATH, connect
+from churnshield.rescore import SNAPSHOT_DIR, load_snapshot
+from churnshield.scoring import BANDS
+
+BLOCK_SIZE = 1_000_000
+HIGH = int(np.flatnonzero(BANDS == 'HIGH')[0])
+
+
+def crossings(previous, current, target=HIGH, block_size=BLOCK_SIZE):
+    """Yield ``(current_rows, previous_rows)`` position arrays of customers crossing into ``target``."""
+    for start in range(0, len(current), block_size):
+        stop = min(start + block_size, len(current))
+        ids = current.ids[start:stop]
+        bands = np.asarray(current.bands[start:stop])
+        candidates = np.flatnonzero(bands == target)
+        if not len(candidates):
+            continue
+        # Only the slice of ``previous`` that can hold this block's IDs.
+        lo = int(np.searchsorted(previous.ids, ids[0], side='left'))
+        hi = int(np.searchsorted(previous.ids, ids[-1], side='right'))
+        if lo == hi:
+            continue
+        prev_ids = previous.ids[lo:hi]
+        keys = ids[candidates]
+        pos = np.minimum(np.searchsorted(prev_ids, keys), len(prev_ids) - 1)
+        found = prev_ids[pos] == keys
+        rows, prev_rows = candidates[found], lo + pos[found]
+        rose = np.asarray(previous.bands[prev_rows]) < target
+        if rose.any():
+            yield start + rows[rose], prev_rows[rose]
+
+
+def emit(conn, previous, current, target=HIGH, block_size=BLOCK_SIZE):
+    """Stream crossing events into the outbox; return ``(detected, inserted)``."""
+    run = f'{current.version}@{current.created_at}'
+    detected = inserted = 0
+    for rows, prev_rows in crossings(previous, current, target, block_size):
+        events = zip(current.ids[rows].astype(str).tolist(),
+                     BANDS[np.asarray(previous.bands[prev_rows])].tolist(),
+                     BANDS[np.asarray(current.bands[rows])].tolist(),
+                     np.asarray(previous.probs[prev_rows], dtype=np.float64).tolist(),
+                     np.asarray(current.probs[rows], dtype=np.float64).tolist())
+        before = conn.total_changes
+        conn.executemany('''INSERT OR IGNORE INTO crossing_outbox
+                            (customer_id, from_band, to_band, previous_prob, churn_prob, run)
+                            VALUES (?, ?, ?, ?, ?, ?)''',
+                         ((cid, fb, tb, pp, p, run) for cid, fb, tb, pp, p in events))
+        conn.commit()
+        detected += len(rows)
+        inserted += conn.total_changes - before
+    return detected, inserted
+
+
+def pending(conn, limit=100):
+    return conn.execute('''SELECT id, customer_id, from_band, to_band, previous_prob, churn_prob, created_at
+                           FROM crossing_outbox WHERE status = 'pending'
+                           ORDER BY id LIMIT ?''', (limit,)).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Emit band-crossing events between scoring snapshots')
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--snapshots', default=SNAPSHOT_DIR)
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE)
+    args = parser.parse_args()
+
+    previous = load_snapshot('previous', args.snapshots)
+    current = load_snapshot('current', args.snapshots)
+    if previous is None or current is None:
+        parser.exit(1, 'Need two rescoring snapshots; run churnshield.rescore twice first\n')
+    start = time.perf_counter()
+    conn = connect(args.db)
+    try:
+        detected, inserted = emit(conn, previous, current, block_size=args.block_size)
+    finally:
+        conn.close()
+    print(f"{len(previous):,} -> {len(current):,} customers: {detected:,} crossed into HIGH, "
+          f"{inserted:,} new outbox events ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""On-disk customer index for instant profile lookup and ID autocomplete.
+
+The index is built once from the customer file and stored as two ``.npy``
+files that are memory-mapped on load: the customer IDs as a sorted
+fixed-width byte array, and the raw profile fields as a structured array in
+the same order (categoricals as uint8 codes, numerics as float32).  Exact
+and prefix lookups are binary searches, so nothing is scanned per rerun.
+
+    python -m churnshield.customer_index build data.csv
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from churnshield.features import DATA_PATH, NUMERIC_COLS
+
+INDEX_DIR = 'app/index'
+CHUNK_SIZE = 500_000
+CATEGORICAL_COLS = ['gender', 'SeniorCitizen', 'Partner', 'Dependents', 'PhoneService',
+                    'MultipleLines', 'InternetService', 'OnlineSecurity', 'OnlineBackup',
+                    'DeviceProtection', 'TechSupport', 'StreamingTV', 'StreamingMovies',
+                    'Contract', 'PaperlessBilling', 'PaymentMethod', 'Churn']
+
+
+def build_index(data_path=DATA_PATH, index_dir=INDEX_DIR, chunksize=CHUNK_SIZE):
+    """Encode the customer file into the sorted, memory-mappable index."""
+    stat = os.stat(data_path)
+    ids, parts = [], []
+    categories = {col: [] for col in CATEGORICAL_COLS}
+    for chunk in pd.read_csv(data_path, chunksize=chunksize, dtype={'SeniorCitizen': str}):
+        ids.append(chunk['customerID'].to_numpy(dtype=str))
+        part = {}
+        for col in CATEGORICAL_COLS:
+            if col not in chunk:
+                continue
+            values = chunk[col].fillna('').astype(str)
+            for value in pd.unique(values):
+                if value not in categories[col]:
+                    categories[col].append(value)
+            lookup = {value: code for code, value in enumerate(categories[col])}
+            part[col] = values.map(lookup).to_numpy(dtype=np.uint8)
+        for col in NUMERIC_COLS:
+            part[col] = pd.to_numeric(chunk[col], errors='coerce').to_numpy(dtype=np.float32)
+        parts.append(part)
+
+    ids = np.concatenate(ids)
+    order = np.argsort(ids, kind='stable')
+    columns = [col for col in CATEGORICAL_COLS if categories[col]] + NUMERIC_COLS
+    dtype = [(col, np.uint8) for col in columns if col not in NUMERIC_COLS] + \
+            [(col, np.float32) for col in NUMERIC_COLS]
+    records = np.empty(len(ids), dtype=dtype)
+    for col in columns:
+        records[col] = np.concatenate([part[col] for part in parts])[order]
+
+    # A rebuild replaces files other processes may have memory-mapped, so
+    # each is written aside and swapped in; meta.json goes last.
+    os.makedirs(index_dir, exist_ok=True)
+    for name, array in (('ids.npy', ids[order].astype(np.bytes_)), ('records.npy', records)):
+        path = os.path.join(index_dir, name)
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, array)
+        os.replace(path + '.tmp', path)
+    meta_path = os.path.join(index_dir, 'meta.json')
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump({'source': data_path, 'source_size': stat.st_size, 'source_mtime': stat.st_mtime,
+                   'rows': int(len(ids)),
+                   'categories': {col: values for col, values in categories.items() if values}}, f)
+    os.replace(meta_path + '.tmp', meta_path)
+    return len(ids)
+
+
+class CustomerIndex:
+    """Memory-mapped view of a built index."""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.ids = np.load(os.path.join(index_dir, 'ids.npy'), mmap_mode='r')
+        self.records = np.load(os.path.join(index_dir, 'records.npy'), mmap_mode='r')
+        with open(os.path.join(index_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.categories = self.meta['categories']
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _key(self, text):
+        return text.strip().upper().encode()
+
+    def complete(self, prefix, limit=10):
+        """Up to ``limit`` customer IDs starting with ``prefix``, in sorted order."""
+        key = self._key(prefix)
+        if not key:
+            return []
+        lo = np.searchsorted(self.ids, key, side='left')
+        hi = np.searchsorted(self.ids, key + b'\xff', side='left')
+        return [i.decode() for i in self.ids[lo:min(hi, lo + limit)]]
+
+    def lookup(self, customer_id):
+        """Raw profile fields for one customer (as in the source file), or None."""
+        key = self._key(customer_id)
+        pos = np.searchsorted(self.ids, key)
+        if pos >= len(self.ids) or self.ids[pos] != key:
+            return None
+        row = self.records[pos]
+        record = {'customerID': key.decode()}
+        for col in self.records.dtype.names:
+            if col in self.categories:
+                record[col] = self.categories[col][int(row[col])]
+            else:
+                record[col] = round(float(row[col]), 2)
+        return record
+
+
+def is_current(index_dir=INDEX_DIR, data_path=DATA_PATH):
+    """Whether the index was built from ``data_path`` as it is now on disk."""
+    try:
+        with open(os.path.join(index_dir, 'meta.json')) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return False
+    stat = os.stat(data_path)
+    return meta.get('source_size') == stat.st_size and meta.get('source_mtime') == stat.st_mtime
+
+
+def load_index(index_dir=INDEX_DIR, data_path=DATA_PATH):
+    """Open the index, building it from ``data_path`` on first use or when the file changed."""
+    if not is_current(index_dir, data_path):
+        build_index(data_path, index_dir)
+    return CustomerIndex(index_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the customer ID index')
+    parser.add_argument('command', choices=['build', 'lookup', 'complete'])
+    parser.add_argument('arg', nargs='?', default=DATA_PATH, help='data file for build, ID or prefix otherwise')
+    parser.add_argument('--index-dir', default=INDEX_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        n = build_index(args.arg, args.index_dir)
+        print(f"Indexed {n:,} customers into {args.index_dir}")
+    elif args.command == 'lookup':
+        print(CustomerIndex(args.index_dir).lookup(args.arg))
+    else:
+        print('\n'.join(CustomerIndex(args.index_dir).complete(args.arg)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""Access to churn_prediction.db shared by the monitoring and training jobs.
+
+The app's original ``users`` and ``predictions`` tables are left as they
+are; tables added here are created on demand.  ``outcomes`` holds the
+current label per prediction and ``outcome_log`` every recorded label in
+arrival order, which is what incremental readers key on.  ``prediction_data`` holds
+packed feature vectors (see ``churnshield.packing``); rows written as JSON
+before that are still read, and ``migrate`` converts them.
+
+    python -m churnshield.db migrate
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from churnshield.features import load_feature_names
+from churnshield.packing import decode_many, pack
+
+DB_PATH = 'churn_prediction.db'
+MIGRATE_BATCH = 5000
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS outcomes
+                 (prediction_id INTEGER PRIMARY KEY,
+                  churned INTEGER NOT NULL,
+                  observed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  FOREIGN KEY(prediction_id) REFERENCES predictions(id))''',
+    '''CREATE TABLE IF NOT EXISTS outcome_log
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  prediction_id INTEGER NOT NULL,
+                  churned INTEGER NOT NULL,
+                  observed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+    # Outcomes recorded before the log existed arrive once, oldest first.
+    '''INSERT INTO outcome_log (prediction_id, churned, observed_at)
+       SELECT prediction_id, churned, observed_at FROM outcomes
+       WHERE NOT EXISTS (SELECT 1 FROM outcome_log) ORDER BY observed_at, prediction_id''',
+    '''CREATE TABLE IF NOT EXISTS retrain_jobs
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  reason TEXT NOT NULL,
+                  since_id INTEGER NOT NULL,
+                  last_id INTEGER NOT NULL,
+                  started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  duration REAL,
+                  status TEXT NOT NULL DEFAULT 'running',
+                  candidate TEXT,
+                  promoted INTEGER DEFAULT 0,
+                  detail TEXT)''',
+    '''CREATE TABLE IF NOT EXISTS shadow_scores
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  candidate TEXT NOT NULL,
+                  live_version TEXT NOT NULL,
+                  live_prob REAL NOT NULL,
+                  shadow_prob REAL NOT NULL,
+                  live_band TEXT NOT NULL,
+                  shadow_band TEXT NOT NULL,
+                  scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+    '''CREATE TABLE IF NOT EXISTS crossing_outbox
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  customer_id TEXT NOT NULL,
+                  from_band TEXT NOT NULL,
+                  to_band TEXT NOT NULL,
+                  previous_prob REAL,
+                  churn_prob REAL,
+                  run TEXT NOT NULL,
+                  status TEXT NOT NULL DEFAULT 'pending',
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  UNIQUE(customer_id, run))''',
+    '''CREATE INDEX IF NOT EXISTS crossing_outbox_status ON crossing_outbox (status, id)''',
+    '''CREATE TABLE IF NOT EXISTS campaign_queue
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  idempotency_key TEXT NOT NULL UNIQUE,
+                  customer_id TEXT NOT NULL,
+                  channel TEXT NOT NULL,
+                  template TEXT NOT NULL,
+                  payload TEXT,
+                  status TEXT NOT NULL DEFAULT 'pending',
+                  attempts INTEGER NOT NULL DEFAULT 0,
+                  next_attempt_at REAL NOT NULL,
+                  claimed_at REAL,
+                  sent_at REAL,
+                  last_error TEXT,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+    '''CREATE INDEX IF NOT EXISTS campaign_queue_due ON campaign_queue (channel, status, next_attempt_at)''',
+]
+
+
+def connect(db_path=DB_PATH, **kwargs):
+    conn = sqlite3.connect(db_path, timeout=30, **kwargs)
+    for statement in SCHEMA:
+        conn.execute(statement)
+    conn.commit()
+    return conn
+
+
+def encode_features(x, feature_names):
+    """Storage value for one encoded feature vector."""
+    return pack(x, feature_names)[0]
+
+
+def record_prediction(conn, x, churn_prob, feature_names, user_id=None, notes=None):
+    """Store one scored feature vector, packed; return its prediction id."""
+    cur = conn.execute('INSERT INTO predictions (user_id, prediction_data, churn_prob, notes) VALUES (?, ?, ?, ?)',
+                       (user_id, encode_features(x, feature_names), float(churn_prob), notes))
+    conn.commit()
+    return cur.lastrowid
+
+
+def decode_features(data, feature_names):
+    """Feature vector of one stored ``prediction_data`` value."""
+    X, ok = decode_many([data], feature_names)
+    if not ok[0]:
+        raise ValueError('unreadable prediction_data')
+    return X[0]
+
+
+def record_outcome(conn, prediction_id, churned):
+    """Store the observed churn outcome for a stored prediction, replacing any earlier one."""
+    churned = int(bool(churned))
+    with conn:
+        conn.execute('INSERT OR REPLACE INTO outcomes (prediction_id, churned) VALUES (?, ?)',
+                     (prediction_id, churned))
+        conn.execute('INSERT INTO outcome_log (prediction_id, churned) VALUES (?, ?)',
+                     (prediction_id, churned))
+
+
+def latest_outcome(conn):
+    """``outcome_log`` id of the most recently recorded label, or 0."""
+    return conn.execute('SELECT COALESCE(MAX(id), 0) FROM outcome_log').fetchone()[0]
+
+
+def labeled_predictions(conn, feature_names, since_id=0, until_id=None):
+    """``(ids, X, y)`` for stored predictions labeled or relabeled after outcome ``since_id``.
+
+    ``since_id`` and ``until_id`` are ``outcome_log`` ids, so an old
+    prediction whose label arrives late is still new; ``y`` is each
+    prediction's current label.
+    """
+    if until_id is None:
+        until_id = latest_outcome(conn)
+    rows = conn.execute('''SELECT p.id, p.prediction_data, o.churned
+                           FROM predictions p JOIN outcomes o ON o.prediction_id = p.id
+                           WHERE p.id IN (SELECT prediction_id FROM outcome_log WHERE id > ? AND id <= ?)
+                           ORDER BY p.id''', (since_id, until_id)).fetchall()
+    X, ok = decode_many([data for _, data, _ in rows], feature_names)
+    ids = np.array([pid for pid, _, _ in rows], dtype=np.int64)[ok]
+    y = np.array([churned for _, _, churned in rows], dtype=np.int8)[ok]
+    return ids, X.reshape(-1, len(feature_names)), y
+
+
+def migrate(db_path=DB_PATH, feature_names=None, batch=MIGRATE_BATCH):
+    """Rewrite JSON ``prediction_data`` rows as packed records; return rows converted."""
+    if feature_names is None:
+        feature_names = load_feature_names()
+    conn = sqlite3.connect(db_path, timeout=30)
+    converted, last = 0, 0
+    try:
+        while True:
+            rows = conn.execute('''SELECT id, prediction_data FROM predictions
+                                   WHERE id > ? AND typeof(prediction_data) = 'text'
+                                   ORDER BY id LIMIT ?''', (last, batch)).fetchall()
+            if not rows:
+                break
+            last = rows[-1][0]
+            X, ok = decode_many([data for _, data in rows], feature_names)
+            ids = [pid for (pid, _), good in zip(rows, ok) if good]
+            conn.executemany('UPDATE predictions SET prediction_data = ? WHERE id = ?',
+                             zip(pack(X, feature_names), ids))
+            conn.commit()
+            converted += len(ids)
+        if converted:
+            conn.execute('VACUUM')
+    finally:
+        conn.close()
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintenance for churn_prediction.db')
+    parser.add_argument('command', choices=['migrate'])
+    parser.add_argument('--db', default=DB_PATH)
+    args = parser.parse_args()
+
+    before = os.path.getsize(args.db)
+    start = time.perf_counter()
+    n = migrate(args.db)
+    print(f"{n:,} rows packed in {time.perf_counter() - start:.2f}s; "
+          f"{before / 1024:,.0f} KB -> {os.path.getsize(args.db) / 1024:,.0f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+"""Campaign dispatch for the retention playbook's automated triggers.
+
+Messages are rows in the durable ``campaign_queue`` table, each with an
+idempotency key so the same campaign is never queued twice for a customer.
+``Dispatcher`` is an asyncio worker pool that claims due rows in batches
+per channel, sends them through a pluggable transport under a per-channel
+token-bucket rate limit, and marks them sent, or schedules a retry with
+exponential backoff (``dead`` after ``MAX_ATTEMPTS``).  Claims left behind
+by a crashed worker are picked up again after ``CLAIM_TIMEOUT``.  Database
+work runs in threads (``asyncio.to_thread``), each with its own
+connection, so a busy database never stalls the event loop.
+
+High-risk customers reach the queue from the band-crossing outbox
+(``enqueue_crossings``) or from the dashboard (``enqueue`` in a background
+thread).
+
+    python -m churnshield.dispatch run --sink outbox/        # file sink stand-in
+    python -m churnshield.dispatch run --smtp localhost:1025
+    python -m churnshield.dispatch status
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import smtplib
+import sqlite3
+import threading
+import time
+from datetime import date
+from email.message import EmailMessage
+
+from churnshield.db import DB_PATH, connect
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 30
+CLAIM_TIMEOUT = 300
+BATCH_SIZE = 20
+WORKERS = 4
+POLL_SECONDS = 2.0
+# Messages per second and burst size per channel.
+RATE_LIMITS = {'email': (10.0, 20), 'sms': (2.0, 5)}
+# UPDATE ... RETURNING needs SQLite 3.35; older libraries claim with SELECT then UPDATE.
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+CLAIM_COLUMNS = ('id', 'idempotency_key', 'customer_id', 'template', 'payload', 'attempts')
+
+TEMPLATES = {
+    'special_offer_email': {
+        'channel': 'email',
+        'subject': 'A special offer to thank you for staying with us',
+        'body': 'Enjoy a 20% discount for 6 months when you move to a 1-year contract, '
+                'plus a $50 loyalty credit on your account.',
+    },
+    'retention_sms': {
+        'channel': 'sms',
+        'body': 'We value you! Reply YES for 20% off for 6 months on a 1-year plan.',
+    },
+    'engagement_email': {
+        'channel': 'email',
+        'subject': 'Get more from your service',
+        'body': 'Try a premium feature free for 3 months, and save 10% when you switch to an annual contract.',
+    },
+}
+CAMPAIGNS = {'HIGH': ['special_offer_email', 'retention_sms'], 'MEDIUM': ['engagement_email']}
+
+
+def idempotency_key(customer_id, template, scope):
+    return hashlib.sha256(f'{customer_id}|{template}|{scope}'.encode()).hexdigest()[:32]
+
+
+def enqueue(conn, customer_id, template, payload=None, scope=None):
+    """Queue one templated message; return False if its idempotency key already exists.
+
+    ``scope`` defaults to today's date, i.e. one message per customer and
+    template per day.
+    """
+    key = idempotency_key(customer_id, template, scope or date.today().isoformat())
+    cur = conn.execute('''INSERT OR IGNORE INTO campaign_queue
+                          (idempotency_key, customer_id, channel, template, payload, next_attempt_at)
+                          VALUES (?, ?, ?, ?, ?, ?)''',
+                       (key, customer_id, TEMPLATES[template]['channel'], template,
+                        json.dumps(payload or {}), time.time()))
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def enqueue_campaign(customer_id, risk_level, payload=None, db_path=DB_PATH):
+    """Queue the playbook campaign for a risk band; return how many messages were new."""
+    conn = connect(db_path)
+    try:
+        return sum(enqueue(conn, customer_id, template, payload) for template in CAMPAIGNS.get(risk_level, []))
+    finally:
+        conn.close()
+
+
+def enqueue_crossings(conn, limit=10_000):
+    """Move pending band-crossing events into the campaign queue."""
+    events = conn.execute('''SELECT id, customer_id, to_band, churn_prob, run FROM crossing_outbox
+                             WHERE status = 'pending' ORDER BY id LIMIT ?''', (limit,)).fetchall()
+    queued = 0
+    for event_id, customer_id, band, prob, run in events:
+        for template in CAMPAIGNS.get(band, []):
+            queued += enqueue(conn, customer_id, template, {'churn_prob': prob}, scope=run)
+        conn.execute("UPDATE crossing_outbox SET status = 'queued' WHERE id = ?", (event_id,))
+    conn.commit()
+    return queued
+
+
+def render(row):
+    """``(subject, body)`` of a claimed queue row."""
+    template = TEMPLATES[row['template']]
+    return template.get('subject', ''), template['body']
+
+
+class FileSink:
+    """Transport stand-in: appends each message as a JSON line to ``<dir>/<channel>.jsonl``."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    async def send(self, channel, rows):
+        def write():
+            with open(os.path.join(self.directory, f'{channel}.jsonl'), 'a') as f:
+                for row in rows:
+                    subject, body = render(row)
+                    f.write(json.dumps({'to': row['customer_id'], 'subject': subject, 'body': body,
+                                        'key': row['idempotency_key'], 'sent_at': time.time()}) + '\n')
+        await asyncio.to_thread(write)
+        return [None] * len(rows)
+
+
+class SMTPTransport:
+    """Email over SMTP (one connection per batch); recipients are ``<customer_id>@<domain>``."""
+
+    def __init__(self, host='localhost', port=25, sender='retention@churnshield.local', domain='example.com'):
+        self.host, self.port, self.sender, self.domain = host, port, sender, domain
+
+    async def send(self, channel, rows):
+        def deliver():
+            errors = []
+            with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+                for row in rows:
+                    subject, body = render(row)
+                    msg = EmailMessage()
+                    msg['From'] = self.sender
+                    msg['To'] = f"{row['customer_id']}@{self.domain}"
+                    msg['Subject'] = subject
+                    msg.set_content(body)
+                    try:
+                        smtp.send_message(msg)
+                        errors.append(None)
+                    except smtplib.SMTPException as e:
+                        errors.append(str(e))
+            return errors
+        return await asyncio.to_thread(deliver)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate, self.capacity = rate, burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        # Created inside the running loop: before Python 3.10 an asyncio.Lock
+        # binds to the loop current at construction, and buckets are built
+        # before asyncio.run.
+        self.lock = self.loop = None
+
+    async def take(self, n=1):
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.lock, self.loop = asyncio.Lock(), loop
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((n - self.tokens) / self.rate)
+
+
+class Dispatcher:
+    """Async worker pool draining ``campaign_queue`` through per-channel transports."""
+
+    def __init__(self, transports, db_path=DB_PATH, workers=WORKERS, batch_size=BATCH_SIZE,
+                 rate_limits=RATE_LIMITS):
+        self.transports = transports
+        self.db_path = db_path
+        self.workers = workers
+        # Batches never exceed a channel's burst, so a batch can always get its tokens.
+        self.batch_sizes = {ch: min(batch_size, rate_limits[ch][1]) for ch in transports}
+        self.buckets = {ch: TokenBucket(*rate_limits[ch]) for ch in transports}
+        self.stats = {'sent': 0, 'retried': 0, 'dead': 0}
+        # sqlite3 connections stay in the thread that opened them.
+        self.local = threading.local()
+        self.connections = []
+        self.connections_lock = threading.Lock()
+
+    @property
+    def conn(self):
+        """This thread's connection, opened on first use."""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            # Closed from another thread in close(), once this one is done with it.
+            conn = self.local.conn = connect(self.db_path, check_same_thread=False)
+            with self.connections_lock:
+                self.connections.append(conn)
+        return conn
+
+    def close(self):
+        # Only called once no worker is running, so no thread is still using them.
+        with self.connections_lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = []
+        self.local = threading.local()
+
+    def claim(self, channel):
+        """Mark up to a batch of due rows for ``channel`` as sending and return them."""
+        now = time.time()
+        due = '''SELECT id FROM campaign_queue
+                 WHERE channel = ? AND next_attempt_at <= ?
+                   AND (status = 'pending' OR (status = 'sending' AND claimed_at < ?))
+                 ORDER BY next_attempt_at LIMIT ?'''
+        params = (channel, now, now - CLAIM_TIMEOUT, self.batch_sizes[channel])
+        conn = self.conn
+        if HAS_RETURNING:
+            rows = conn.execute(f'''UPDATE campaign_queue SET status = 'sending', claimed_at = ?,
+                                          attempts = attempts + 1
+                                   WHERE id IN ({due})
+                                   RETURNING {', '.join(CLAIM_COLUMNS)}''', (now, *params)).fetchall()
+            conn.commit()
+        else:
+            # The write lock is taken up front so no other worker claims the same rows in between.
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                ids = [row_id for (row_id,) in conn.execute(due, params).fetchall()]
+                marks = ', '.join('?' * len(ids))
+                conn.execute(f'''UPDATE campaign_queue SET status = 'sending', claimed_at = ?,
+                                      attempts = attempts + 1 WHERE id IN ({marks})''', (now, *ids))
+                rows = conn.execute(f"SELECT {', '.join(CLAIM_COLUMNS)} FROM campaign_queue WHERE id IN ({marks})",
+                                    ids).fetchall()
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return [dict(zip(CLAIM_COLUMNS, row)) for row in rows]
+
+    def settle(self, rows, errors):
+        """Record each claimed row's send result: sent, retry with backoff, or dead."""
+        now = time.time()
+        conn = self.conn
+        for row, error in zip(rows, errors):
+            if error is None:
+                conn.execute("UPDATE campaign_queue SET status = 'sent', sent_at = ?, last_error = NULL "
+                             "WHERE id = ?", (now, row['id']))
+                self.stats['sent'] += 1
+            elif row['attempts'] >= MAX_ATTEMPTS:
+                conn.execute("UPDATE campaign_queue SET status = 'dead', last_error = ? WHERE id = ?",
+                             (error, row['id']))
+                self.stats['dead'] += 1
+            else:
+                conn.execute('''UPDATE campaign_queue SET status = 'pending', last_error = ?,
+                                       next_attempt_at = ? WHERE id = ?''',
+                             (error, now + BACKOFF_SECONDS * 2 ** (row['attempts'] - 1), row['id']))
+                self.stats['retried'] += 1
+        conn.commit()
+
+    def due_count(self):
+        """Rows that are due or still being sent."""
+        return self.conn.execute('''SELECT COUNT(*) FROM campaign_queue WHERE
+                                    (status = 'pending' AND next_attempt_at <= ?) OR status = 'sending' ''',
+                                 (time.time(),)).fetchone()[0]
+
+    async def _worker(self, stop):
+        channels = list(self.transports)
+        turn = 0
+        while not stop.is_set():
+            channel = channels[turn % len(channels)]
+            turn += 1
+            rows = await asyncio.to_thread(self.claim, channel)
+            if not rows:
+                if turn % len(channels) == 0:
+                    await asyncio.sleep(POLL_SECONDS)
+                continue
+            await self.buckets[channel].take(len(rows))
+            try:
+                errors = await self.transports[channel].send(channel, rows)
+            except Exception as e:
+                errors = [f'{type(e).__name__}: {e}'] * len(rows)
+            await asyncio.to_thread(self.settle, rows, errors)
+
+    async def run(self, stop=None, drain=False):
+        """Run the pool until ``stop`` is set (or, with ``drain``, until nothing is due)."""
+        stop = stop or asyncio.Event()
+        watcher = asyncio.get_running_loop().create_task(self._stop_when_idle(stop)) if drain else None
+        try:
+            await asyncio.gather(*(self._worker(stop) for _ in range(self.workers)))
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            self.close()
+
+    async def _stop_when_idle(self, stop):
+        while await asyncio.to_thread(self.due_count):
+            await asyncio.sleep(0.2)
+        stop.set()
+
+
+def queue_status(conn):
+    return conn.execute('''SELECT channel, status, COUNT(*) FROM campaign_queue
+                           GROUP BY channel, status ORDER BY channel, status''').fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Campaign dispatch worker')
+    parser.add_argument('command', choices=['run', 'status'])
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--sink', default='outbox', help='directory for the file sink (default transport)')
+    parser.add_argument('--smtp', help='host:port; send email through SMTP instead of the file sink')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--drain', action='store_true', help='exit once nothing is due')
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.command == 'status':
+        for channel, status, count in queue_status(conn):
+            print(f"{channel:6s} {status:8s} {count:,}")
+        return
+    print(f"{enqueue_crossings(conn)} messages queued from band crossings")
+    conn.close()
+
+    sink = FileSink(args.sink)
+    transports = {'email': sink, 'sms': sink}
+    if args.smtp:
+        host, _, port = args.smtp.partition(':')
+        transports['email'] = SMTPTransport(host, int(port or 25))
+    dispatcher = Dispatcher(transports, args.db, workers=args.workers)
+    start = time.perf_counter()
+    try:
+        asyncio.run(dispatcher.run(drain=args.drain))
+    except KeyboardInterrupt:
+        pass
+    print(f"{dispatcher.stats} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""Streaming data-drift monitor for scored traffic.
+
+The reference profile (training histograms from data.csv) is precomputed
+once and stored next to the model.  Live histograms are plain count arrays
+updated in O(1) per scored record, so PSI and KS are computed on demand from
+counts without keeping any raw history.
+
+    python -m churnshield.drift build          # write app/model/drift_reference.json
+    python -m churnshield.drift report         # score predictions table against it
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from churnshield.db import DB_PATH
+from churnshield.features import DATA_PATH, load_feature_names, numeric_indices, read_reference
+from churnshield.packing import decode_many
+
+REFERENCE_PATH = 'app/model/drift_reference.json'
+
+NUMERIC_BINS = 10
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+KS_ALERT = 0.2
+MIN_SAMPLES = 30
+EPS = 1e-4
+# Raw fields the app's sidebar does not collect, so stored predictions never
+# carry their flags and they can't be compared against the reference.
+UNCOLLECTED_FIELDS = ('MultipleLines',)
+
+
+def uncollected_features(feature_names):
+    """Encoded features of ``UNCOLLECTED_FIELDS``, to pass as ``DriftMonitor(exclude=...)``."""
+    return [name for name in feature_names if name.split('_')[0] in UNCOLLECTED_FIELDS]
+
+
+def build_reference(X, feature_names, bins=NUMERIC_BINS):
+    """Reference histograms: quantile bins for numerics, 0/1 frequencies for flags."""
+    numeric = set(numeric_indices(feature_names))
+    features = []
+    for i, name in enumerate(feature_names):
+        col = X[:, i]
+        col = col[~np.isnan(col)]
+        if i in numeric:
+            # Interior cut points only; the outer bins are open-ended so
+            # live values outside the training range still land somewhere.
+            edges = np.unique(np.quantile(col, np.linspace(0, 1, bins + 1)[1:-1]))
+            counts = np.bincount(np.searchsorted(edges, col, side='right'), minlength=len(edges) + 1)
+        else:
+            edges = np.array([0.5])
+            counts = np.bincount((col > 0.5).astype(np.int64), minlength=2)
+        features.append({'name': name, 'edges': edges.tolist(), 'counts': counts.tolist()})
+    return {'n': int(len(X)), 'features': features}
+
+
+def save_reference(reference, path=REFERENCE_PATH):
+    with open(path, 'w') as f:
+        json.dump(reference, f)
+
+
+def load_reference(path=REFERENCE_PATH, data_path=DATA_PATH):
+    """Load the stored reference, falling back to computing it from the training file."""
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    feature_names = load_feature_names()
+    _, X, _ = read_reference(data_path, feature_names)
+    return build_reference(X, feature_names)
+
+
+def psi(expected, actual):
+    """Population stability index between two count vectors."""
+    e = np.maximum(expected / max(expected.sum(), 1), EPS)
+    a = np.maximum(actual / max(actual.sum(), 1), EPS)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def ks(expected, actual):
+    """Kolmogorov-Smirnov distance between two binned distributions."""
+    e = np.cumsum(expected) / max(expected.sum(), 1)
+    a = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.max(np.abs(a - e)))
+
+
+class DriftMonitor:
+    """Live histograms per feature, compared against the training reference on demand."""
+
+    def __init__(self, reference, exclude=()):
+        self.names = [f['name'] for f in reference['features']]
+        # Features the live source never fills in (e.g. fields the app does not collect).
+        self.monitored = np.array([name not in set(exclude) for name in self.names])
+        width = max(len(f['counts']) for f in reference['features'])
+        # Pad every feature's edges to the same width with +inf so a single
+        # vectorized comparison bins a whole record at once.
+        self.edges = np.full((len(self.names), width - 1), np.inf)
+        self.expected = np.zeros((len(self.names), width), dtype=np.int64)
+        self.n_bins = np.array([len(f['counts']) for f in reference['features']])
+        for i, f in enumerate(reference['features']):
+            self.edges[i, :len(f['edges'])] = f['edges']
+            self.expected[i, :len(f['counts'])] = f['counts']
+        self.actual = np.zeros_like(self.expected)
+        self.rows = np.arange(len(self.names))
+        self.lock = threading.Lock()
+
+    @property
+    def n(self):
+        return int(self.actual[0].sum())
+
+    def _bins(self, X):
+        # Count of edges each value has passed == its bin; NaN stays in bin 0.
+        return (X[..., None] >= self.edges).sum(axis=-1)
+
+    def update(self, x):
+        """Add one encoded record (length-40 vector) to the live histograms."""
+        bins = self._bins(np.asarray(x, dtype=np.float64))
+        with self.lock:
+            self.actual[self.rows, bins] += 1
+
+    def update_many(self, X):
+        bins = self._bins(np.asarray(X, dtype=np.float64))
+        with self.lock:
+            for i in self.rows:
+                self.actual[i] += np.bincount(bins[:, i], minlength=self.actual.shape[1])
+
+    def reset(self):
+        with self.lock:
+            self.actual[:] = 0
+
+    def report(self):
+        """Per-feature PSI/KS and status, worst first."""
+        with self.lock:
+            actual = self.actual.copy()
+        n = int(actual[0].sum())
+        rows = []
+        for i, name in enumerate(self.names):
+            if not self.monitored[i]:
+                continue
+            k = self.n_bins[i]
+            e, a = self.expected[i, :k], actual[i, :k]
+            p, d = (psi(e, a), ks(e, a)) if n else (0.0, 0.0)
+            if n < MIN_SAMPLES:
+                status = 'insufficient data'
+            elif p > PSI_ALERT or d > KS_ALERT:
+                status = 'alert'
+            elif p > PSI_WARN:
+                status = 'warning'
+            else:
+                status = 'stable'
+            rows.append({'feature': name, 'psi': p, 'ks': d, 'status': status})
+        rows.sort(key=lambda r: r['psi'], reverse=True)
+        return rows
+
+    def alerts(self):
+        return [r for r in self.report() if r['status'] == 'alert']
+
+    def seed_from_db(self, db_path=DB_PATH):
+        """Replay stored predictions' feature vectors into the live histograms."""
+        if not os.path.exists(db_path):
+            return 0
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute('SELECT prediction_data FROM predictions').fetchall()
+        except sqlite3.Error:
+            rows = []
+        finally:
+            conn.close()
+        X, _ = decode_many([data for (data,) in rows], self.names)
+        if len(X):
+            self.update_many(X)
+        return len(X)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Data-drift reference builder and report')
+    parser.add_argument('command', choices=['build', 'report'])
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--reference', default=REFERENCE_PATH)
+    parser.add_argument('--db', default=DB_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        feature_names = load_feature_names()
+        _, X, _ = read_reference(args.data, feature_names)
+        save_reference(build_reference(X, feature_names), args.reference)
+        print(f"Reference profile for {len(feature_names)} features written to {args.reference}")
+    else:
+        reference = load_reference(args.reference, args.data)
+        names = [f['name'] for f in reference['features']]
+        monitor = DriftMonitor(reference, exclude=uncollected_features(names))
+        n = monitor.seed_from_db(args.db)
+        print(f"{n} stored predictions")
+        for r in monitor.report():
+            print(f"{r['feature']:45s} PSI={r['psi']:.3f} KS={r['ks']:.3f} {r['status']}")
+
+
+if __name__ == '__main__':
+    main()
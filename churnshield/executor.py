@@ -0,0 +1,256 @@
+"""Process-wide scoring executor shared by every dashboard session.
+
+Session threads calling ``Booster.predict`` directly each start their own
+OpenMP team, so a few dozen analysts oversubscribe the cores and tail
+latency explodes.  ``ScoringExecutor`` funnels single-customer requests
+through a bounded queue to a fixed number of worker threads, each with an
+explicit ``nthread``:
+
+* identical vectors already queued or being scored share one future
+  (coalescing), and each worker scores everything waiting, up to
+  ``max_batch`` rows, in one ``predict`` call (micro-batching);
+* when the queue is full the request is shed to a fast path on the caller's
+  thread: the first ``FAST_TREES`` trees only, marked as approximate.
+
+Attribution (SHAP) requests go through the same queue and workers.  They
+have no cheap approximation, so instead of being shed they wait up to the
+timeout for room in the queue.
+
+    python -m churnshield.executor bench --sessions 32 --requests 40
+"""
+import argparse
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+from churnshield.calibration import load_calibrator
+from churnshield.features import DATA_PATH, load_feature_names
+from churnshield.featurestore import load_store
+from churnshield.model import contributions, load_booster, predict
+
+WORKERS = 1
+NTHREAD = 1
+MAX_QUEUE = 64
+MAX_BATCH = 64
+# How long a worker waits for more requests to join a batch.
+BATCH_WAIT = 0.001
+FAST_TREES = 20
+TIMEOUT = 10.0
+
+
+class ScoringExecutor:
+    """Bounded, coalescing scoring queue in front of a shared booster."""
+
+    def __init__(self, booster, feature_names, calibrator=None, workers=WORKERS, nthread=NTHREAD,
+                 max_queue=MAX_QUEUE, max_batch=MAX_BATCH, batch_wait=BATCH_WAIT, fast_trees=FAST_TREES):
+        self.feature_names = feature_names
+        self.calibrator = calibrator
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self.fast_trees = fast_trees
+        self.nthread = nthread
+        # One private copy per worker so per-booster settings never race.
+        self.boosters = [booster.copy() for _ in range(workers)]
+        for b in self.boosters:
+            b.set_param({'nthread': nthread})
+        self.fast_booster = booster.copy()
+        self.fast_booster.set_param({'nthread': 1})
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'coalesced': 0, 'batches': 0, 'batched_rows': 0, 'shed': 0}
+        self.threads = [threading.Thread(target=self._run, args=(b,), name=f'scoring-{i}', daemon=True)
+                        for i, b in enumerate(self.boosters)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, vector):
+        """Future of ``(probability, exact)`` for one encoded vector."""
+        return self._submit('prob', vector)
+
+    def submit_contributions(self, vector, timeout=TIMEOUT):
+        """Future of one encoded vector's per-feature contributions.
+
+        Waits up to ``timeout`` for queue space and raises ``queue.Full``
+        after that.
+        """
+        return self._submit('contribs', vector, timeout)
+
+    def _submit(self, kind, vector, wait=None):
+        vector = np.ascontiguousarray(vector, dtype=np.float32)
+        key = (kind, vector.tobytes())
+        with self.lock:
+            self.stats['requests'] += 1
+            future = self.pending.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return future
+            future = Future()
+            try:
+                self.queue.put_nowait((key, vector, future))
+            except queue.Full:
+                queued = False
+                if kind == 'prob':
+                    self.stats['shed'] += 1
+                else:
+                    # Registered before the blocking put so identical requests
+                    # arriving meanwhile wait on this future instead of queueing.
+                    self.pending[key] = future
+            else:
+                self.pending[key] = future
+                queued = True
+        if queued:
+            return future
+        if kind == 'prob':
+            future.set_result((self.approximate(vector), False))
+            return future
+        try:
+            self.queue.put((key, vector, future), timeout=wait)
+        except queue.Full as e:
+            with self.lock:
+                if self.pending.get(key) is future:
+                    del self.pending[key]
+            # Requests coalesced onto this future fail with it.
+            future.set_exception(e)
+            raise
+        return future
+
+    def score(self, vector, timeout=TIMEOUT):
+        """``(probability, exact)``; ``exact`` is False when the request was shed."""
+        return self.submit(vector).result(timeout)
+
+    def contributions(self, vector, timeout=TIMEOUT):
+        """Per-feature margin contributions (SHAP values) of one encoded vector."""
+        return self.submit_contributions(vector, timeout).result(timeout)
+
+    def _calibrate(self, probs):
+        return self.calibrator.apply(probs) if self.calibrator is not None else probs
+
+    def approximate(self, vector):
+        """Fast-path probability from the first ``fast_trees`` trees, on the caller's thread.
+
+        Not a substitute for the full model: keep it out of caches and
+        anything that aggregates scores, and label it as approximate.
+        """
+        prob = predict(self.fast_booster, vector[None, :], self.feature_names,
+                       iteration_range=(0, self.fast_trees))
+        return float(np.asarray(self._calibrate(prob)).ravel()[0])
+
+    def _take_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _compute(self, booster, kind, X):
+        if kind == 'contribs':
+            return list(contributions(booster, X, self.feature_names))
+        probs = np.asarray(self._calibrate(predict(booster, X, self.feature_names)))
+        return [(float(p), True) for p in np.ravel(probs)]
+
+    def _run(self, booster):
+        while True:
+            batch = self._take_batch()
+            done = []
+            for kind in ('prob', 'contribs'):
+                items = [item for item in batch if item[0][0] == kind]
+                if not items:
+                    continue
+                try:
+                    results, error = self._compute(booster, kind, np.stack([v for _, v, _ in items])), None
+                except Exception as e:
+                    results, error = None, e
+                done.append((items, results, error))
+            with self.lock:
+                for key, _, _ in batch:
+                    self.pending.pop(key, None)
+                self.stats['batches'] += 1
+                self.stats['batched_rows'] += len(batch)
+            for items, results, error in done:
+                for i, (_, _, future) in enumerate(items):
+                    if error is None:
+                        future.set_result(results[i])
+                    else:
+                        future.set_exception(error)
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+
+def _percentiles(latencies):
+    ms = np.asarray(latencies) * 1000
+    return {q: float(np.percentile(ms, q)) for q in (50, 95, 99)}
+
+
+def benchmark(X, booster, feature_names, sessions=32, requests=40, distinct=200, seed=0, **executor_args):
+    """Simulate ``sessions`` concurrent analysts, each scoring ``requests`` customers.
+
+    Customers are drawn from ``distinct`` profiles so concurrent sessions
+    sometimes ask for the same one.  Returns latency percentiles and
+    throughput for direct ``predict`` calls and for the executor.
+    """
+    rng = np.random.default_rng(seed)
+    pool = X[rng.choice(len(X), size=min(distinct, len(X)), replace=False)]
+    plans = [rng.integers(0, len(pool), size=requests) for _ in range(sessions)]
+
+    def run(score_one):
+        barrier = threading.Barrier(sessions)
+
+        def session(plan):
+            barrier.wait()
+            latencies = []
+            for i in plan:
+                start = time.perf_counter()
+                score_one(pool[i])
+                latencies.append(time.perf_counter() - start)
+            return latencies
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(sessions) as threads:
+            latencies = [t for result in threads.map(session, plans) for t in result]
+        elapsed = time.perf_counter() - start
+        return {'latency_ms': _percentiles(latencies), 'throughput': len(latencies) / elapsed}
+
+    direct_booster = booster.copy()
+    direct = run(lambda v: predict(direct_booster, v[None, :], feature_names))
+    executor = ScoringExecutor(booster, feature_names, **executor_args)
+    pooled = run(executor.score)
+    pooled['stats'] = dict(executor.stats)
+    return {'direct': direct, 'executor': pooled}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared scoring executor')
+    parser.add_argument('command', choices=['bench'])
+    parser.add_argument('data', nargs='?', default=DATA_PATH)
+    parser.add_argument('--sessions', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=40, help='requests per session')
+    parser.add_argument('--distinct', type=int, default=200, help='distinct customer profiles in play')
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--nthread', type=int, default=NTHREAD)
+    parser.add_argument('--max-queue', type=int, default=MAX_QUEUE)
+    args = parser.parse_args()
+
+    store = load_store(args.data)
+    result = benchmark(np.asarray(store.X), load_booster(), load_feature_names(), args.sessions,
+                       args.requests, args.distinct, workers=args.workers, nthread=args.nthread,
+                       max_queue=args.max_queue, calibrator=load_calibrator())
+    print(f"{args.sessions} sessions x {args.requests} requests")
+    for name, r in result.items():
+        lat = r['latency_ms']
+        print(f"  {name:8s} p50 {lat[50]:7.2f} ms  p95 {lat[95]:7.2f} ms  p99 {lat[99]:7.2f} ms  "
+              f"{r['throughput']:8.0f} req/s")
+    stats = result['executor']['stats']
+    print(f"  executor: {stats['batches']:,} batches (mean {stats['batched_rows'] / max(stats['batches'], 1):.1f} rows), "
+          f"{stats['coalesced']:,} coalesced, {stats['shed']:,} shed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Vectorized encoding of raw customer records into the model's 40 features.
+
+Mirrors the preprocessing in customer_churn.ipynb: binary Yes/No and
+Male/Female columns become 0/1 and the multi-class columns are one-hot
+encoded with pandas-style ``<column>_<value>`` names.
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+MODEL_PATH = 'app/model/churn_model.json'
+FEATURES_PATH = 'app/model/feature_names.json'
+DATA_PATH = 'data.csv'
+
+NUMERIC_COLS = ['tenure', 'MonthlyCharges', 'TotalCharges']
+BINARY_COLS = ['gender', 'SeniorCitizen', 'Partner', 'Dependents', 'PhoneService', 'PaperlessBilling']
+MULTI_COLS = ['MultipleLines', 'InternetService', 'OnlineSecurity', 'OnlineBackup',
+              'DeviceProtection', 'TechSupport', 'StreamingTV', 'StreamingMovies',
+              'Contract', 'PaymentMethod']
+RAW_COLS = BINARY_COLS + NUMERIC_COLS + MULTI_COLS
+
+BINARY_MAP = {'Yes': 1, 'No': 0, 'Male': 1, 'Female': 0, '1': 1, '0': 0, 1: 1, 0: 0}
+
+
+def load_feature_names(path=FEATURES_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def numeric_indices(feature_names):
+    """Positions of the continuous features; every other column is a 0/1 flag."""
+    return [feature_names.index(col) for col in NUMERIC_COLS]
+
+
+def encode_frame(df, feature_names):
+    """Encode a raw customer DataFrame into a float32 matrix ordered like ``feature_names``.
+
+    Unknown categories leave every flag of that column at 0, unparseable
+    numerics (e.g. blank ``TotalCharges``) become NaN which XGBoost treats
+    as missing.
+    """
+    X = np.zeros((len(df), len(feature_names)), dtype=np.float32)
+    position = {name: i for i, name in enumerate(feature_names)}
+
+    for col in NUMERIC_COLS:
+        X[:, position[col]] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float32)
+
+    for col in BINARY_COLS:
+        values = df[col]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = values.map(BINARY_MAP)
+        X[:, position[col]] = values.fillna(0).to_numpy(dtype=np.float32)
+
+    for col in MULTI_COLS:
+        values = df[col].to_numpy()
+        prefix = col + '_'
+        for name, i in position.items():
+            if name.startswith(prefix):
+                X[:, i] = values == name[len(prefix):]
+
+    return X
+
+
+def read_reference(path=DATA_PATH, feature_names=None):
+    """Load the training file and return ``(raw_df, X, y)`` with churn as 0/1."""
+    if feature_names is None:
+        feature_names = load_feature_names()
+    df = pd.read_csv(path)
+    X = encode_frame(df, feature_names)
+    y = (df['Churn'] == 'Yes').to_numpy(dtype=np.int8) if 'Churn' in df else None
+    return df, X, y
@@ -0,0 +1,200 @@
+"""Materialized feature store keyed by customerID.
+
+Each customer's encoded 40-feature vector, the engineered features from the
+README and the churn label are stored as ``.npy`` arrays sorted by
+customerID and memory-mapped on load.  Every stored row carries a 64-bit
+hash of its raw model-input fields; a refresh hashes the new file, re-encodes only
+customers that are new or whose hash changed, and copies every other vector
+across unchanged.
+
+    python -m churnshield.featurestore refresh data.csv
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from churnshield.features import DATA_PATH, RAW_COLS, encode_frame, load_feature_names
+
+STORE_DIR = 'app/index/features'
+CHUNK_SIZE = 500_000
+ENGINEERED = ['TenureToChargeRatio', 'TotalValueScore', 'ServiceDensity', 'PaymentRisk',
+              'HighCostLongTenure']
+UNLABELED = -1
+
+
+def raw_hashes(chunk):
+    """64-bit hash of every row's raw model-input fields.
+
+    ``Churn`` is left out: labels are re-read on every refresh, and a newly
+    recorded outcome must not count as a changed customer to rescore.
+    Chunks are read with ``dtype=str`` so a value hashes the same whatever
+    type pandas would have inferred for its chunk.
+    """
+    cols = [col for col in RAW_COLS if col in chunk]
+    return pd.util.hash_pandas_object(chunk[cols], index=False).to_numpy()
+
+
+def engineered_features(X, feature_names):
+    """The README's engineered features, computed from encoded vectors."""
+    col = {name: X[:, i].astype(np.float64) for i, name in enumerate(feature_names)}
+    tenure, monthly, total = col['tenure'], col['MonthlyCharges'], col['TotalCharges']
+    services = sum(col[f'{name}_Yes'] for name in ('OnlineSecurity', 'OnlineBackup',
+                                                   'DeviceProtection', 'TechSupport'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value_score = np.where(total > 0, tenure * monthly / total, 0.0)
+        density = np.where(tenure > 0, services / tenure, 0.0)
+    high_cost = (monthly > np.nanquantile(monthly, 0.75)) & (tenure > np.nanmedian(tenure))
+    return np.column_stack([
+        tenure / (monthly + 1e-6),
+        np.nan_to_num(value_score),
+        density,
+        col['PaymentMethod_Electronic check'] * col['Contract_Month-to-month'],
+        high_cost.astype(np.float64),
+    ]).astype(np.float32)
+
+
+class FeatureStore:
+    """Memory-mapped encoded vectors, engineered features and labels, sorted by customerID."""
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.feature_names = self.meta['feature_names']
+        self.ids = self._load('ids')
+        self.X = self._load('X')
+        self.engineered = self._load('engineered')
+        self.labels = self._load('labels')
+        self.hashes = self._load('hashes')
+
+    def _load(self, name):
+        return np.load(os.path.join(self.store_dir, f'{name}.npy'), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.ids)
+
+    def positions(self, customer_ids):
+        """Row positions of ``customer_ids``; -1 where a customer is not stored."""
+        keys = np.asarray(customer_ids, dtype=self.ids.dtype)
+        if not len(self.ids):
+            return np.full(len(keys), -1)
+        pos = np.minimum(np.searchsorted(self.ids, keys), len(self.ids) - 1)
+        return np.where(self.ids[pos] == keys, pos, -1)
+
+    def vectors(self, customer_ids):
+        """Encoded vectors for ``customer_ids`` (NaN rows for unknown customers)."""
+        pos = self.positions(customer_ids)
+        X = np.asarray(self.X[np.maximum(pos, 0)], dtype=np.float32)
+        X[pos < 0] = np.nan
+        return X
+
+    def chunks(self, size=CHUNK_SIZE):
+        """``(ids, X)`` slices over the whole store, in customerID order."""
+        for start in range(0, len(self), size):
+            yield self.ids[start:start + size].astype(str), np.asarray(self.X[start:start + size])
+
+    def labeled(self):
+        """``(X, y)`` for every customer with a known churn outcome."""
+        mask = np.asarray(self.labels) != UNLABELED
+        return np.asarray(self.X[mask]), np.asarray(self.labels[mask])
+
+
+def refresh(data_path=DATA_PATH, store_dir=STORE_DIR, chunksize=CHUNK_SIZE):
+    """Bring the store in line with ``data_path``, re-encoding only changed customers."""
+    feature_names = load_feature_names()
+    old = None
+    if os.path.exists(os.path.join(store_dir, 'meta.json')):
+        old = FeatureStore(store_dir)
+        if old.feature_names != feature_names:
+            old = None
+
+    ids, hashes, labels, X_parts = [], [], [], []
+    encoded = 0
+    for chunk in pd.read_csv(data_path, chunksize=chunksize, dtype=str, keep_default_na=False):
+        chunk_ids = chunk['customerID'].to_numpy(dtype=str)
+        chunk_hashes = raw_hashes(chunk)
+        X = np.empty((len(chunk), len(feature_names)), dtype=np.float32)
+        if old is not None and len(old):
+            pos = old.positions(chunk_ids)
+            same = (pos >= 0) & (old.hashes[np.maximum(pos, 0)] == chunk_hashes)
+        else:
+            pos, same = np.full(len(chunk), -1), np.zeros(len(chunk), dtype=bool)
+        if same.any():
+            X[same] = old.X[pos[same]]
+        if (~same).any():
+            X[~same] = encode_frame(chunk[~same], feature_names)
+            encoded += int((~same).sum())
+        ids.append(chunk_ids)
+        hashes.append(chunk_hashes)
+        labels.append(chunk['Churn'].map({'Yes': 1, 'No': 0}).fillna(UNLABELED).to_numpy(dtype=np.int8)
+                      if 'Churn' in chunk else np.full(len(chunk), UNLABELED, dtype=np.int8))
+        X_parts.append(X)
+
+    ids = np.concatenate(ids)
+    order = np.argsort(ids, kind='stable')
+    X = np.concatenate(X_parts)[order]
+    arrays = {
+        'ids': ids[order].astype(np.bytes_),
+        'X': X,
+        'engineered': engineered_features(X, feature_names),
+        'labels': np.concatenate(labels)[order],
+        'hashes': np.concatenate(hashes)[order],
+    }
+    removed = len(old) - int(np.sum(old.positions(ids) >= 0)) if old is not None else 0
+
+    # Write the new generation beside the old one and swap directories.
+    tmp = store_dir + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp, f'{name}.npy'), array)
+    stat = os.stat(data_path)
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump({'source': data_path, 'source_size': stat.st_size, 'source_mtime': stat.st_mtime,
+                   'rows': int(len(ids)), 'feature_names': feature_names, 'engineered': ENGINEERED}, f)
+    del old
+    if os.path.exists(store_dir):
+        shutil.rmtree(store_dir)
+    os.replace(tmp, store_dir)
+    return {'rows': int(len(ids)), 'encoded': encoded, 'reused': int(len(ids)) - encoded, 'removed': removed}
+
+
+def is_current(data_path=DATA_PATH, store_dir=STORE_DIR):
+    """Whether the store was built from ``data_path`` as it is now on disk."""
+    try:
+        with open(os.path.join(store_dir, 'meta.json')) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return False
+    stat = os.stat(data_path)
+    return (meta['source'] == data_path and meta['source_size'] == stat.st_size
+            and meta['source_mtime'] == stat.st_mtime)
+
+
+def load_store(data_path=DATA_PATH, store_dir=STORE_DIR):
+    """The feature store for ``data_path``, refreshed first if the file changed."""
+    if not is_current(data_path, store_dir):
+        refresh(data_path, store_dir)
+    return FeatureStore(store_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Materialize encoded customer features')
+    parser.add_argument('command', choices=['refresh'])
+    parser.add_argument('data', nargs='?', default=DATA_PATH)
+    parser.add_argument('--store', default=STORE_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = refresh(args.data, args.store)
+    print(f"{stats['rows']:,} customers: {stats['encoded']:,} encoded, {stats['reused']:,} reused, "
+          f"{stats['removed']:,} removed ({time.perf_counter() - start:.2f}s) -> {args.store}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""Booster loading and small helpers around the saved XGBoost model."""
+import hashlib
+
+import xgboost as xgb
+
+from churnshield.features import MODEL_PATH
+
+
+def load_booster(path=MODEL_PATH):
+    booster = xgb.Booster()
+    booster.load_model(path)
+    return booster
+
+
+def model_version(path=MODEL_PATH):
+    """Short content hash of the model file, used to key cached artifacts."""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def predict(booster, X, feature_names, **kwargs):
+    """Score an encoded float32 matrix and return churn probabilities."""
+    return booster.predict(xgb.DMatrix(X, feature_names=feature_names), **kwargs)
+
+
+def contributions(booster, X, feature_names):
+    """Per-feature margin contributions (SHAP values) of each row, bias column dropped."""
+    return booster.predict(xgb.DMatrix(X, feature_names=feature_names), pred_contribs=True)[:, :-1]
+
@@ -0,0 +1,87 @@
+"""Compact binary packing of encoded feature vectors.
+
+A stored vector is 18 bytes instead of a ~1 KB JSON object:
+
+    byte  0       format version (``FORMAT_VERSION``)
+    bytes 1-5     the 37 0/1 flags, bit-packed in feature order
+    bytes 6-17    tenure, MonthlyCharges, TotalCharges as little-endian float32
+
+Flags are stored as ``value > 0.5``.  Packing and unpacking work on whole
+matrices; a bulk decode is one ``np.frombuffer`` plus ``np.unpackbits``.
+Legacy JSON values are still decoded; ``churnshield.db migrate`` rewrites
+them in place.
+"""
+import json
+
+import numpy as np
+
+from churnshield.features import NUMERIC_COLS
+
+FORMAT_VERSION = 1
+
+
+def _layout(feature_names):
+    numeric = [feature_names.index(col) for col in NUMERIC_COLS]
+    flags = [i for i in range(len(feature_names)) if i not in numeric]
+    record = np.dtype([('version', 'u1'),
+                       ('flags', 'u1', ((len(flags) + 7) // 8,)),
+                       ('numeric', '<f4', (len(numeric),))])
+    return numeric, flags, record
+
+
+def pack(X, feature_names):
+    """Pack an ``(n, 40)`` matrix into a list of ``bytes`` records."""
+    numeric, flags, record = _layout(feature_names)
+    X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+    out = np.zeros(len(X), dtype=record)
+    out['version'] = FORMAT_VERSION
+    out['flags'] = np.packbits(X[:, flags] > 0.5, axis=1)
+    out['numeric'] = X[:, numeric]
+    raw = out.tobytes()
+    size = record.itemsize
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+
+def unpack(blobs, feature_names):
+    """Decode packed records back into a float32 matrix."""
+    numeric, flags, record = _layout(feature_names)
+    rows = np.frombuffer(b''.join(blobs), dtype=record)
+    if len(rows) != len(blobs) or np.any(rows['version'] != FORMAT_VERSION):
+        raise ValueError(f'not a packed feature vector of format version {FORMAT_VERSION}')
+    X = np.empty((len(rows), len(feature_names)), dtype=np.float32)
+    X[:, flags] = np.unpackbits(rows['flags'], axis=1, count=len(flags))
+    X[:, numeric] = rows['numeric']
+    return X
+
+
+def is_packed(value):
+    return isinstance(value, (bytes, bytearray, memoryview))
+
+
+def decode_many(values, feature_names):
+    """Decode stored ``prediction_data`` values, packed or legacy JSON.
+
+    Returns ``(X, ok)``: the decoded rows and a mask of which inputs
+    decoded; unreadable values, including JSON that is not an object of
+    numbers, are skipped.
+    """
+    values = list(values)
+    ok = np.zeros(len(values), dtype=bool)
+    X = np.zeros((len(values), len(feature_names)), dtype=np.float32)
+    size = _layout(feature_names)[2].itemsize
+    packed = [i for i, v in enumerate(values) if is_packed(v) and len(v) == size and v[0] == FORMAT_VERSION]
+    if packed:
+        X[packed] = unpack([bytes(values[i]) for i in packed], feature_names)
+        ok[packed] = True
+    for i, v in enumerate(values):
+        if ok[i] or is_packed(v):
+            continue
+        try:
+            features = json.loads(v)
+            if not isinstance(features, dict):
+                continue
+            X[i] = [features.get(name, 0) for name in feature_names]
+            ok[i] = True
+        except (TypeError, ValueError):
+            continue
+    return X[ok], ok
@@ -0,0 +1,155 @@
+"""Portfolio percentile rank for churn scores.
+
+The portfolio's score distribution is kept per model version (and
+calibration table) as a sorted float32 array, produced by batch-scoring the
+customer file.  A rank is a binary search.  New scores go into a small
+unsorted buffer that is counted linearly and merged into the sorted array
+once it grows past ``MERGE_EVERY``, so refreshing never re-sorts the whole
+portfolio.  Each new score is also appended to a ``.pending`` log beside
+the snapshot, so a restart reloads it; a merge rewrites the snapshot and
+clears the log.
+
+    python -m churnshield.percentile build data.csv
+"""
+import argparse
+import os
+import threading
+
+import numpy as np
+
+from churnshield.batch import score_file
+from churnshield.calibration import scoring_version
+from churnshield.features import DATA_PATH, MODEL_PATH
+from churnshield.model import load_booster
+
+DISTRIBUTION_DIR = 'app/index'
+MERGE_EVERY = 1024
+
+
+def distribution_path(version, directory=DISTRIBUTION_DIR):
+    return os.path.join(directory, f'scores-{version}.npy')
+
+
+def _pending_path(path):
+    return path + '.pending'
+
+
+class ScoreDistribution:
+    """Sorted portfolio scores; with ``path``, added scores are persisted there."""
+
+    def __init__(self, scores, version=None, path=None):
+        self.scores = np.sort(np.asarray(scores, dtype=np.float32))
+        self.version = version
+        self.path = path
+        self.pending = []
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.scores) + len(self.pending)
+
+    def rank(self, score):
+        """Fraction of the portfolio scoring strictly below ``score``."""
+        with self.lock:
+            below = np.searchsorted(self.scores, np.float32(score), side='left')
+            below += sum(1 for s in self.pending if s < score)
+            total = len(self.scores) + len(self.pending)
+        return below / total if total else 0.0
+
+    def ranks(self, scores):
+        """Vectorized ``rank`` for an array of scores."""
+        self._merge()
+        return np.searchsorted(self.scores, np.asarray(scores, dtype=np.float32)) / max(len(self.scores), 1)
+
+    def add(self, score):
+        score = np.float32(score)
+        with self.lock:
+            self.pending.append(score)
+            if self.path:
+                with open(_pending_path(self.path), 'ab') as f:
+                    f.write(score.tobytes())
+            full = len(self.pending) >= MERGE_EVERY
+        if full:
+            if self.path:
+                self.save(self.path)
+            else:
+                self._merge()
+
+    def add_many(self, scores):
+        new = np.sort(np.asarray(scores, dtype=np.float32))
+        with self.lock:
+            self.scores = _merge_sorted(self.scores, new)
+
+    def _merge(self):
+        with self.lock:
+            self._fold()
+
+    def _fold(self):
+        """Merge the pending buffer into the sorted array (caller holds the lock)."""
+        if not self.pending:
+            return
+        new = np.sort(np.array(self.pending, dtype=np.float32))
+        self.pending = []
+        self.scores = _merge_sorted(self.scores, new)
+
+    def save(self, path):
+        """Write the merged snapshot; saving to ``self.path`` also clears its pending log."""
+        with self.lock:
+            self._fold()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                np.save(f, self.scores)
+            os.replace(path + '.tmp', path)
+            if path == self.path and os.path.exists(_pending_path(path)):
+                os.remove(_pending_path(path))
+
+
+def _merge_sorted(a, b):
+    """Merge two sorted arrays in O(len(a) + len(b))."""
+    out = np.empty(len(a) + len(b), dtype=np.float32)
+    pos = np.searchsorted(a, b, side='right') + np.arange(len(b))
+    mask = np.ones(len(out), dtype=bool)
+    mask[pos] = False
+    out[pos] = b
+    out[mask] = a
+    return out
+
+
+def build_distribution(data_path=DATA_PATH, model_path=MODEL_PATH, directory=DISTRIBUTION_DIR):
+    """Batch-score the portfolio and store its sorted score array for this model version."""
+    booster = load_booster(model_path)
+    version = scoring_version(model_path)
+    scores = np.concatenate([chunk['churn_prob'].to_numpy(dtype=np.float32)
+                             for chunk, _ in score_file(data_path, booster=booster)])
+    path = distribution_path(version, directory)
+    distribution = ScoreDistribution(scores, version, path)
+    distribution.save(path)
+    return distribution
+
+
+def load_distribution(data_path=DATA_PATH, model_path=MODEL_PATH, directory=DISTRIBUTION_DIR):
+    """Score distribution for the current model, built on first use, with its pending log replayed."""
+    version = scoring_version(model_path)
+    path = distribution_path(version, directory)
+    if not os.path.exists(path):
+        return build_distribution(data_path, model_path, directory)
+    distribution = ScoreDistribution(np.load(path), version, path)
+    if os.path.exists(_pending_path(path)):
+        with open(_pending_path(path), 'rb') as f:
+            data = f.read()
+        # A crash mid-append can leave a partial trailing record.
+        distribution.pending = list(np.frombuffer(data[:len(data) // 4 * 4], dtype=np.float32))
+    return distribution
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the portfolio score distribution')
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('data', nargs='?', default=DATA_PATH)
+    args = parser.parse_args()
+    distribution = build_distribution(args.data)
+    print(f"{len(distribution):,} scores for model {distribution.version} -> "
+          f"{distribution_path(distribution.version)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""Online performance monitor for the served model.
+
+Stored predictions are joined with churn outcomes in the order the
+outcomes arrive (``outcome_log``), not in prediction order, so a late label
+for an old prediction is still picked up.  Each labeled score updates, in
+O(1):
+- a confusion matrix at the HIGH and MEDIUM cutoffs, for the current
+  window of ``WINDOW`` labels;
+- the same matrices and a pair of binned score histograms (churned /
+  retained) over all labels.
+A label that replaces an earlier one for the same prediction is moved
+between cells of the window that counted it, so every prediction is
+counted once with its latest label.  AUC is estimated from the histograms
+on demand.  Alerts fire when
+precision or recall at the HIGH band in a full window falls more than
+``MAX_DROP`` below the model's held-out baseline.
+
+    python -m churnshield.performance report
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from churnshield.db import DB_PATH
+from churnshield.scoring import HIGH_THRESHOLD, MEDIUM_THRESHOLD
+
+WINDOW = 500
+KEEP_WINDOWS = 12
+SCORE_BINS = 200
+MIN_WINDOW = 100
+MAX_DROP = 0.1
+# Minimum seconds between polls from ``poll_if_due``.
+POLL_INTERVAL = 30.0
+
+
+def _rates(cm):
+    """Precision and recall from a 2x2 ``[predicted, actual]`` count matrix."""
+    tp, fp, fn = cm[1, 1], cm[1, 0], cm[0, 1]
+    precision = tp / (tp + fp) if tp + fp else None
+    recall = tp / (tp + fn) if tp + fn else None
+    return precision, recall
+
+
+def _fmt(value):
+    return '   -' if value is None else f'{value:.3f}'
+
+
+def binned_auc(pos, neg):
+    """AUC from per-bin counts of positives and negatives (ties count half)."""
+    n_pos, n_neg = pos.sum(), neg.sum()
+    if not n_pos or not n_neg:
+        return None
+    below = np.cumsum(neg) - neg
+    return float(np.sum(pos * (below + 0.5 * neg)) / (n_pos * n_neg))
+
+
+class PerformanceMonitor:
+    """Windowed confusion matrices and binned AUC over labeled live scores."""
+
+    def __init__(self, high=HIGH_THRESHOLD, medium=MEDIUM_THRESHOLD, window=WINDOW,
+                 bins=SCORE_BINS, baseline=None):
+        self.cutoffs = np.array([high, medium])
+        self.window = window
+        self.bins = bins
+        self.baseline = baseline
+        # [cutoff, predicted > cutoff, churned]
+        self.current = np.zeros((2, 2, 2), dtype=np.int64)
+        self.total = np.zeros_like(self.current)
+        self.windows = deque(maxlen=KEEP_WINDOWS)
+        self.hist = np.zeros((2, bins), dtype=np.int64)
+        self.closed = 0
+        # outcome_log id of the last ingested label, and per prediction the
+        # window it was counted in and its label then.
+        self.cursor = 0
+        self.labels = {}
+        self.lock = threading.Lock()
+        # Serializes polls so concurrent sessions never ingest the same outcomes twice.
+        self.poll_lock = threading.Lock()
+        self.polled_at = None
+
+    @property
+    def n(self):
+        return int(self.total[0].sum())
+
+    def _cell(self, score):
+        return (score > self.cutoffs).astype(np.int64), min(int(score * self.bins), self.bins - 1)
+
+    def update(self, score, churned):
+        """Add one labeled score; return the number of the window it was counted in."""
+        flagged, b = self._cell(score)
+        actual = int(bool(churned))
+        with self.lock:
+            window = self.closed
+            self.current[(0, 1), flagged, actual] += 1
+            self.total[(0, 1), flagged, actual] += 1
+            self.hist[actual, b] += 1
+            if self.current[0].sum() >= self.window:
+                self.windows.append(self.current.copy())
+                self.current[:] = 0
+                self.closed += 1
+        return window
+
+    def relabel(self, score, old, new, window):
+        """Move a score counted in ``window`` with label ``old`` to label ``new``.
+
+        A window no longer kept only has the all-time counts corrected.
+        """
+        flagged, b = self._cell(score)
+        old, new = int(bool(old)), int(bool(new))
+        with self.lock:
+            first_kept = self.closed - len(self.windows)
+            if window == self.closed:
+                matrices = [self.current, self.total]
+            elif window >= first_kept:
+                matrices = [self.windows[window - first_kept], self.total]
+            else:
+                matrices = [self.total]
+            for cm in matrices:
+                cm[(0, 1), flagged, old] -= 1
+                cm[(0, 1), flagged, new] += 1
+            self.hist[old, b] -= 1
+            self.hist[new, b] += 1
+
+    def update_many(self, scores, churned):
+        for score, label in zip(scores, churned):
+            self.update(float(score), label)
+
+    def poll_if_due(self, db_path=DB_PATH, interval=POLL_INTERVAL):
+        """``poll`` unless one ran in the last ``interval`` seconds or is running now.
+
+        For callers on a hot path (every dashboard rerun): they never wait
+        on the database or on each other.
+        """
+        if self.polled_at is not None and time.monotonic() - self.polled_at < interval:
+            return 0
+        if not self.poll_lock.acquire(blocking=False):
+            return 0
+        try:
+            if self.polled_at is not None and time.monotonic() - self.polled_at < interval:
+                return 0
+            self.polled_at = time.monotonic()
+            return self._poll(db_path)
+        finally:
+            self.poll_lock.release()
+
+    def poll(self, db_path=DB_PATH):
+        """Ingest outcomes recorded since the last poll; return how many labels were read."""
+        with self.poll_lock:
+            return self._poll(db_path)
+
+    def _poll(self, db_path):
+        """``poll``'s body; the caller holds ``poll_lock``."""
+        if not os.path.exists(db_path):
+            return 0
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute('''SELECT l.id, l.prediction_id, p.churn_prob, l.churned
+                                   FROM outcome_log l JOIN predictions p ON p.id = l.prediction_id
+                                   WHERE l.id > ? ORDER BY l.id''', (self.cursor,)).fetchall()
+        except sqlite3.Error:
+            rows = []
+        finally:
+            conn.close()
+        for seq, prediction_id, score, churned in rows:
+            self.cursor = seq
+            if score is None:
+                continue
+            churned = int(bool(churned))
+            seen = self.labels.get(prediction_id)
+            if seen is None:
+                self.labels[prediction_id] = (self.update(float(score), churned), churned)
+            elif seen[1] != churned:
+                self.relabel(float(score), seen[1], churned, seen[0])
+                self.labels[prediction_id] = (seen[0], churned)
+        return len(rows)
+
+    def _summary(self, cm, label):
+        n = int(cm[0].sum())
+        precision, recall = _rates(cm[0])
+        medium_precision, medium_recall = _rates(cm[1])
+        return {'window': label, 'labels': n, 'churn_rate': cm[0, :, 1].sum() / n if n else None,
+                'high_precision': precision, 'high_recall': recall,
+                'medium_precision': medium_precision, 'medium_recall': medium_recall}
+
+    def report(self):
+        """One row per kept window (oldest first), the open window and the all-time totals."""
+        with self.lock:
+            windows = list(self.windows)
+            current, total = self.current.copy(), self.total.copy()
+        rows = [self._summary(cm, f'#{i + 1}') for i, cm in enumerate(windows)]
+        rows.append(self._summary(current, 'open'))
+        rows.append(self._summary(total, 'all'))
+        return rows
+
+    def auc(self):
+        with self.lock:
+            return binned_auc(self.hist[1], self.hist[0])
+
+    def alerts(self):
+        """HIGH-band precision/recall drops in the latest window with enough labels."""
+        if not self.baseline:
+            return []
+        with self.lock:
+            candidates = [self.current.copy()] + list(self.windows)[::-1]
+        cm = next((c for c in candidates if c[0].sum() >= MIN_WINDOW), None)
+        if cm is None:
+            return []
+        out = []
+        for metric, value in zip(('precision', 'recall'), _rates(cm[0])):
+            expected = self.baseline.get(metric)
+            if value is not None and expected is not None and value < expected - MAX_DROP:
+                out.append({'metric': f'high_{metric}', 'value': value, 'baseline': expected,
+                            'labels': int(cm[0].sum())})
+        return out
+
+
+def holdout_baseline(high=HIGH_THRESHOLD, calibrator=None):
+    """HIGH-band precision/recall of the current model on the notebook's held-out split.
+
+    The calibration table is usually fitted on that same split, so scores
+    are cross-fitted with the table's method rather than mapped in-sample.
+    """
+    from churnshield.calibration import cross_fit, load_calibrator, notebook_holdout
+    from churnshield.features import load_feature_names
+    from churnshield.model import load_booster, predict
+
+    feature_names = load_feature_names()
+    X, y = notebook_holdout(feature_names=feature_names)
+    calibrator = calibrator or load_calibrator()
+    scores = predict(load_booster(), X, feature_names).astype(np.float64)
+    if not calibrator.identity:
+        scores = cross_fit(scores, y, calibrator.method)
+    flagged = scores > high
+    tp = int(np.sum(flagged & (y == 1)))
+    return {'precision': tp / max(int(flagged.sum()), 1), 'recall': tp / max(int(y.sum()), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Live model performance from recorded outcomes')
+    parser.add_argument('command', choices=['report'])
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--window', type=int, default=WINDOW)
+    args = parser.parse_args()
+
+    from churnshield.thresholds import load_thresholds
+
+    high, medium = load_thresholds()
+    monitor = PerformanceMonitor(high, medium, args.window, baseline=holdout_baseline(high))
+    n = monitor.poll(args.db)
+    print(f"{n} labeled predictions; baseline HIGH precision={monitor.baseline['precision']:.3f} "
+          f"recall={monitor.baseline['recall']:.3f}")
+    for r in monitor.report():
+        print(f"{r['window']:>5s} n={r['labels']:5d} precision={_fmt(r['high_precision'])} "
+              f"recall={_fmt(r['high_recall'])}")
+    auc = monitor.auc()
+    print(f"binned AUC: {'-' if auc is None else f'{auc:.4f}'}")
+    for a in monitor.alerts():
+        print(f"ALERT {a['metric']} {a['value']:.3f} < baseline {a['baseline']:.3f} (n={a['labels']})")
+
+
+if __name__ == '__main__':
+    main()
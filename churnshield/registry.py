@@ -0,0 +1,145 @@
+"""Local model registry.
+
+Every published booster lives in ``app/model/registry/<version>/`` as
+``churn_model.json`` plus a ``meta.json`` (parent version, metrics, status)
+and, when they were fitted for it, its own ``calibration.json`` and
+``thresholds.json``.  The app keeps loading ``app/model/churn_model.json``;
+promoting a version atomically replaces that file, then the live tables
+next to it, and marks the previous live model retired.  Table loaders fall
+back to the registry copy for the model they are given, so a reader that
+sees the new model before the new tables still gets a matching pair.
+"""
+import json
+import os
+import shutil
+from datetime import datetime
+
+from churnshield.features import MODEL_PATH
+from churnshield.model import load_booster, model_version
+
+REGISTRY_DIR = 'app/model/registry'
+# Per-model tables kept next to the live model and in every registry entry.
+TABLES = ('calibration.json', 'thresholds.json')
+
+
+def _meta_path(version, registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, version, 'meta.json')
+
+
+def model_path(version, registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, version, 'churn_model.json')
+
+
+def table_path(version, name, registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, version, name)
+
+
+def _live_table(live_path, name):
+    return os.path.join(os.path.dirname(live_path), name)
+
+
+def _tagged_for(path, version):
+    """Whether the table at ``path`` was fitted for model ``version``."""
+    if not os.path.exists(path):
+        return False
+    with open(path) as f:
+        table = json.load(f)
+    tag = table.get('model_version') or table.get('scoring_version') or ''
+    return tag.split('-')[0] == version
+
+
+def _copy_atomic(src, dst):
+    shutil.copyfile(src, dst + '.tmp')
+    os.replace(dst + '.tmp', dst)
+
+
+def read_meta(version, registry_dir=REGISTRY_DIR):
+    with open(_meta_path(version, registry_dir)) as f:
+        return json.load(f)
+
+
+def _write_meta(meta, registry_dir=REGISTRY_DIR):
+    path = _meta_path(meta['version'], registry_dir)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def publish(booster, parent=None, metrics=None, source=None, registry_dir=REGISTRY_DIR):
+    """Store a booster as a candidate version and return its version id."""
+    tmp = os.path.join(registry_dir, '.publishing.json')
+    os.makedirs(registry_dir, exist_ok=True)
+    booster.save_model(tmp)
+    version = model_version(tmp)
+    os.makedirs(os.path.join(registry_dir, version), exist_ok=True)
+    os.replace(tmp, model_path(version, registry_dir))
+    _write_meta({
+        'version': version,
+        'parent': parent,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'status': 'candidate',
+        'n_trees': booster.num_boosted_rounds(),
+        'metrics': metrics or {},
+        'source': source,
+    }, registry_dir)
+    return version
+
+
+def register_live(live_path=MODEL_PATH, registry_dir=REGISTRY_DIR):
+    """Make sure the currently served model and its tables have a registry entry; return its version."""
+    version = model_version(live_path)
+    if not os.path.exists(_meta_path(version, registry_dir)):
+        os.makedirs(os.path.join(registry_dir, version), exist_ok=True)
+        shutil.copyfile(live_path, model_path(version, registry_dir))
+        _write_meta({
+            'version': version,
+            'parent': None,
+            'created_at': datetime.fromtimestamp(os.path.getmtime(live_path)).isoformat(timespec='seconds'),
+            'status': 'live',
+            'n_trees': load_booster(live_path).num_boosted_rounds(),
+            'metrics': {},
+            'source': 'customer_churn.ipynb',
+        }, registry_dir)
+    # The live tables may have been refitted since; they win over the archived copy.
+    for name in TABLES:
+        live = _live_table(live_path, name)
+        if _tagged_for(live, version):
+            _copy_atomic(live, table_path(version, name, registry_dir))
+    return version
+
+
+def list_versions(status=None, registry_dir=REGISTRY_DIR):
+    """Metadata of every registered version, newest first."""
+    if not os.path.isdir(registry_dir):
+        return []
+    metas = [read_meta(v, registry_dir) for v in os.listdir(registry_dir)
+             if os.path.exists(_meta_path(v, registry_dir))]
+    if status:
+        metas = [m for m in metas if m['status'] == status]
+    return sorted(metas, key=lambda m: m['created_at'], reverse=True)
+
+
+def load_version(version, registry_dir=REGISTRY_DIR):
+    return load_booster(model_path(version, registry_dir))
+
+
+def promote(version, live_path=MODEL_PATH, registry_dir=REGISTRY_DIR):
+    """Serve ``version``: atomically swap in its model, then its calibration and thresholds."""
+    previous = register_live(live_path, registry_dir)
+    tmp = live_path + '.promoting'
+    shutil.copyfile(model_path(version, registry_dir), tmp)
+    os.replace(tmp, live_path)
+    # Until these land, loaders find the new model's tables in the registry.
+    for name in TABLES:
+        if os.path.exists(table_path(version, name, registry_dir)):
+            _copy_atomic(table_path(version, name, registry_dir), _live_table(live_path, name))
+
+    if previous != version:
+        meta = read_meta(previous, registry_dir)
+        meta['status'] = 'retired'
+        _write_meta(meta, registry_dir)
+    meta = read_meta(version, registry_dir)
+    meta['status'] = 'live'
+    meta['promoted_at'] = datetime.now().isoformat(timespec='seconds')
+    _write_meta(meta, registry_dir)
+    return previous
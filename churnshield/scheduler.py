@@ -0,0 +1,205 @@
+"""Retraining scheduler.
+
+A small daemon that periodically checks three signals against
+churn_prediction.db — drift alerts on stored predictions, the live model's
+AUC on outcomes labeled since the last job, and the number of those new
+labels — and, when one crosses its threshold, runs ``churnshield.updater``
+as a subprocess.  The child is reniced and gets CPU-time, address-space and
+thread caps so it never starves the app's serving processes.  Every job is
+recorded in the ``retrain_jobs`` table with the range of ``outcome_log``
+ids it trained on, so "new" means labels recorded since the last job in
+arrival order, whatever predictions they belong to; the updater itself
+promotes the candidate only if it beats the live model on its holdout.
+
+    python -m churnshield.scheduler run --interval 900
+    python -m churnshield.scheduler check        # evaluate triggers once, no job
+    python -m churnshield.scheduler history
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from churnshield.db import DB_PATH, connect, labeled_predictions, latest_outcome
+from churnshield.drift import DriftMonitor, load_reference, uncollected_features
+from churnshield.features import load_feature_names
+from churnshield.model import load_booster
+
+CHECK_INTERVAL = 900
+COOLDOWN = 6 * 3600
+MIN_NEW_LABELS = 1000
+MIN_AUC = 0.75
+MIN_LABELED = 200
+
+NICE = 10
+NTHREAD = 1
+CPU_SECONDS = 600
+MEMORY_BYTES = 2 * 1024 ** 3
+TIMEOUT = 1800
+# A job still 'running' this long after it started lost its scheduler
+# (crash, kill, reboot) before it could record its outcome.
+STALE_AFTER = TIMEOUT + 300
+
+
+def last_job(conn):
+    return conn.execute('''SELECT id, started_at, last_id, status FROM retrain_jobs
+                           ORDER BY id DESC LIMIT 1''').fetchone()
+
+
+def last_trained_id(conn):
+    """Highest ``outcome_log`` id already consumed by a successful job."""
+    row = conn.execute("SELECT MAX(last_id) FROM retrain_jobs WHERE status = 'done'").fetchone()
+    return row[0] or 0
+
+
+def signals(conn, db_path=DB_PATH):
+    """Current trigger inputs: new labels, live AUC on them, drift alerts."""
+    from churnshield.updater import evaluate
+
+    since, until = last_trained_id(conn), latest_outcome(conn)
+    feature_names = load_feature_names()
+    _, X, y = labeled_predictions(conn, feature_names, since, until)
+    auc = None
+    if len(y) >= MIN_LABELED and 0 < y.sum() < len(y):
+        auc = evaluate(load_booster(), X, y, feature_names)['auc']
+    monitor = DriftMonitor(load_reference(), exclude=uncollected_features(feature_names))
+    monitor.seed_from_db(db_path)
+    return {
+        'since_id': since,
+        'last_id': max(until, since),
+        'new_labels': int(len(y)),
+        'auc': auc,
+        'drift_alerts': [r['feature'] for r in monitor.alerts()],
+    }
+
+
+def trigger_reason(state, conn):
+    """Why a job should run now, or None."""
+    job = last_job(conn)
+    if job:
+        age = conn.execute("SELECT strftime('%s', 'now') - strftime('%s', ?)", (job[1],)).fetchone()[0]
+        if job[3] == 'running':
+            if age < STALE_AFTER:
+                return None
+            conn.execute("UPDATE retrain_jobs SET status = 'failed', detail = ? WHERE id = ? AND status = 'running'",
+                         (f'no result {age}s after start; scheduler presumed dead', job[0]))
+            conn.commit()
+        if age < COOLDOWN:
+            return None
+    if state['new_labels'] < MIN_LABELED:
+        return None
+    if state['drift_alerts']:
+        return 'drift: ' + ', '.join(state['drift_alerts'][:5])
+    if state['auc'] is not None and state['auc'] < MIN_AUC:
+        return f"auc {state['auc']:.3f} < {MIN_AUC}"
+    if state['new_labels'] >= MIN_NEW_LABELS:
+        return f"{state['new_labels']} new labels"
+    return None
+
+
+def _limit_child(nice, cpu_seconds, memory_bytes):
+    """preexec_fn for the training subprocess (POSIX only)."""
+    def apply():
+        import resource
+
+        os.nice(nice)
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    return apply
+
+
+def run_job(conn, reason, state, db_path=DB_PATH, nthread=NTHREAD, nice=NICE,
+            cpu_seconds=CPU_SECONDS, memory_bytes=MEMORY_BYTES, timeout=TIMEOUT):
+    """Run one capped updater subprocess and record it in ``retrain_jobs``."""
+    cur = conn.execute('INSERT INTO retrain_jobs (reason, since_id, last_id) VALUES (?, ?, ?)',
+                       (reason, state['since_id'], state['last_id']))
+    conn.commit()
+    job_id = cur.lastrowid
+
+    cmd = [sys.executable, '-m', 'churnshield.updater', '--db', db_path,
+           '--since-id', str(state['since_id']), '--until-id', str(state['last_id']),
+           '--nthread', str(nthread), '--promote', '--json']
+    env = dict(os.environ, OMP_NUM_THREADS=str(nthread))
+    preexec = _limit_child(nice, cpu_seconds, memory_bytes) if os.name == 'posix' else None
+    start = time.perf_counter()
+    candidate, promoted = None, False
+    try:
+        proc = subprocess.run(cmd, env=env, preexec_fn=preexec, capture_output=True,
+                              text=True, timeout=timeout)
+        if proc.returncode == 0:
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            candidate, promoted = result['version'], result['promoted']
+            status, detail = 'done', json.dumps(result['metrics'])
+        else:
+            status, detail = 'failed', (proc.stderr or proc.stdout).strip()[-2000:]
+    except subprocess.TimeoutExpired:
+        status, detail = 'timeout', f'killed after {timeout}s'
+    duration = time.perf_counter() - start
+
+    conn.execute('''UPDATE retrain_jobs SET duration = ?, status = ?, candidate = ?,
+                    promoted = ?, detail = ? WHERE id = ?''',
+                 (duration, status, candidate, int(promoted), detail, job_id))
+    conn.commit()
+    return {'id': job_id, 'status': status, 'duration': duration,
+            'candidate': candidate, 'promoted': promoted, 'detail': detail}
+
+
+def tick(db_path=DB_PATH, **limits):
+    """One scheduler pass: check signals, run a job if triggered."""
+    conn = connect(db_path)
+    try:
+        state = signals(conn, db_path)
+        reason = trigger_reason(state, conn)
+        if reason is None:
+            return state, None
+        return state, run_job(conn, reason, state, db_path, **limits)
+    finally:
+        conn.close()
+
+
+def history(conn, limit=20):
+    return conn.execute('''SELECT id, started_at, reason, status, duration, candidate, promoted
+                           FROM retrain_jobs ORDER BY id DESC LIMIT ?''', (limit,)).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drift/label-triggered retraining scheduler')
+    parser.add_argument('command', choices=['run', 'check', 'history'])
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--interval', type=int, default=CHECK_INTERVAL, help='seconds between checks')
+    parser.add_argument('--nice', type=int, default=NICE)
+    parser.add_argument('--nthread', type=int, default=NTHREAD)
+    parser.add_argument('--cpu-seconds', type=int, default=CPU_SECONDS)
+    parser.add_argument('--memory-mb', type=int, default=MEMORY_BYTES // 1024 ** 2)
+    args = parser.parse_args()
+
+    if args.command == 'history':
+        conn = connect(args.db)
+        for row in history(conn):
+            job_id, started, reason, status, duration, candidate, promoted = row
+            print(f"#{job_id} {started} {status:8s} {duration or 0:7.1f}s "
+                  f"{candidate or '-':12s} {'promoted' if promoted else ''}  {reason}")
+        conn.close()
+        return
+    if args.command == 'check':
+        conn = connect(args.db)
+        state = signals(conn, args.db)
+        print(json.dumps(state))
+        print(f"trigger: {trigger_reason(state, conn)}")
+        conn.close()
+        return
+
+    limits = {'nice': args.nice, 'nthread': args.nthread, 'cpu_seconds': args.cpu_seconds,
+              'memory_bytes': args.memory_mb * 1024 ** 2}
+    while True:
+        state, job = tick(args.db, **limits)
+        if job:
+            print(f"job #{job['id']} {job['status']} in {job['duration']:.1f}s "
+                  f"candidate={job['candidate']} promoted={job['promoted']}", flush=True)
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
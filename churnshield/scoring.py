@@ -0,0 +1,24 @@
+"""Risk bands: the HIGH/MEDIUM/LOW cut applied to calibrated churn probabilities.
+
+The 0.7/0.4 defaults apply until ``churnshield.thresholds`` has tuned
+cutoffs for the served scoring version.
+"""
+import numpy as np
+
+HIGH_THRESHOLD = 0.7
+MEDIUM_THRESHOLD = 0.4
+BANDS = np.array(['LOW', 'MEDIUM', 'HIGH'])
+
+
+def risk_band(prob, high=HIGH_THRESHOLD, medium=MEDIUM_THRESHOLD):
+    if prob > high:
+        return 'HIGH'
+    elif prob > medium:
+        return 'MEDIUM'
+    return 'LOW'
+
+
+def band_codes(probs, high=HIGH_THRESHOLD, medium=MEDIUM_THRESHOLD):
+    """Vectorized band lookup: 0 = LOW, 1 = MEDIUM, 2 = HIGH."""
+    probs = np.asarray(probs)
+    return (probs > medium).astype(np.int8) + (probs > high)
@@ -0,0 +1,156 @@
+"""Shadow scoring of a registry candidate on live traffic.
+
+The app hands every new encoded vector it scores to ``ShadowScorer.submit``,
+which only appends to a bounded queue (full queue: the record is dropped,
+never waited on).  A background thread drains the queue in batches, scores
+them with the candidate booster, mapped through the candidate's own
+calibration table and banded at its own cutoffs (both fitted by the updater
+and kept in its registry entry), and writes live vs. shadow scores and
+bands to the ``shadow_scores`` table.  Candidates without a calibration
+table of their own are not shadowed: their raw scores are not comparable
+with the live calibrated ones.  ``summary`` reports agreement rate, score
+differences and band flips per candidate.
+
+    python -m churnshield.shadow summary
+"""
+import argparse
+import queue
+import threading
+
+import numpy as np
+
+from churnshield import registry
+from churnshield.calibration import load_calibrator
+from churnshield.db import DB_PATH, connect
+from churnshield.model import predict
+from churnshield.scoring import BANDS, HIGH_THRESHOLD, MEDIUM_THRESHOLD, band_codes
+from churnshield.thresholds import load_thresholds
+
+QUEUE_SIZE = 1024
+BATCH_SIZE = 64
+SCORE_TOLERANCE = 0.05
+
+
+def latest_candidate(registry_dir=registry.REGISTRY_DIR):
+    """Newest registry version still waiting for promotion that has its own calibration, or None."""
+    for meta in registry.list_versions('candidate', registry_dir):
+        path = registry.model_path(meta['version'], registry_dir)
+        if not load_calibrator(model_path=path, registry_dir=registry_dir).identity:
+            return meta['version']
+    return None
+
+
+class ShadowScorer:
+    """Background scorer comparing a candidate model with the live one."""
+
+    def __init__(self, version, feature_names, live_version, high=HIGH_THRESHOLD,
+                 medium=MEDIUM_THRESHOLD, db_path=DB_PATH, registry_dir=registry.REGISTRY_DIR):
+        self.version = version
+        self.live_version = live_version
+        self.feature_names = feature_names
+        self.high, self.medium = high, medium
+        self.db_path = db_path
+        self.booster = registry.load_version(version, registry_dir)
+        # What the candidate would serve once promoted: its own calibration and cutoffs.
+        path = registry.model_path(version, registry_dir)
+        self.calibrator = load_calibrator(model_path=path, registry_dir=registry_dir)
+        self.shadow_high, self.shadow_medium = load_thresholds(model_path=path, registry_dir=registry_dir)
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.dropped = 0
+        self.errors = 0
+        self.thread = threading.Thread(target=self._run, name=f'shadow-{version}', daemon=True)
+        self.thread.start()
+
+    def submit(self, x, live_prob):
+        """Queue one encoded vector and the live probability served for it."""
+        try:
+            self.queue.put_nowait((np.asarray(x, dtype=np.float32), float(live_prob)))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        conn = connect(self.db_path)
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._score(conn, batch)
+            except Exception:
+                # A broken candidate must never take the app down with it.
+                self.errors += len(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    def _score(self, conn, batch):
+        X = np.stack([x for x, _ in batch])
+        live = np.array([p for _, p in batch])
+        shadow = self.calibrator.apply(predict(self.booster, X, self.feature_names)).astype(np.float64)
+        live_bands = band_codes(live, self.high, self.medium)
+        shadow_bands = band_codes(shadow, self.shadow_high, self.shadow_medium)
+        conn.executemany('''INSERT INTO shadow_scores
+                            (candidate, live_version, live_prob, shadow_prob, live_band, shadow_band)
+                            VALUES (?, ?, ?, ?, ?, ?)''',
+                         [(self.version, self.live_version, float(lp), float(sp),
+                           BANDS[lb], BANDS[sb])
+                          for lp, sp, lb, sb in zip(live, shadow, live_bands, shadow_bands)])
+        conn.commit()
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        self.queue.join()
+
+
+def summary(conn, candidate=None, tolerance=SCORE_TOLERANCE):
+    """Agreement stats per candidate: records, agreement rate, score gaps, band flips."""
+    where, params = ('WHERE candidate = ?', (candidate,)) if candidate else ('', ())
+    stats = conn.execute(f'''SELECT candidate, live_version, COUNT(*),
+                                    AVG(live_band = shadow_band AND ABS(shadow_prob - live_prob) <= ?),
+                                    AVG(live_band != shadow_band),
+                                    AVG(shadow_prob - live_prob),
+                                    AVG(ABS(shadow_prob - live_prob)),
+                                    MAX(ABS(shadow_prob - live_prob)),
+                                    MAX(scored_at)
+                             FROM shadow_scores {where}
+                             GROUP BY candidate, live_version
+                             ORDER BY MAX(scored_at) DESC''', (tolerance,) + params).fetchall()
+    flips = conn.execute(f'''SELECT candidate, live_band, shadow_band, COUNT(*)
+                             FROM shadow_scores {where} {'AND' if where else 'WHERE'} live_band != shadow_band
+                             GROUP BY candidate, live_band, shadow_band''', params).fetchall()
+    out = []
+    for cand, live_version, n, agree, flip_rate, mean_diff, mean_abs, max_abs, last in stats:
+        out.append({
+            'candidate': cand, 'live_version': live_version, 'records': n,
+            'agreement_rate': agree, 'band_flip_rate': flip_rate,
+            'mean_diff': mean_diff, 'mean_abs_diff': mean_abs, 'max_abs_diff': max_abs,
+            'last_scored': last,
+            'flips': {f'{lb}->{sb}': count for c, lb, sb, count in flips if c == cand},
+        })
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shadow-scoring agreement between candidates and the live model')
+    parser.add_argument('command', choices=['summary'])
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--candidate')
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    rows = summary(conn, args.candidate)
+    conn.close()
+    if not rows:
+        print('No shadow scores recorded')
+    for r in rows:
+        print(f"{r['candidate']} vs {r['live_version']}: {r['records']:,} records, "
+              f"agreement {r['agreement_rate']:.1%}, band flips {r['band_flip_rate']:.1%}, "
+              f"mean |diff| {r['mean_abs_diff']:.4f} (max {r['max_abs_diff']:.4f})")
+        for flip, count in sorted(r['flips'].items(), key=lambda kv: -kv[1]):
+            print(f"    {flip:14s} {count:,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Multi-process sharded scoring for very large customer files.
+
+The CSV is split into byte ranges of about ``SHARD_BYTES`` aligned on line
+boundaries, many more than there are workers, and handed out one at a time
+so a worker only ever holds one range's text and DataFrame however large
+the file is.  Each worker process loads the booster once, counts, parses,
+encodes and scores its ranges locally, and writes the probabilities into a
+shared-memory result array at the range's row offset, so scores are never
+pickled between processes and the only shared segment is 4 bytes a row.
+
+    python -m churnshield.sharded big.csv --workers 8 -o scored.npy
+"""
+import argparse
+import io
+import os
+import time
+from multiprocessing import Pool, resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from churnshield.batch import score_matrix
+from churnshield.calibration import load_calibrator
+from churnshield.features import DATA_PATH, FEATURES_PATH, MODEL_PATH, encode_frame, load_feature_names
+from churnshield.model import load_booster
+
+SHARD_BYTES = 48 * 1024 * 1024
+
+_worker = {}
+
+
+def _init_worker(model_path, features_path):
+    booster = load_booster(model_path)
+    # One scoring thread per process; parallelism comes from the shards.
+    booster.set_param({'nthread': 1})
+    _worker['booster'] = booster
+    _worker['feature_names'] = load_feature_names(features_path)
+    _worker['calibrator'] = load_calibrator(model_path=model_path)
+
+
+def shard_ranges(path, n_shards):
+    """Byte ranges ``[(start, end), ...]`` covering the data rows, each ending on a newline."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        start = f.tell()
+        bounds = [start]
+        for i in range(1, n_shards):
+            f.seek(max(start + (size - start) * i // n_shards, bounds[-1]))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+        bounds.append(size)
+    columns = header.decode().strip().split(',')
+    return columns, [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def _attach(name):
+    shm = shared_memory.SharedMemory(name=name)
+    # Before Python 3.13 attaching also registers the segment with the
+    # resource tracker, which would unlink it behind the parent's back.
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def _read_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def _count_rows(args):
+    """Rows ``pd.read_csv`` will parse from a range: blank and whitespace-only lines are skipped."""
+    path, start, end = args
+    return sum(1 for line in _read_range(path, start, end).splitlines() if line.strip())
+
+
+def shard_count(path, workers, shard_bytes=SHARD_BYTES):
+    """At least one range per worker, and enough that none exceeds ``shard_bytes``."""
+    return max(workers, -(-os.path.getsize(path) // shard_bytes))
+
+
+def _score_shard(args):
+    path, start, end, columns, offset, n_rows, total, out_name = args
+    feature_names = _worker['feature_names']
+    chunk = pd.read_csv(io.BytesIO(_read_range(path, start, end)), header=None, names=columns)
+    if len(chunk) != n_rows:
+        raise ValueError(f"Shard at byte {start} parsed {len(chunk)} rows, expected {n_rows}")
+    probs, stats = score_matrix(_worker['booster'], encode_frame(chunk, feature_names), feature_names,
+                                calibrator=_worker['calibrator'])
+    out_shm = _attach(out_name)
+    try:
+        out = np.ndarray((total,), dtype=np.float32, buffer=out_shm.buf)
+        out[offset:offset + n_rows] = probs
+        del out
+        return stats
+    finally:
+        out_shm.close()
+
+
+def score_file_sharded(path, workers=None, model_path=MODEL_PATH, features_path=FEATURES_PATH,
+                       shard_bytes=SHARD_BYTES):
+    """Churn probability for every row of ``path``, in file order."""
+    workers = workers or os.cpu_count() or 1
+    columns, ranges = shard_ranges(path, shard_count(path, workers, shard_bytes))
+
+    with Pool(workers, initializer=_init_worker, initargs=(model_path, features_path)) as pool:
+        counts = list(pool.imap(_count_rows, [(path, a, b) for a, b in ranges]))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(int)
+        total = int(offsets[-1])
+
+        out_shm = shared_memory.SharedMemory(create=True, size=max(total * 4, 1))
+        try:
+            tasks = [(path, a, b, columns, int(offsets[i]), counts[i], total, out_shm.name)
+                     for i, (a, b) in enumerate(ranges)]
+            stats = list(pool.imap_unordered(_score_shard, tasks))
+            probs = np.ndarray((total,), dtype=np.float32, buffer=out_shm.buf).copy()
+        finally:
+            out_shm.close()
+            out_shm.unlink()
+
+    unique = sum(s['unique'] for s in stats)
+    return probs, {'rows': total, 'unique': unique, 'shards': len(ranges)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sharded multi-process batch scoring')
+    parser.add_argument('data', nargs='?', default=DATA_PATH)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--shard-mb', type=int, default=SHARD_BYTES // (1024 * 1024),
+                        help='approximate size of each byte range handed to a worker')
+    parser.add_argument('-o', '--output', help='.npy file for the probabilities (file order)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    probs, stats = score_file_sharded(args.data, args.workers, shard_bytes=args.shard_mb * 1024 * 1024)
+    elapsed = time.perf_counter() - start
+    if args.output:
+        np.save(args.output, probs)
+    print(f"Scored {stats['rows']:,} rows on {stats['shards']} shards in {elapsed:.2f}s "
+          f"({stats['rows'] / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""Prediction and attribution cache shared by every dashboard process.
+
+``st.cache_resource`` lives inside one Streamlit process, so behind a load
+balancer each worker recomputes what the others already have.  This cache
+is a memory-mapped SQLite file in WAL mode on the local disk: readers in
+every process run concurrently with the single short-lived writer, and no
+network service is involved.  Entries are keyed by a 128-bit hash of a namespace
+(kind plus model/scoring version) and the encoded vector's float32 bytes.
+
+Eviction is LRU with a TTL: entries older than ``TTL_SECONDS`` are never
+returned, and every ``EVICT_EVERY`` writes a process trims the table back
+to ``MAX_ENTRIES`` by least-recent access.  Access times are only
+refreshed when they are ``TOUCH_SECONDS`` stale, so hot entries do not turn
+every read into a write.
+
+    python -m churnshield.sharedcache stats
+    python -m churnshield.sharedcache bench --procs 4
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from churnshield.calibration import load_calibrator
+from churnshield.features import load_feature_names
+from churnshield.featurestore import load_store
+from churnshield.model import load_booster, predict
+from churnshield.percentile import scoring_version
+
+CACHE_PATH = 'app/index/shared_cache.db'
+MAX_ENTRIES = 200_000
+TTL_SECONDS = 24 * 3600
+TOUCH_SECONDS = 60
+EVICT_EVERY = 1_000
+MMAP_BYTES = 256 * 1024 * 1024
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS cache (
+        key BLOB PRIMARY KEY,
+        value BLOB NOT NULL,
+        created_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    ) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)',
+]
+
+
+def cache_key(namespace, vector):
+    digest = hashlib.blake2b(namespace.encode(), digest_size=16)
+    digest.update(np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+    return digest.digest()
+
+
+class SharedCache:
+    """Cross-process cache of encoded-vector results; one SQLite connection per thread."""
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'puts': 0, 'evicted': 0}
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._conn()
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA mmap_size={MMAP_BYTES}')
+            self.local.conn = conn
+        return conn
+
+    def get(self, namespace, vector):
+        """Cached bytes for ``vector`` under ``namespace``, or None."""
+        key = cache_key(namespace, vector)
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute('SELECT value, accessed_at FROM cache WHERE key = ? AND created_at >= ?',
+                           (key, now - self.ttl)).fetchone()
+        with self.lock:
+            self.stats['hits' if row else 'misses'] += 1
+        if row is None:
+            return None
+        if now - row[1] > TOUCH_SECONDS:
+            conn.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (now, key))
+        return row[0]
+
+    def put(self, namespace, vector, value):
+        now = time.time()
+        self._conn().execute('INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) '
+                             'VALUES (?, ?, ?, ?)', (cache_key(namespace, vector), value, now, now))
+        with self.lock:
+            self.stats['puts'] += 1
+            self.writes += 1
+            evict = self.writes % EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones beyond ``max_entries``."""
+        conn = self._conn()
+        before = conn.total_changes
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('DELETE FROM cache WHERE created_at < ?', (time.time() - self.ttl,))
+        excess = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute('''DELETE FROM cache WHERE key IN
+                            (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)''', (excess,))
+        conn.execute('COMMIT')
+        removed = conn.total_changes - before
+        with self.lock:
+            self.stats['evicted'] += removed
+        return removed
+
+    def get_probability(self, version, vector):
+        value = self.get(f'prob:{version}', vector)
+        return struct.unpack('<d', value)[0] if value is not None else None
+
+    def put_probability(self, version, vector, prob):
+        self.put(f'prob:{version}', vector, struct.pack('<d', float(prob)))
+
+    def get_attributions(self, version, vector):
+        value = self.get(f'contribs:{version}', vector)
+        return np.frombuffer(value, dtype=np.float32) if value is not None else None
+
+    def put_attributions(self, version, vector, contributions):
+        self.put(f'contribs:{version}', vector, np.asarray(contributions, dtype=np.float32).tobytes())
+
+    def size(self):
+        return self._conn().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def clear(self):
+        self._conn().execute('DELETE FROM cache')
+
+
+def _bench_worker(args):
+    """One simulated dashboard process: score ``plan`` with a local and a shared cache."""
+    path, pool, plan, shared = args
+    booster, calibrator, names = load_booster(), load_calibrator(), load_feature_names()
+    booster.set_param({'nthread': 1})
+    version = scoring_version()
+    cache = SharedCache(path) if shared else None
+    local = {}
+    computed = 0
+    start = time.perf_counter()
+    for i in plan:
+        vector = pool[i]
+        if cache is not None:
+            if cache.get_probability(version, vector) is not None:
+                continue
+        elif i in local:
+            continue
+        prob = float(calibrator.apply(predict(booster, vector[None, :], names))[0])
+        computed += 1
+        if cache is not None:
+            cache.put_probability(version, vector, prob)
+        else:
+            local[i] = prob
+    return computed, time.perf_counter() - start
+
+
+def benchmark(X, procs=4, requests=2_000, distinct=1_000, path=None, seed=0):
+    """Hit rates of per-process caches versus the shared cache across ``procs`` workers."""
+    rng = np.random.default_rng(seed)
+    pool = X[rng.choice(len(X), size=min(distinct, len(X)), replace=False)]
+    plans = [rng.integers(0, len(pool), size=requests) for _ in range(procs)]
+    path = path or os.path.join(os.path.dirname(CACHE_PATH), 'shared_cache_bench.db')
+    result = {}
+    for mode, shared in (('per-process', False), ('shared', True)):
+        _remove(path)
+        if shared:
+            SharedCache(path)
+        start = time.perf_counter()
+        with Pool(procs) as workers:
+            parts = workers.map(_bench_worker, [(path, pool, plan, shared) for plan in plans])
+        computed = sum(c for c, _ in parts)
+        result[mode] = {'hit_rate': 1 - computed / (procs * requests), 'computed': computed,
+                        'seconds': time.perf_counter() - start}
+    _remove(path)
+    return result
+
+
+def _remove(path):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared prediction/attribution cache')
+    parser.add_argument('command', choices=['stats', 'evict', 'clear', 'bench'])
+    parser.add_argument('--path', default=CACHE_PATH)
+    parser.add_argument('--procs', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=2_000, help='requests per process')
+    parser.add_argument('--distinct', type=int, default=1_000, help='distinct customer profiles in play')
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        result = benchmark(np.asarray(load_store().X), args.procs, args.requests, args.distinct)
+        for mode, r in result.items():
+            print(f"{mode:12s} hit rate {r['hit_rate']:6.1%}  {r['computed']:,} predictions computed  "
+                  f"{r['seconds']:.2f}s")
+        return
+    cache = SharedCache(args.path)
+    if args.command == 'evict':
+        print(f"{cache.evict():,} entries evicted")
+    elif args.command == 'clear':
+        cache.clear()
+    print(f"{cache.size():,} entries in {args.path}")
+
+
+if __name__ == '__main__':
+    main()
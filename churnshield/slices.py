@@ -0,0 +1,179 @@
+"""Sliced evaluation: model metrics per customer segment.
+
+Precision, recall and accuracy are measured at the HIGH-risk cutoff the
+app actually uses (tuned for the same scoring version, or 0.7), and scores
+are cross-fitted with the calibration table's method because that table is
+usually fitted on the same held-out split.
+
+Every row gets an integer code per segmenting dimension (``Contract``,
+``InternetService``, ``PaymentMethod``, ``SeniorCitizen``, tenure bucket)
+and per pairwise cross of them.  Each slicing is offset into one shared
+group-id space, so a single ``np.bincount`` per statistic over the
+flattened ``rows x slicings`` id matrix yields the counts behind every
+slice's accuracy, precision, recall and calibration at once.
+
+Results are cached per scoring version in ``app/index/``.
+
+    python -m churnshield.slices build          # notebook held-out split
+    python -m churnshield.slices build --all    # the whole file
+"""
+import argparse
+import os
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from churnshield.calibration import cross_fit, load_calibrator, notebook_split, scoring_version
+from churnshield.features import DATA_PATH, MODEL_PATH, encode_frame, load_feature_names
+from churnshield.model import load_booster, predict
+from churnshield.scoring import HIGH_THRESHOLD
+from churnshield.thresholds import load_thresholds
+
+SLICES_DIR = 'app/index'
+DIMENSIONS = ['Contract', 'InternetService', 'PaymentMethod', 'SeniorCitizen', 'tenure_bucket']
+TENURE_EDGES = [12, 24, 48]
+TENURE_LABELS = ['0-12 mo', '12-24 mo', '24-48 mo', '48+ mo']
+CALIBRATION_BINS = 10
+
+
+def slicings(dimensions=DIMENSIONS):
+    """Every single dimension followed by every pairwise cross."""
+    return [(d,) for d in dimensions] + list(combinations(dimensions, 2))
+
+
+def _dimension_codes(df, dimensions):
+    codes, labels = {}, {}
+    for dim in dimensions:
+        if dim == 'tenure_bucket':
+            tenure = pd.to_numeric(df['tenure'], errors='coerce').fillna(0).to_numpy()
+            codes[dim] = np.searchsorted(TENURE_EDGES, tenure, side='right')
+            labels[dim] = TENURE_LABELS
+        else:
+            codes[dim], uniques = pd.factorize(df[dim].astype(str), sort=True)
+            labels[dim] = list(uniques)
+    return codes, labels
+
+
+def evaluate_slices(df, scores, y, cutoff=HIGH_THRESHOLD, dimensions=DIMENSIONS):
+    """Per-slice metrics as a DataFrame, one row per (slicing, segment) with data."""
+    codes, labels = _dimension_codes(df, dimensions)
+    groups = slicings(dimensions)
+
+    # Group ids: each slicing's cell index, offset past the previous slicings.
+    ids = np.empty((len(df), len(groups)), dtype=np.int64)
+    sizes = []
+    offset = 0
+    for j, group in enumerate(groups):
+        cell = np.zeros(len(df), dtype=np.int64)
+        size = 1
+        for dim in group:
+            cell = cell * len(labels[dim]) + codes[dim]
+            size *= len(labels[dim])
+        ids[:, j] = offset + cell
+        sizes.append(size)
+        offset += size
+
+    flat = ids.ravel()
+    repeat = len(groups)
+    scores = np.asarray(scores, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    flagged = (scores > cutoff).astype(np.float64)
+    weights = {
+        'n': None,
+        'churned': y,
+        'flagged': flagged,
+        'tp': flagged * y,
+        'correct': (flagged == y).astype(np.float64),
+        'score_sum': scores,
+    }
+    sums = {name: np.bincount(flat, weights=None if w is None else np.repeat(w, repeat),
+                              minlength=offset)
+            for name, w in weights.items()}
+
+    # Calibration error within each slice: |mean score - churn rate| per score decile.
+    b = np.minimum((scores * CALIBRATION_BINS).astype(np.int64), CALIBRATION_BINS - 1)
+    flat_b = flat * CALIBRATION_BINS + np.repeat(b, repeat)
+    size_b = offset * CALIBRATION_BINS
+    bin_score = np.bincount(flat_b, weights=np.repeat(scores, repeat), minlength=size_b)
+    bin_y = np.bincount(flat_b, weights=np.repeat(y, repeat), minlength=size_b)
+    gap = np.abs(bin_score - bin_y).reshape(offset, CALIBRATION_BINS).sum(axis=1)
+
+    n = sums['n']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table = pd.DataFrame({
+            'customers': n.astype(np.int64),
+            'churn_rate': sums['churned'] / n,
+            'mean_score': sums['score_sum'] / n,
+            'accuracy': sums['correct'] / n,
+            'precision': sums['tp'] / sums['flagged'],
+            'recall': sums['tp'] / sums['churned'],
+            'ece': gap / n,
+        })
+    table['calibration_gap'] = table['mean_score'] - table['churn_rate']
+    table['cutoff'] = cutoff
+
+    slicing_col, segment_col = [], []
+    for group, size in zip(groups, sizes):
+        name = ' x '.join(group)
+        for cell in range(size):
+            parts = []
+            for dim in reversed(group):
+                cell, k = divmod(cell, len(labels[dim]))
+                parts.append(str(labels[dim][k]))
+            slicing_col.append(name)
+            segment_col.append(' / '.join(reversed(parts)))
+    table.insert(0, 'segment', segment_col)
+    table.insert(0, 'slicing', slicing_col)
+    return table[table['customers'] > 0].reset_index(drop=True)
+
+
+def slices_path(version, holdout=True, directory=SLICES_DIR):
+    return os.path.join(directory, f"slices-{version}-{'holdout' if holdout else 'all'}.csv")
+
+
+def build_slices(data_path=DATA_PATH, model_path=MODEL_PATH, holdout=True, directory=SLICES_DIR):
+    """Score the evaluation rows once, compute every slice and cache the table."""
+    feature_names = load_feature_names()
+    if holdout:
+        df, X, y = notebook_split(data_path, feature_names)
+    else:
+        df = pd.read_csv(data_path)
+        X = encode_frame(df, feature_names)
+        y = (df['Churn'] == 'Yes').to_numpy(dtype=np.int8)
+    scores = predict(load_booster(model_path), X, feature_names).astype(np.float64)
+    calibrator = load_calibrator(model_path=model_path)
+    if not calibrator.identity:
+        scores = cross_fit(scores, y, calibrator.method)
+    table = evaluate_slices(df, scores, y, load_thresholds(model_path=model_path)[0])
+    path = slices_path(scoring_version(model_path), holdout, directory)
+    os.makedirs(directory, exist_ok=True)
+    table.to_csv(path, index=False)
+    return table
+
+
+def load_slices(data_path=DATA_PATH, model_path=MODEL_PATH, holdout=True, directory=SLICES_DIR):
+    """Slice metrics for the current scoring version and cutoff, computed on first use."""
+    path = slices_path(scoring_version(model_path), holdout, directory)
+    if os.path.exists(path):
+        table = pd.read_csv(path)
+        if 'cutoff' in table and np.isclose(table['cutoff'].iloc[0], load_thresholds(model_path=model_path)[0]):
+            return table
+    return build_slices(data_path, model_path, holdout, directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-segment evaluation of the current model')
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('data', nargs='?', default=DATA_PATH)
+    parser.add_argument('--all', action='store_true', help='evaluate the whole file, not the held-out split')
+    args = parser.parse_args()
+    table = build_slices(args.data, holdout=not args.all)
+    path = slices_path(scoring_version(), not args.all)
+    print(f"{len(table)} segments across {table['slicing'].nunique()} slicings -> {path}")
+    worst = table[(table['customers'] >= 50) & table['recall'].notna()].nsmallest(5, 'recall')
+    print(worst[['slicing', 'segment', 'customers', 'accuracy', 'recall', 'ece']].to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Kaplan-Meier time-to-churn curves per customer segment.
+
+``tenure`` is the time a customer has been with us and ``Churn`` says
+whether that time ended in churn (otherwise it is censored).  Curves are
+fitted for every ``Contract`` x ``InternetService`` x ``PaymentMethod``
+segment at once: death and exit counts per (segment, month) come from one
+``bincount`` per feature-store chunk, and survival is a cumulative product
+along the month axis.  Segments with fewer than ``MIN_CUSTOMERS`` labeled
+customers borrow the curve of their nearest coarser segment
+(``Contract`` x ``InternetService``, then ``Contract``, then everyone).
+
+The table (``segments x months`` float32, a few KB) is cached in
+``app/index/survival.npz`` and rebuilt when the customer file changes.
+
+    python -m churnshield.survival build
+"""
+import argparse
+import os
+
+import numpy as np
+
+from churnshield.features import DATA_PATH
+from churnshield.featurestore import CHUNK_SIZE, STORE_DIR, UNLABELED, load_store
+from churnshield.thresholds import VALUE_MONTHS
+
+SURVIVAL_PATH = 'app/index/survival.npz'
+DIMENSIONS = ['Contract', 'InternetService', 'PaymentMethod']
+MIN_CUSTOMERS = 50
+
+
+def _vocabulary(feature_names, dimension):
+    """``(column indices, values)`` of a categorical's one-hot encoding."""
+    prefix = f'{dimension}_'
+    columns = [i for i, name in enumerate(feature_names) if name.startswith(prefix)]
+    return columns, [feature_names[i][len(prefix):] for i in columns]
+
+
+def kaplan_meier(deaths, exits):
+    """Survival ``S[g, t] = P(T > t)`` from per-group death and exit counts by month."""
+    at_risk = exits[:, ::-1].cumsum(axis=1)[:, ::-1]
+    hazard = np.divide(deaths, at_risk, out=np.zeros_like(deaths, dtype=np.float64), where=at_risk > 0)
+    return np.cumprod(1 - hazard, axis=1)
+
+
+class SurvivalTable:
+    """Survival curves for every segment, indexed by the segment's category codes."""
+
+    def __init__(self, curves, customers, level, vocabularies, source=None):
+        self.curves = curves
+        self.customers = customers
+        self.level = level
+        self.vocabularies = vocabularies
+        self.source = source or {}
+        self.shape = tuple(len(values) for values in vocabularies)
+
+    @property
+    def max_tenure(self):
+        return self.curves.shape[1] - 1
+
+    def segment(self, contract, internet_service, payment_method):
+        """Flat index of a segment."""
+        codes = [values.index(value) for values, value in
+                 zip(self.vocabularies, (contract, internet_service, payment_method))]
+        return int(np.ravel_multi_index(codes, self.shape))
+
+    def curve(self, contract, internet_service, payment_method):
+        return self.curves[self.segment(contract, internet_service, payment_method)]
+
+    def labels(self):
+        return [' | '.join(values) for values in
+                zip(*(np.array(v, dtype=object)[c] for v, c in
+                      zip(self.vocabularies, np.unravel_index(np.arange(len(self.curves)), self.shape))))]
+
+    def median_tenure(self):
+        """Month at which each segment's survival first drops to 50% (NaN if never)."""
+        below = self.curves <= 0.5
+        return np.where(below.any(axis=1), below.argmax(axis=1), np.nan)
+
+    def save(self, path=SURVIVAL_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        vocabularies = {f'vocabulary_{i}': np.array(values) for i, values in enumerate(self.vocabularies)}
+        np.savez(path, curves=self.curves, customers=self.customers, level=self.level,
+                 source=np.array([self.source.get('source_size', 0), self.source.get('source_mtime', 0)]),
+                 **vocabularies)
+
+    @classmethod
+    def load(cls, path=SURVIVAL_PATH):
+        with np.load(path) as data:
+            size, mtime = data['source']
+            vocabularies = [data[f'vocabulary_{i}'].tolist() for i in range(len(DIMENSIONS))]
+            return cls(data['curves'], data['customers'], data['level'], vocabularies,
+                       {'source_size': int(size), 'source_mtime': float(mtime)})
+
+
+def conditional(curve, tenure, months, prob=None, period=VALUE_MONTHS):
+    """Chance of still being a customer 0..``months`` months from now, given ``tenure``.
+
+    With ``prob`` (the model's ``period``-month churn probability) the
+    segment's hazard is scaled proportionally so the curve passes through
+    ``1 - prob`` at ``period`` months: ``S(t) = exp(-k * (H(a + t) - H(a)))``
+    with ``H = -log S`` and ``k`` solved in closed form.  Where the segment
+    shows no churn over that window a constant hazard is used instead.
+    """
+    last = len(curve) - 1
+    index = np.minimum(int(min(tenure, last)) + np.arange(months + 1), last)
+    with np.errstate(divide='ignore'):
+        cumulative = -np.log(np.maximum(curve[index], 1e-12))
+    cumulative -= cumulative[0]
+    if prob is not None:
+        target = -np.log1p(-min(prob, 1 - 1e-6))
+        reference = cumulative[min(period, months)]
+        if reference > 0:
+            cumulative *= target / reference
+        else:
+            cumulative = np.arange(months + 1) * target / period
+    return np.exp(-cumulative)
+
+
+def build_survival(data_path=DATA_PATH, store_dir=STORE_DIR, path=SURVIVAL_PATH,
+                   min_customers=MIN_CUSTOMERS, chunksize=CHUNK_SIZE):
+    """Fit every segment's curve from the feature store."""
+    store = load_store(data_path, store_dir)
+    names = store.feature_names
+    vocabularies = [_vocabulary(names, dim) for dim in DIMENSIONS]
+    shape = tuple(len(values) for _, values in vocabularies)
+    tenure_col = names.index('tenure')
+    tenure_max = int(np.nanmax(np.asarray(store.X[:, tenure_col]))) if len(store) else 0
+    months = tenure_max + 1
+
+    deaths = np.zeros((int(np.prod(shape)), months))
+    exits = np.zeros_like(deaths)
+    for start in range(0, len(store), chunksize):
+        labels = np.asarray(store.labels[start:start + chunksize])
+        keep = labels != UNLABELED
+        X = np.asarray(store.X[start:start + chunksize])[keep]
+        codes = np.ravel_multi_index([X[:, columns].argmax(axis=1) for columns, _ in vocabularies], shape)
+        tenure = np.clip(np.nan_to_num(X[:, tenure_col]), 0, tenure_max).astype(np.int64)
+        cell = codes * months + tenure
+        deaths += np.bincount(cell, weights=labels[keep], minlength=deaths.size).reshape(deaths.shape)
+        exits += np.bincount(cell, minlength=exits.size).reshape(exits.shape)
+
+    # Sparse segments borrow from coarser ones: drop trailing dimensions one at a time.
+    curves = kaplan_meier(deaths, exits)
+    customers = exits.sum(axis=1)
+    level = np.full(len(curves), len(DIMENSIONS), dtype=np.int8)
+    codes = np.unravel_index(np.arange(len(curves)), shape)
+    for depth in range(len(DIMENSIONS) - 1, -1, -1):
+        sparse = customers < min_customers
+        if not sparse.any():
+            break
+        group = np.ravel_multi_index(codes[:depth], shape[:depth]) if depth else np.zeros(len(curves), int)
+        n_groups = int(np.prod(shape[:depth]))
+        group_deaths = np.zeros((n_groups, months))
+        group_exits = np.zeros((n_groups, months))
+        np.add.at(group_deaths, group, deaths)
+        np.add.at(group_exits, group, exits)
+        group_customers = group_exits.sum(axis=1)
+        take = sparse & ((group_customers[group] >= min_customers) | (depth == 0))
+        curves[take] = kaplan_meier(group_deaths, group_exits)[group[take]]
+        customers[take] = group_customers[group[take]]
+        level[take] = depth
+
+    table = SurvivalTable(curves.astype(np.float32), customers.astype(np.int64), level,
+                          [values for _, values in vocabularies],
+                          {'source_size': store.meta['source_size'], 'source_mtime': store.meta['source_mtime']})
+    table.save(path)
+    return table
+
+
+def load_survival(data_path=DATA_PATH, path=SURVIVAL_PATH):
+    """Survival table for ``data_path``, fitted on first use or when the file changed."""
+    if os.path.exists(path):
+        table = SurvivalTable.load(path)
+        stat = os.stat(data_path)
+        if (table.source['source_size'], table.source['source_mtime']) == (stat.st_size, stat.st_mtime):
+            return table
+    return build_survival(data_path, path=path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kaplan-Meier time-to-churn curves per segment')
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('data', nargs='?', default=DATA_PATH)
+    parser.add_argument('--min-customers', type=int, default=MIN_CUSTOMERS)
+    args = parser.parse_args()
+
+    table = build_survival(args.data, min_customers=args.min_customers)
+    median = table.median_tenure()
+    print(f"{len(table.curves)} segments x {table.max_tenure + 1} months -> {SURVIVAL_PATH}")
+    for label, n, lvl, med, s12 in zip(table.labels(), table.customers, table.level, median,
+                                       table.curves[:, min(12, table.max_tenure)]):
+        borrowed = '' if lvl == len(DIMENSIONS) else f"  (pooled: {' x '.join(DIMENSIONS[:lvl]) or 'all'})"
+        print(f"  {label:70s} n={n:5d}  S(12)={s12:.2f}  median={'-' if np.isnan(med) else int(med)}{borrowed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Cost-sensitive tuning of the HIGH/MEDIUM risk cutoffs.
+
+A labeled validation file is scored once.  Sorting the scores and taking
+cumulative sums gives ROC and precision/recall curves and, for every pair
+of cutoffs, the expected retention value of sending the HIGH-band offer to
+everyone above the high cutoff and the MEDIUM-band offer to everyone
+between the two.  The best pair is found in the same vectorized pass and
+saved next to the model, keyed by the scoring version (model plus
+calibration table) the cutoffs were tuned on, so the app reads tuned
+cutoffs instead of the 0.7/0.4 defaults and a recalibration invalidates
+them.
+
+    python -m churnshield.thresholds tune data.csv
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from churnshield import registry
+from churnshield.calibration import load_calibrator, notebook_split, scoring_version
+from churnshield.features import DATA_PATH, MODEL_PATH, load_feature_names, read_reference
+from churnshield.model import load_booster, model_version, predict
+from churnshield.scoring import HIGH_THRESHOLD, MEDIUM_THRESHOLD
+
+THRESHOLDS_PATH = 'app/model/thresholds.json'
+
+# Offer assumptions, roughly the tab3 playbooks: HIGH gets the 20% discount
+# plus $50 credit, MEDIUM the 10% contract incentive / free feature.
+HIGH_OFFER_COST = 100.0
+HIGH_SAVE_RATE = 0.35
+MEDIUM_OFFER_COST = 20.0
+MEDIUM_SAVE_RATE = 0.15
+VALUE_MONTHS = 12
+
+
+def curves(y, scores, weights=None):
+    """ROC/PR curves from one sort: one point per distinct score, descending.
+
+    Returns a dict of arrays ``threshold, tp, fp, tpr, fpr, precision,
+    recall`` plus the scalar ``auc``.  ``weights`` (e.g. customer value)
+    additionally yields ``value_tp``, the cumulative value of true
+    positives.
+    """
+    order = np.argsort(-scores, kind='stable')
+    s, y = scores[order], np.asarray(y)[order].astype(np.float64)
+    tp = np.cumsum(y)
+    fp = np.cumsum(1 - y)
+    # Keep the last index of every run of tied scores.
+    last = np.r_[np.flatnonzero(np.diff(s)), len(s) - 1]
+    out = {'threshold': s[last], 'tp': tp[last], 'fp': fp[last], 'index': last}
+    pos, neg = max(tp[-1], 1), max(fp[-1], 1)
+    out['tpr'] = out['recall'] = out['tp'] / pos
+    out['fpr'] = out['fp'] / neg
+    out['precision'] = out['tp'] / (out['tp'] + out['fp'])
+    tpr, fpr = np.r_[0, out['tpr']], np.r_[0, out['fpr']]
+    out['auc'] = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+    if weights is not None:
+        out['value_tp'] = np.cumsum(y * np.asarray(weights, dtype=np.float64)[order])[last]
+    return out
+
+
+def optimize(y, scores, values, high_cost=HIGH_OFFER_COST, high_save=HIGH_SAVE_RATE,
+             medium_cost=MEDIUM_OFFER_COST, medium_save=MEDIUM_SAVE_RATE):
+    """Cutoffs maximising expected retention value net of offer costs.
+
+    Flagging the top ``i`` customers as HIGH and the next ``j - i`` as
+    MEDIUM is worth ``A(i) + B(j)`` with
+    ``A(i) = (high_save - medium_save) * V(i) - (high_cost - medium_cost) * i`` and
+    ``B(j) = medium_save * V(j) - medium_cost * j``, where ``V(k)`` is the
+    value of churners among the top ``k``.  A running maximum of ``A``
+    finds the best ``i <= j`` for every ``j`` at once.
+    """
+    c = curves(y, scores, values)
+    n_flagged = c['index'] + 1.0
+    # Position 0 is "flag nobody".
+    V = np.r_[0.0, c['value_tp']]
+    k = np.r_[0.0, n_flagged]
+    thresholds = np.r_[np.inf, c['threshold']]
+    A = (high_save - medium_save) * V - (high_cost - medium_cost) * k
+    B = medium_save * V - medium_cost * k
+    best_i = np.maximum.accumulate(np.where(A == np.maximum.accumulate(A), np.arange(len(A)), 0))
+    total = A[best_i] + B
+    j = int(np.argmax(total))
+    i = int(best_i[j])
+
+    def cutoff(pos):
+        # Customers strictly above the cutoff are flagged.
+        if pos == 0:
+            return 1.0
+        return float(np.nextafter(np.float32(thresholds[pos]), np.float32(-1)))
+
+    return {
+        'high': cutoff(i),
+        'medium': min(cutoff(j), cutoff(i)),
+        'expected_value': float(total[j]),
+        'flagged_high': int(k[i]),
+        'flagged_medium': int(k[j] - k[i]),
+        'auc': c['auc'],
+    }, c
+
+
+def save_thresholds(result, version, path=THRESHOLDS_PATH):
+    with open(path, 'w') as f:
+        json.dump(dict(result, scoring_version=version), f, indent=2)
+
+
+def load_thresholds(path=THRESHOLDS_PATH, model_path=MODEL_PATH, registry_dir=registry.REGISTRY_DIR):
+    """``(high, medium)`` tuned for the model's scoring version, else the 0.7/0.4 defaults.
+
+    Like ``load_calibrator``, falls back to the model's registry copy.
+    """
+    version = scoring_version(model_path, registry_dir)
+    for candidate in (path, registry.table_path(model_version(model_path), os.path.basename(THRESHOLDS_PATH),
+                                                registry_dir)):
+        if os.path.exists(candidate):
+            with open(candidate) as f:
+                tuned = json.load(f)
+            if tuned.get('scoring_version') == version:
+                return tuned['high'], tuned['medium']
+    return HIGH_THRESHOLD, MEDIUM_THRESHOLD
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune risk-band cutoffs on a labeled file')
+    parser.add_argument('command', choices=['tune'])
+    parser.add_argument('data', nargs='?', default=DATA_PATH)
+    parser.add_argument('--high-cost', type=float, default=HIGH_OFFER_COST)
+    parser.add_argument('--high-save', type=float, default=HIGH_SAVE_RATE)
+    parser.add_argument('--medium-cost', type=float, default=MEDIUM_OFFER_COST)
+    parser.add_argument('--medium-save', type=float, default=MEDIUM_SAVE_RATE)
+    parser.add_argument('--value-months', type=float, default=VALUE_MONTHS)
+    parser.add_argument('--notebook-split', action='store_true',
+                        help="tune on the notebook's held-out 30%% of the file only")
+    parser.add_argument('--dry-run', action='store_true', help='print the result without saving it')
+    args = parser.parse_args()
+
+    feature_names = load_feature_names()
+    if args.notebook_split:
+        df, X, y = notebook_split(args.data, feature_names)
+    else:
+        df, X, y = read_reference(args.data, feature_names)
+    # Cutoffs apply to the calibrated probabilities the app displays.
+    scores = load_calibrator().apply(predict(load_booster(), X, feature_names))
+    values = df['MonthlyCharges'].to_numpy(dtype=np.float64) * args.value_months
+    result, _ = optimize(y, scores, values, args.high_cost, args.high_save,
+                         args.medium_cost, args.medium_save)
+    print(json.dumps(result, indent=2))
+    if not args.dry_run:
+        save_thresholds(result, scoring_version())
+        print(f"Saved to {THRESHOLDS_PATH}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""Warm-start model updates from labeled outcomes.
+
+Instead of rerunning customer_churn.ipynb, the live booster is loaded and
+boosting continues for a bounded number of extra trees on newly labeled
+records (stored predictions joined with their observed churn outcome).  The
+result is checked against a seeded holdout of the same records and published
+to the local registry as a candidate, together with a calibration table and
+risk cutoffs fitted for it on that holdout (cutoffs are tuned on
+cross-fitted calibrated scores); ``--promote`` serves it only if it beats
+the current model on the holdout.
+
+    python -m churnshield.updater                       # outcomes from churn_prediction.db
+    python -m churnshield.updater --csv labeled.csv --trees 20 --promote
+    python -m churnshield.updater --csv data.csv --from-store
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import xgboost as xgb
+
+from churnshield import registry
+from churnshield.calibration import CALIBRATION_PATH, cross_fit, fit_calibrator
+from churnshield.db import DB_PATH, connect, labeled_predictions
+from churnshield.features import MODEL_PATH, load_feature_names, read_reference
+from churnshield.featurestore import load_store
+from churnshield.model import load_booster, predict
+from churnshield.thresholds import THRESHOLDS_PATH, VALUE_MONTHS, curves, optimize, save_thresholds
+
+DEFAULT_EXTRA_TREES = 20
+MAX_EXTRA_TREES = 50
+HOLDOUT_FRACTION = 0.2
+MIN_LABELED = 200
+# Smaller holdouts get a 2-parameter Platt fit instead of an isotonic table.
+ISOTONIC_MIN = 1000
+SEED = 42
+
+# Tree-growing parameters carried over from the saved booster's config.
+TRAIN_PARAMS = ('eta', 'max_depth', 'min_child_weight', 'gamma', 'lambda', 'alpha',
+                'subsample', 'colsample_bytree', 'max_delta_step')
+
+
+def training_params(booster):
+    """The booster's own training parameters, so extra trees grow like the originals.
+
+    They are read from whichever updater grew the trees (``grow_colmaker``
+    for exact, ``grow_quantile_histmaker`` for hist, ``grow_histmaker`` for
+    approx, ...), and a non-default ``tree_method`` is kept.
+    """
+    config = json.loads(booster.save_config())
+    learner = config['learner']
+    gbtree = learner['gradient_booster']
+    gbtree = gbtree.get('gbtree', gbtree)  # dart nests the tree booster
+    updaters = gbtree['updater']
+    sequence = [name for name in gbtree['gbtree_train_param'].get('updater', '').split(',') if name]
+    updater = next((n for n in sequence + list(updaters) if 'train_param' in updaters.get(n, {})), None)
+    if updater is None:
+        raise ValueError(f"no tree updater with training parameters in the booster config: {list(updaters)}")
+    train = updaters[updater]['train_param']
+    params = {name: float(train[name]) for name in TRAIN_PARAMS if name in train}
+    params['max_depth'] = int(params.get('max_depth', 6))
+    tree_method = gbtree['gbtree_train_param'].get('tree_method', 'auto')
+    if tree_method != 'auto':
+        params['tree_method'] = tree_method
+    params['objective'] = learner['learner_train_param']['objective']
+    params['eval_metric'] = 'logloss'
+    return params
+
+
+def evaluate(booster, X, y, feature_names):
+    p = np.clip(predict(booster, X, feature_names).astype(np.float64), 1e-7, 1 - 1e-7)
+    logloss = float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+    return {'logloss': logloss, 'auc': curves(y, p)['auc'], 'n': int(len(y))}
+
+
+def split_holdout(n, fraction=HOLDOUT_FRACTION, seed=SEED):
+    order = np.random.default_rng(seed).permutation(n)
+    cut = int(round(n * fraction))
+    return order[cut:], order[:cut]
+
+
+def fit_tables(booster, X, y, feature_names, version, registry_dir=registry.REGISTRY_DIR):
+    """Fit ``version``'s calibration and cutoffs on ``(X, y)`` and store them in its registry entry."""
+    scores = predict(booster, X, feature_names).astype(np.float64)
+    method = 'isotonic' if len(y) >= ISOTONIC_MIN else 'platt'
+    calibrator = fit_calibrator(scores, y, method)
+    calibrator.save(version, registry.table_path(version, os.path.basename(CALIBRATION_PATH), registry_dir))
+    values = np.nan_to_num(X[:, feature_names.index('MonthlyCharges')]).astype(np.float64) * VALUE_MONTHS
+    result, _ = optimize(y, cross_fit(scores, y, method), values)
+    save_thresholds(result, f'{version}-{calibrator.version}',
+                    registry.table_path(version, os.path.basename(THRESHOLDS_PATH), registry_dir))
+    return {'calibration': method, 'high': result['high'], 'medium': result['medium']}
+
+
+def warm_start(booster, X, y, feature_names, trees=DEFAULT_EXTRA_TREES, eta=None, nthread=None):
+    """A copy of ``booster`` with up to ``MAX_EXTRA_TREES`` more trees fitted on ``(X, y)``."""
+    trees = min(int(trees), MAX_EXTRA_TREES)
+    params = training_params(booster)
+    if eta is not None:
+        params['eta'] = eta
+    if nthread:
+        params['nthread'] = nthread
+    dtrain = xgb.DMatrix(X, label=y, feature_names=feature_names)
+    # xgb.train appends to a copy; the booster passed in is left untouched.
+    return xgb.train(params, dtrain, num_boost_round=trees, xgb_model=booster)
+
+
+def update(X, y, feature_names, model_path=MODEL_PATH, trees=DEFAULT_EXTRA_TREES, eta=None,
+           nthread=None, source=None, registry_dir=registry.REGISTRY_DIR):
+    """Fit, validate and publish a warm-started candidate; return its registry metadata."""
+    if len(y) < MIN_LABELED:
+        raise ValueError(f'{len(y)} labeled records, need at least {MIN_LABELED}')
+    train, holdout = split_holdout(len(y))
+    current = load_booster(model_path)
+    parent = registry.register_live(model_path, registry_dir)
+
+    start = time.perf_counter()
+    updated = warm_start(current, X[train], y[train], feature_names, trees, eta, nthread)
+    elapsed = time.perf_counter() - start
+
+    metrics = {
+        'current': evaluate(current, X[holdout], y[holdout], feature_names),
+        'updated': evaluate(updated, X[holdout], y[holdout], feature_names),
+        'train_rows': int(len(train)),
+        'extra_trees': updated.num_boosted_rounds() - current.num_boosted_rounds(),
+        'fit_seconds': round(elapsed, 3),
+    }
+    version = registry.publish(updated, parent=parent, metrics=metrics, source=source,
+                               registry_dir=registry_dir)
+    tables = fit_tables(updated, X[holdout], y[holdout], feature_names, version, registry_dir)
+    return dict(registry.read_meta(version, registry_dir), tables=tables)
+
+
+def improves(meta):
+    """Whether a candidate beats its parent on holdout log-loss without losing AUC."""
+    current, updated = meta['metrics']['current'], meta['metrics']['updated']
+    return updated['logloss'] < current['logloss'] and updated['auc'] >= current['auc']
+
+
+def load_labeled(args, feature_names):
+    """``(X, y, source)`` from the CLI's chosen input: --csv, --from-store or the outcomes table."""
+    if args.csv and args.from_store:
+        X, y = load_store(args.csv).labeled()
+        return X, y, args.csv
+    if args.csv:
+        _, X, y = read_reference(args.csv, feature_names)
+        return X, y, args.csv
+    conn = connect(args.db)
+    try:
+        _, X, y = labeled_predictions(conn, feature_names, args.since_id, args.until_id)
+    finally:
+        conn.close()
+    until = '' if args.until_id is None else f'<={args.until_id}'
+    return X, y, f'{args.db}:outcome_log>{args.since_id}{until}'
+
+
+def print_report(meta, promoted, previous, promote):
+    m = meta['metrics']
+    print(f"{meta['version']} (parent {meta['parent']}): +{m['extra_trees']} trees on "
+          f"{m['train_rows']:,} rows in {m['fit_seconds']:.2f}s")
+    for name in ('current', 'updated'):
+        print(f"  {name:8s} logloss={m[name]['logloss']:.4f} auc={m[name]['auc']:.4f} (n={m[name]['n']:,})")
+    t = meta['tables']
+    print(f"  {t['calibration']} calibration, cutoffs HIGH > {t['high']:.3f}, MEDIUM > {t['medium']:.3f}")
+    if promoted:
+        print(f"Promoted {meta['version']}; {previous} retired")
+    elif promote:
+        print('Not promoted: candidate does not beat the live model on the holdout')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Continue boosting the live model on labeled outcomes')
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--csv', help='labeled customer file (data.csv layout) instead of the outcomes table')
+    parser.add_argument('--from-store', action='store_true',
+                        help='read the --csv file\'s precomputed vectors from the feature store')
+    parser.add_argument('--since-id', type=int, default=0,
+                        help='only predictions labeled after this outcome_log id')
+    parser.add_argument('--until-id', type=int, help='ignore labels recorded after this outcome_log id')
+    parser.add_argument('--trees', type=int, default=DEFAULT_EXTRA_TREES)
+    parser.add_argument('--eta', type=float, help='learning rate for the extra trees (default: the model\'s)')
+    parser.add_argument('--nthread', type=int, help='xgboost threads for the fit (default: all cores)')
+    parser.add_argument('--registry', default=registry.REGISTRY_DIR)
+    parser.add_argument('--promote', action='store_true', help='serve the candidate if it beats the live model')
+    parser.add_argument('--json', action='store_true', help='print the result as one JSON object')
+    args = parser.parse_args()
+
+    feature_names = load_feature_names()
+    X, y, source = load_labeled(args, feature_names)
+    try:
+        meta = update(X, y.astype(np.float32), feature_names, trees=args.trees, eta=args.eta,
+                      nthread=args.nthread, source=source, registry_dir=args.registry)
+    except ValueError as e:
+        parser.exit(1, f'{e}\n')
+    promoted = args.promote and improves(meta)
+    previous = registry.promote(meta['version'], registry_dir=args.registry) if promoted else None
+    if args.json:
+        print(json.dumps({**meta, 'promoted': promoted}))
+    else:
+        print_report(meta, promoted, previous, args.promote)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Streaming writer for scored batch results.
+
+Chunks of scored rows are handed to a background thread that appends them
+to a Parquet file (one row group per chunk) or a gzip CSV, so writing
+overlaps with scoring the next chunk.  The hand-off queue is bounded: when
+the writer falls behind, ``write`` blocks instead of buffering, which keeps
+peak memory flat however large the input is.
+"""
+import gzip
+import queue
+import threading
+
+DEFAULT_PENDING = 2
+_DONE = object()
+
+
+def output_format(path):
+    if path.endswith('.parquet'):
+        return 'parquet'
+    if path.endswith('.csv.gz'):
+        return 'csv.gz'
+    if path.endswith('.csv'):
+        return 'csv'
+    raise ValueError(f"Unsupported output format for {path!r} (use .parquet, .csv.gz or .csv)")
+
+
+class ScoredWriter:
+    """Context manager that streams DataFrame chunks to disk from a background thread."""
+
+    def __init__(self, path, max_pending=DEFAULT_PENDING):
+        self.path = path
+        self.format = output_format(path)
+        if self.format == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("Writing Parquet requires pyarrow: pip install pyarrow")
+        self.rows = 0
+        self.error = None
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name='scored-writer', daemon=True)
+        self._thread.start()
+
+    def write(self, chunk):
+        """Queue one chunk; blocks while ``max_pending`` chunks are already waiting."""
+        if self.error:
+            raise self.error
+        self._queue.put(chunk)
+
+    def close(self):
+        self._queue.put(_DONE)
+        self._thread.join()
+        if self.error:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self):
+        sink = None
+        try:
+            while True:
+                chunk = self._queue.get()
+                if chunk is _DONE:
+                    break
+                if sink is None:
+                    sink = self._open(chunk)
+                self._append(sink, chunk)
+                self.rows += len(chunk)
+        except Exception as e:
+            self.error = e
+            # Keep draining so a producer blocked in write() is released.
+            while self._queue.get() is not _DONE:
+                pass
+        finally:
+            if sink is not None:
+                sink.close()
+
+    def _open(self, first_chunk):
+        if self.format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = pa.Schema.from_pandas(first_chunk, preserve_index=False)
+            return pq.ParquetWriter(self.path, schema)
+        self._header = True
+        if self.format == 'csv.gz':
+            return gzip.open(self.path, 'wt', newline='')
+        return open(self.path, 'w', newline='')
+
+    def _append(self, sink, chunk):
+        if self.format == 'parquet':
+            import pyarrow as pa
+            sink.write_table(pa.Table.from_pandas(chunk, schema=sink.schema, preserve_index=False))
+        else:
+            chunk.to_csv(sink, header=self._header, index=False)
+            self._header = False
@@ -0,0 +1,38 @@
+import numpy as np
+from sklearn.isotonic import IsotonicRegression
+
+from churnshield.calibration import PROB_FLOOR, fit_calibrator, fit_isotonic
+
+
+def _sample(n, seed):
+    rng = np.random.default_rng(seed)
+    scores = rng.random(n)
+    y = (rng.random(n) < scores ** 2).astype(np.int8)
+    return scores, y
+
+
+def test_isotonic_is_monotone_and_matches_sklearn():
+    for seed in range(5):
+        scores, y = _sample(500, seed)
+        x, fitted = fit_isotonic(scores, y)
+        assert np.all(np.diff(x) > 0)
+        assert np.all(np.diff(fitted) >= 0)
+        expected = IsotonicRegression().fit(scores, y).predict(scores)
+        np.testing.assert_allclose(np.interp(scores, x, fitted), expected, atol=1e-12)
+
+
+def test_pooled_levels_preserve_label_mean():
+    scores, y = _sample(1000, 11)
+    x, fitted = fit_isotonic(scores, y)
+    assert np.isclose(np.interp(scores, x, fitted).mean(), y.mean())
+
+
+def test_calibrator_is_monotone_and_clipped():
+    scores, y = _sample(500, 3)
+    for method in ('isotonic', 'platt'):
+        calibrator = fit_calibrator(scores, y, method)
+        grid = np.linspace(0, 1, 1001)
+        calibrated = calibrator.apply(grid)
+        assert np.all(np.diff(calibrated) >= 0)
+        assert calibrated.min() >= np.float32(PROB_FLOOR)
+        assert calibrated.max() <= np.float32(1 - PROB_FLOOR)
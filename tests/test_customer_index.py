@@ -0,0 +1,28 @@
+import os
+
+from churnshield.customer_index import is_current, load_index
+from churnshield.features import DATA_PATH
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_index_rebuilds_when_source_changes(tmp_path):
+    with open(os.path.join(ROOT, DATA_PATH)) as f:
+        lines = f.readlines()
+    data_path = str(tmp_path / 'customers.csv')
+    index_dir = str(tmp_path / 'index')
+    with open(data_path, 'w') as f:
+        f.writelines(lines[:101])
+
+    index = load_index(index_dir, data_path)
+    assert len(index) == 100
+    assert is_current(index_dir, data_path)
+    new_id = lines[150].split(',')[0]
+    assert index.lookup(new_id) is None
+
+    with open(data_path, 'a') as f:
+        f.writelines(lines[101:201])
+    assert not is_current(index_dir, data_path)
+    index = load_index(index_dir, data_path)
+    assert len(index) == 200
+    assert index.lookup(new_id)['customerID'] == new_id
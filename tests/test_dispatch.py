@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+
+from churnshield import dispatch
+from churnshield.db import connect
+from churnshield.dispatch import BACKOFF_SECONDS, MAX_ATTEMPTS, Dispatcher, enqueue, enqueue_campaign
+
+
+class Recorder:
+    """Transport that fails the first ``failures`` sends of every message."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = {}
+        self.sent = []
+
+    async def send(self, channel, rows):
+        errors = []
+        for row in rows:
+            n = self.calls[row['id']] = self.calls.get(row['id'], 0) + 1
+            if n <= self.failures:
+                errors.append(f'attempt {n} failed')
+            else:
+                self.sent.append(row['idempotency_key'])
+                errors.append(None)
+        return errors
+
+
+@pytest.fixture(params=[True, False], ids=['returning', 'select-update'])
+def db(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(dispatch, 'HAS_RETURNING', request.param)
+    monkeypatch.setattr(dispatch, 'POLL_SECONDS', 0.01)
+    return str(tmp_path / 'churn.db')
+
+
+def drain(db_path, transport):
+    dispatcher = Dispatcher({'email': transport, 'sms': transport}, db_path, workers=3,
+                            rate_limits={'email': (1000.0, 50), 'sms': (1000.0, 50)})
+    asyncio.run(asyncio.wait_for(dispatcher.run(drain=True), 30))
+    return dispatcher.stats
+
+
+def rows(db_path):
+    conn = connect(db_path)
+    try:
+        return conn.execute('''SELECT customer_id, template, status, attempts, next_attempt_at, last_error
+                               FROM campaign_queue ORDER BY id''').fetchall()
+    finally:
+        conn.close()
+
+
+def test_enqueue_is_idempotent(db):
+    assert enqueue_campaign('7590-VHVEG', 'HIGH', db_path=db) == 2
+    assert enqueue_campaign('7590-VHVEG', 'HIGH', db_path=db) == 0
+    conn = connect(db)
+    assert enqueue(conn, '7590-VHVEG', 'retention_sms', scope='run-2')
+    assert not enqueue(conn, '7590-VHVEG', 'retention_sms', scope='run-2')
+    conn.close()
+    assert len(rows(db)) == 3
+
+
+def test_every_message_is_sent_once(db):
+    for i in range(40):
+        enqueue_campaign(f'CUST-{i:03d}', 'HIGH' if i % 2 else 'MEDIUM', db_path=db)
+    transport = Recorder()
+    stats = drain(db, transport)
+    assert stats == {'sent': 60, 'retried': 0, 'dead': 0}
+    assert len(set(transport.sent)) == len(transport.sent) == 60
+    assert {status for _, _, status, *_ in rows(db)} == {'sent'}
+
+
+def test_failures_back_off_then_go_dead(db):
+    enqueue_campaign('7590-VHVEG', 'MEDIUM', db_path=db)
+    transport = Recorder(failures=MAX_ATTEMPTS)
+    conn = connect(db)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        before = time.time()
+        drain(db, transport)
+        _, _, status, attempts, next_attempt_at, error = rows(db)[0]
+        assert attempts == attempt
+        assert error == f'attempt {attempt} failed'
+        if attempt < MAX_ATTEMPTS:
+            assert status == 'pending'
+            delay = next_attempt_at - before
+            assert BACKOFF_SECONDS * 2 ** (attempt - 1) <= delay < BACKOFF_SECONDS * 2 ** (attempt - 1) + 5
+            # Make the retry due now instead of waiting out the backoff.
+            conn.execute('UPDATE campaign_queue SET next_attempt_at = 0')
+            conn.commit()
+        else:
+            assert status == 'dead'
+    conn.close()
+    assert transport.sent == []
+
+
+def test_abandoned_claims_are_retried(db):
+    enqueue_campaign('7590-VHVEG', 'MEDIUM', db_path=db)
+    conn = connect(db)
+    conn.execute("UPDATE campaign_queue SET status = 'sending', attempts = 1, claimed_at = ?",
+                 (time.time() - dispatch.CLAIM_TIMEOUT - 1,))
+    conn.commit()
+    conn.close()
+    assert drain(db, Recorder())['sent'] == 1
+    assert rows(db)[0][2:4] == ('sent', 2)
@@ -0,0 +1,99 @@
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from churnshield.calibration import CALIBRATION_PATH, load_calibrator
+from churnshield.executor import ScoringExecutor
+from churnshield.features import DATA_PATH, FEATURES_PATH, MODEL_PATH, load_feature_names, read_reference
+from churnshield.model import contributions, load_booster, predict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def model():
+    model_path = os.path.join(ROOT, MODEL_PATH)
+    feature_names = load_feature_names(os.path.join(ROOT, FEATURES_PATH))
+    _, X, _ = read_reference(os.path.join(ROOT, DATA_PATH), feature_names)
+    calibrator = load_calibrator(os.path.join(ROOT, CALIBRATION_PATH), model_path)
+    return load_booster(model_path), feature_names, calibrator, X[:100]
+
+
+def gated(executor):
+    """Hold the worker inside its next batch until the returned event is set."""
+    release, busy = threading.Event(), threading.Event()
+    compute = executor._compute
+
+    def blocked(*args):
+        busy.set()
+        release.wait(10)
+        return compute(*args)
+
+    executor._compute = blocked
+    return release, busy
+
+
+def test_batched_scores_match_direct_predict(model):
+    booster, feature_names, calibrator, X = model
+    executor = ScoringExecutor(booster, feature_names, calibrator, max_queue=len(X))
+    futures = [executor.submit(x) for x in X]
+    expected = calibrator.apply(predict(booster, X, feature_names))
+    assert [f.result(10) for f in futures] == [(float(p), True) for p in expected]
+    np.testing.assert_allclose(executor.contributions(X[0]), contributions(booster, X[:1], feature_names)[0])
+
+
+def test_identical_requests_coalesce(model):
+    booster, feature_names, calibrator, X = model
+    executor = ScoringExecutor(booster, feature_names, calibrator)
+    release, busy = gated(executor)
+    first = executor.submit(X[0])
+    assert busy.wait(10)
+    futures = [executor.submit(X[1]) for _ in range(5)]
+    assert all(f is futures[0] for f in futures)
+    assert executor.stats['coalesced'] == 4
+    release.set()
+    assert first.result(10)[1] and futures[0].result(10)[1]
+
+
+def test_full_queue_sheds_to_the_approximate_path(model):
+    booster, feature_names, calibrator, X = model
+    executor = ScoringExecutor(booster, feature_names, calibrator, max_queue=1)
+    release, busy = gated(executor)
+    executor.submit(X[0])
+    assert busy.wait(10)
+    queued = executor.submit(X[1])
+    prob, exact = executor.score(X[2])
+    assert not exact and prob == executor.approximate(X[2])
+    assert executor.stats['shed'] == 1
+    release.set()
+    assert queued.result(10)[1]
+
+
+def test_contributions_wait_for_room_and_coalesce_meanwhile(model):
+    booster, feature_names, calibrator, X = model
+    executor = ScoringExecutor(booster, feature_names, calibrator, max_queue=1)
+    release, busy = gated(executor)
+    executor.submit(X[0])
+    assert busy.wait(10)
+    executor.submit(X[1])
+
+    with pytest.raises(queue.Full):
+        executor.submit_contributions(X[2], timeout=0.05)
+    assert not executor.pending.get(('contribs', X[2].tobytes()))
+
+    waiting = []
+    thread = threading.Thread(target=lambda: waiting.append(executor.submit_contributions(X[3])))
+    thread.start()
+    deadline = time.monotonic() + 10
+    while ('contribs', X[3].tobytes()) not in executor.pending and time.monotonic() < deadline:
+        time.sleep(0.001)
+    # Registered while its put is still blocked, so a twin request shares the future.
+    twin = executor.submit_contributions(X[3])
+    release.set()
+    thread.join(10)
+    assert waiting[0] is twin
+    np.testing.assert_allclose(twin.result(10), contributions(booster, X[3:4], feature_names)[0])
@@ -0,0 +1,27 @@
+import os
+
+from churnshield import featurestore, neighbors
+from churnshield.features import DATA_PATH
+from churnshield.neighbors import load_neighbor_index
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_neighbor_index_rebuilds_when_source_changes(tmp_path, monkeypatch):
+    store_dir = str(tmp_path / 'features')
+    monkeypatch.setattr(neighbors, 'load_store', lambda path: featurestore.load_store(path, store_dir))
+    with open(os.path.join(ROOT, DATA_PATH)) as f:
+        lines = f.readlines()
+    data_path = str(tmp_path / 'customers.csv')
+    index_path = str(tmp_path / 'neighbors.npz')
+    with open(data_path, 'w') as f:
+        f.writelines(lines[:301])
+
+    assert len(load_neighbor_index(index_path, data_path).ids) == 300
+    assert len(load_neighbor_index(index_path, data_path).ids) == 300
+
+    with open(data_path, 'a') as f:
+        f.writelines(lines[301:501])
+    index = load_neighbor_index(index_path, data_path)
+    assert len(index.ids) == 500
+    assert set(index.ids) == {line.split(',')[0] for line in lines[1:501]}
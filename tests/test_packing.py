@@ -0,0 +1,73 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from churnshield.db import connect, decode_features, labeled_predictions, migrate, record_outcome, \
+    record_prediction
+from churnshield.features import DATA_PATH, FEATURES_PATH, load_feature_names, read_reference
+from churnshield.packing import decode_many, pack, unpack
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def encoded():
+    feature_names = load_feature_names(os.path.join(ROOT, FEATURES_PATH))
+    _, X, _ = read_reference(os.path.join(ROOT, DATA_PATH), feature_names)
+    return X, feature_names
+
+
+def test_pack_round_trip(encoded):
+    X, feature_names = encoded
+    blobs = pack(X, feature_names)
+    assert {len(b) for b in blobs} == {18}
+    np.testing.assert_array_equal(unpack(blobs, feature_names), X)
+
+
+def test_legacy_json_decodes_like_packed(encoded):
+    X, feature_names = encoded
+    legacy = [json.dumps(dict(zip(feature_names, map(float, x)))) for x in X[:50]]
+    values = legacy[:25] + pack(X[25:50], feature_names)
+    decoded, ok = decode_many(values, feature_names)
+    assert ok.all()
+    np.testing.assert_array_equal(decoded, X[:50])
+
+
+def test_malformed_values_are_skipped(encoded):
+    X, feature_names = encoded
+    good = pack(X[:2], feature_names)
+    bad_version = b'\x09' + good[0][1:]
+    values = [good[0], '[1, 2]', '3', 'null', '"text"', '{not json', None, good[0][:10], bad_version,
+              json.dumps({'tenure': 'abc'}), good[1]]
+    decoded, ok = decode_many(values, feature_names)
+    assert list(np.flatnonzero(ok)) == [0, len(values) - 1]
+    np.testing.assert_array_equal(decoded, X[:2])
+    with pytest.raises(ValueError):
+        decode_features('[1, 2]', feature_names)
+
+
+def test_written_and_migrated_rows_read_back(tmp_path, encoded):
+    X, feature_names = encoded
+    path = str(tmp_path / 'churn.db')
+    conn = connect(path)
+    conn.execute('''CREATE TABLE predictions
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, prediction_data TEXT,
+                     churn_prob REAL, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP, notes TEXT)''')
+    conn.executemany('INSERT INTO predictions (prediction_data, churn_prob) VALUES (?, 0.5)',
+                     [(json.dumps(dict(zip(feature_names, map(float, x)))),) for x in X[:20]])
+    conn.commit()
+    for x in X[20:40]:
+        record_prediction(conn, x, 0.5, feature_names)
+    for pid in range(1, 41):
+        record_outcome(conn, pid, pid % 2)
+    conn.close()
+
+    assert migrate(path, feature_names) == 20
+    conn = connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM predictions WHERE typeof(prediction_data) = 'blob'").fetchone()[0] == 40
+    ids, decoded, _ = labeled_predictions(conn, feature_names)
+    conn.close()
+    assert list(ids) == list(range(1, 41))
+    np.testing.assert_array_equal(decoded, X[:40])
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+
+from churnshield import percentile
+from churnshield.features import MODEL_PATH
+from churnshield.percentile import ScoreDistribution, distribution_path, load_distribution, scoring_version
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL = os.path.join(ROOT, MODEL_PATH)
+
+
+def _saved(directory, scores):
+    version = scoring_version(MODEL)
+    path = distribution_path(version, str(directory))
+    ScoreDistribution(scores, version, path).save(path)
+    return path
+
+
+def test_rank_counts_pending_scores():
+    rng = np.random.default_rng(0)
+    scores = rng.random(500, dtype=np.float32)
+    distribution = ScoreDistribution(scores[:400])
+    for s in scores[400:]:
+        distribution.add(s)
+    for q in (0.0, 0.25, 0.5, float(scores[450]), 1.0):
+        assert distribution.rank(q) == np.mean(scores < np.float32(q))
+
+
+def test_added_scores_survive_reload(tmp_path):
+    path = _saved(tmp_path, [0.1, 0.2, 0.3])
+    load_distribution(model_path=MODEL, directory=str(tmp_path)).add(0.9)
+    reloaded = load_distribution(model_path=MODEL, directory=str(tmp_path))
+    assert len(reloaded) == 4
+    assert reloaded.rank(0.95) == 1.0
+    assert os.path.exists(path + '.pending')
+
+
+def test_merge_folds_pending_log_into_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(percentile, 'MERGE_EVERY', 3)
+    path = _saved(tmp_path, [0.5])
+    distribution = load_distribution(model_path=MODEL, directory=str(tmp_path))
+    for s in (0.3, 0.1, 0.7):
+        distribution.add(s)
+    assert not os.path.exists(path + '.pending')
+    np.testing.assert_array_equal(np.load(path), np.float32([0.1, 0.3, 0.5, 0.7]))
+    assert len(load_distribution(model_path=MODEL, directory=str(tmp_path))) == 4
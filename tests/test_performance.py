@@ -0,0 +1,100 @@
+import numpy as np
+
+from churnshield.db import connect, record_outcome
+from churnshield.performance import PerformanceMonitor
+
+
+def _db(path, scores):
+    conn = connect(str(path))
+    conn.execute('''CREATE TABLE IF NOT EXISTS predictions
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, prediction_data TEXT,
+                     churn_prob REAL, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP, notes TEXT)''')
+    conn.executemany('INSERT INTO predictions (churn_prob) VALUES (?)', [(float(s),) for s in scores])
+    conn.commit()
+    return conn
+
+
+def _reference(scores, labels, window):
+    """A monitor fed each prediction's final label once, in the same arrival order."""
+    monitor = PerformanceMonitor(window=window)
+    for pid in labels:
+        monitor.update(float(scores[pid - 1]), labels[pid])
+    return monitor
+
+
+def test_poll_picks_up_out_of_order_labels(tmp_path):
+    db_path = tmp_path / 'churn.db'
+    conn = _db(db_path, [0.9, 0.8, 0.5, 0.2, 0.1])
+    monitor = PerformanceMonitor(window=100)
+    record_outcome(conn, 5, 0)
+    record_outcome(conn, 3, 1)
+    assert monitor.poll(str(db_path)) == 2
+    # Older predictions labeled after the poll are still new arrivals.
+    record_outcome(conn, 1, 1)
+    record_outcome(conn, 2, 0)
+    assert monitor.poll(str(db_path)) == 2
+    assert monitor.poll(str(db_path)) == 0
+    assert monitor.n == 4
+    conn.close()
+
+
+def test_replaced_labels_are_counted_once_with_the_latest_label(tmp_path):
+    rng = np.random.default_rng(0)
+    scores = rng.random(135)
+    db_path = tmp_path / 'churn.db'
+    conn = _db(db_path, scores)
+    monitor = PerformanceMonitor(window=10)
+    labels = {}
+    for step, pid in enumerate(rng.permutation(135) + 1):
+        pid = int(pid)
+        labels[pid] = int(rng.random() < scores[pid - 1])
+        record_outcome(conn, pid, labels[pid])
+        if step % 7 == 0:
+            monitor.poll(str(db_path))
+    monitor.poll(str(db_path))
+    # 13 windows have closed and the first was dropped.  Flip a label in the
+    # dropped window, a kept one and the open one, and re-send one unchanged.
+    order = list(labels)
+    for pid in (order[0], order[50], order[-2]):
+        labels[pid] = 1 - labels[pid]
+        record_outcome(conn, pid, labels[pid])
+    record_outcome(conn, order[10], labels[order[10]])
+    monitor.poll(str(db_path))
+    conn.close()
+
+    expected = _reference(scores, labels, window=10)
+    assert monitor.n == 135
+    np.testing.assert_array_equal(monitor.total, expected.total)
+    np.testing.assert_array_equal(monitor.current, expected.current)
+    np.testing.assert_array_equal(np.array(monitor.windows), np.array(expected.windows))
+    np.testing.assert_array_equal(monitor.hist, expected.hist)
+    assert monitor.auc() == expected.auc()
+
+
+def test_outcomes_recorded_before_the_log_are_backfilled(tmp_path):
+    db_path = tmp_path / 'churn.db'
+    conn = _db(db_path, [0.9, 0.1])
+    conn.execute('DROP TABLE outcome_log')
+    conn.executemany('INSERT INTO outcomes (prediction_id, churned) VALUES (?, ?)', [(2, 0), (1, 1)])
+    conn.commit()
+    conn.close()
+    connect(str(db_path)).close()
+    monitor = PerformanceMonitor()
+    assert monitor.poll(str(db_path)) == 2
+    assert monitor.n == 2
+
+
+def test_poll_if_due_rate_limits_polls(tmp_path):
+    db_path = tmp_path / 'churn.db'
+    conn = _db(db_path, [0.9, 0.1])
+    monitor = PerformanceMonitor()
+    record_outcome(conn, 1, 1)
+    assert monitor.poll_if_due(str(db_path), interval=60) == 1
+    record_outcome(conn, 2, 0)
+    assert monitor.poll_if_due(str(db_path), interval=60) == 0
+    assert monitor.poll_if_due(str(db_path), interval=0) == 1
+    # A poll already running is not waited for.
+    with monitor.poll_lock:
+        assert monitor.poll_if_due(str(db_path), interval=0) == 0
+    conn.close()
+    assert monitor.n == 2
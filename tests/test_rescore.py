@@ -0,0 +1,51 @@
+import os
+
+import pandas as pd
+import pytest
+
+from churnshield.features import DATA_PATH
+from churnshield.rescore import load_snapshot, rescore, snapshot_path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def extract(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    df = pd.read_csv(DATA_PATH, nrows=200, dtype=str, keep_default_na=False)
+    path = str(tmp_path / 'extract.csv')
+    df.to_csv(path, index=False)
+    dirs = {'store_dir': str(tmp_path / 'features'), 'directory': str(tmp_path / 'scores')}
+    return df, path, dirs
+
+
+def test_only_feature_changes_are_rescored(extract):
+    df, path, dirs = extract
+    _, _, stats = rescore(path, **dirs)
+    assert stats['full'] and stats['scored'] == 200
+
+    df.loc[3, 'Churn'] = 'No' if df.loc[3, 'Churn'] == 'Yes' else 'Yes'
+    df.to_csv(path, index=False)
+    _, _, stats = rescore(path, **dirs)
+    assert (stats['full'], stats['scored'], stats['encoded']) == (False, 0, 0)
+
+    df.loc[5, 'tenure'] = str(int(df.loc[5, 'tenure']) + 1)
+    df.to_csv(path, index=False)
+    snapshot, changed, stats = rescore(path, **dirs)
+    assert stats['scored'] == 1
+    assert list(snapshot.ids[changed].astype(str)) == [df.loc[5, 'customerID']]
+    assert len(load_snapshot('previous', dirs['directory'])) == 200
+
+
+def test_interrupted_rotation_is_finished_by_the_next_run(extract):
+    _, path, dirs = extract
+    first, _, _ = rescore(path, **dirs)
+    # A run that wrote next/ and moved current/ aside, then died.
+    first.save(snapshot_path('next', dirs['directory']))
+    os.replace(snapshot_path('current', dirs['directory']), snapshot_path('previous', dirs['directory']))
+    assert load_snapshot('current', dirs['directory']) is None
+
+    _, _, stats = rescore(path, **dirs)
+    assert not stats['full'] and stats['scored'] == 0
+    assert not os.path.exists(snapshot_path('next', dirs['directory']))
+    assert len(load_snapshot('previous', dirs['directory'])) == 200
@@ -0,0 +1,54 @@
+import os
+
+import pandas as pd
+import pytest
+
+from churnshield.db import connect, encode_features, labeled_predictions, record_outcome
+from churnshield.features import DATA_PATH, encode_frame, load_feature_names
+from churnshield.scheduler import signals
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # signals() reads the model, features and drift reference from their default paths.
+    monkeypatch.chdir(ROOT)
+    feature_names = load_feature_names()
+    df = pd.read_csv(DATA_PATH, nrows=60)
+    # Like the app's sidebar, which never collects MultipleLines.
+    df['MultipleLines'] = None
+    X = encode_frame(df, feature_names)
+    path = str(tmp_path / 'churn.db')
+    conn = connect(path)
+    conn.execute('''CREATE TABLE predictions
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, prediction_data TEXT,
+                     churn_prob REAL, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP, notes TEXT)''')
+    conn.executemany('INSERT INTO predictions (prediction_data, churn_prob) VALUES (?, 0.5)',
+                     [(encode_features(x, feature_names),) for x in X])
+    conn.commit()
+    yield conn, path, feature_names
+    conn.close()
+
+
+def test_new_labels_follow_arrival_order(db):
+    conn, path, feature_names = db
+    for pid in range(30, 61):
+        record_outcome(conn, pid, pid % 2)
+    conn.execute("INSERT INTO retrain_jobs (reason, since_id, last_id, status) VALUES ('test', 0, 31, 'done')")
+    conn.commit()
+    # Labels for older predictions, and a relabel, arrive after the job.
+    for pid in range(1, 11):
+        record_outcome(conn, pid, 1)
+    record_outcome(conn, 45, 0)
+
+    state = signals(conn, path)
+    assert (state['since_id'], state['last_id'], state['new_labels']) == (31, 42, 11)
+    ids, _, y = labeled_predictions(conn, feature_names, 31)
+    assert list(ids) == list(range(1, 11)) + [45]
+    assert y[-1] == 0
+
+
+def test_drift_ignores_fields_the_app_does_not_collect(db):
+    conn, path, _ = db
+    assert not [name for name in signals(conn, path)['drift_alerts'] if name.startswith('MultipleLines')]
@@ -0,0 +1,31 @@
+import os
+
+import numpy as np
+
+from churnshield.batch import score_matrix
+from churnshield.calibration import CALIBRATION_PATH, load_calibrator
+from churnshield.features import DATA_PATH, FEATURES_PATH, MODEL_PATH, load_feature_names, read_reference
+from churnshield.model import load_booster
+from churnshield.scoring import BANDS, band_codes, risk_band
+from churnshield.thresholds import THRESHOLDS_PATH, load_thresholds
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_cutoff_itself_falls_in_the_lower_band():
+    assert risk_band(0.7) == 'MEDIUM'
+    assert risk_band(0.4) == 'LOW'
+    assert list(BANDS[band_codes([0.4, 0.40001, 0.7, 0.70001])]) == ['LOW', 'MEDIUM', 'MEDIUM', 'HIGH']
+
+
+def test_band_codes_match_risk_band_at_served_cutoffs():
+    model_path = os.path.join(ROOT, MODEL_PATH)
+    feature_names = load_feature_names(os.path.join(ROOT, FEATURES_PATH))
+    _, X, _ = read_reference(os.path.join(ROOT, DATA_PATH), feature_names)
+    calibrator = load_calibrator(os.path.join(ROOT, CALIBRATION_PATH), model_path)
+    probs, _ = score_matrix(load_booster(model_path), X, feature_names, calibrator=calibrator)
+    high, medium = load_thresholds(os.path.join(ROOT, THRESHOLDS_PATH), model_path)
+    # Include scores sitting exactly on each cutoff.
+    probs = np.concatenate([probs, np.float32([high, medium])])
+    expected = [risk_band(p, high, medium) for p in probs]
+    assert list(BANDS[band_codes(probs, high, medium)]) == expected
@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from churnshield.batch import score_matrix
+from churnshield.calibration import CALIBRATION_PATH, load_calibrator
+from churnshield.features import DATA_PATH, FEATURES_PATH, MODEL_PATH, encode_frame, load_feature_names
+from churnshield.model import load_booster
+from churnshield.sharded import score_file_sharded
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL = os.path.join(ROOT, MODEL_PATH)
+FEATURES = os.path.join(ROOT, FEATURES_PATH)
+
+
+def _batch_scores(path):
+    feature_names = load_feature_names(FEATURES)
+    X = encode_frame(pd.read_csv(path), feature_names)
+    calibrator = load_calibrator(os.path.join(ROOT, CALIBRATION_PATH), MODEL)
+    probs, _ = score_matrix(load_booster(MODEL), X, feature_names, calibrator=calibrator)
+    return probs
+
+
+def test_sharded_matches_batch_with_blank_lines(tmp_path):
+    with open(os.path.join(ROOT, DATA_PATH), 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    # Blank and whitespace-only lines mid-file and at the end are skipped by
+    # pandas, so they must not be counted as rows either.
+    lines[100:100] = [b'\n', b'  \r\n']
+    path = tmp_path / 'customers.csv'
+    path.write_bytes(b''.join(lines) + b'\n\n')
+
+    probs, stats = score_file_sharded(str(path), workers=2, model_path=MODEL, features_path=FEATURES,
+                                      shard_bytes=64 * 1024)
+    expected = _batch_scores(path)
+    assert stats['shards'] > 2
+    assert stats['rows'] == len(expected) == len(lines) - 3
+    np.testing.assert_allclose(probs, expected, rtol=0, atol=1e-6)
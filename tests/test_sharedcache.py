@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from churnshield import sharedcache
+from churnshield.sharedcache import TOUCH_SECONDS, SharedCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sharedcache, 'time', clock)
+    return clock
+
+
+def vec(i):
+    return np.full(40, i, dtype=np.float32)
+
+
+def test_values_round_trip_per_version(tmp_path, clock):
+    cache = SharedCache(str(tmp_path / 'cache.db'))
+    cache.put_probability('v1', vec(1), 0.25)
+    cache.put_attributions('v1', vec(1), np.arange(41))
+    assert cache.get_probability('v1', vec(1)) == 0.25
+    np.testing.assert_array_equal(cache.get_attributions('v1', vec(1)), np.arange(41, dtype=np.float32))
+    assert cache.get_probability('v2', vec(1)) is None
+    assert cache.get_probability('v1', vec(2)) is None
+    # Another process opening the same file sees the entries.
+    assert SharedCache(str(tmp_path / 'cache.db')).get_probability('v1', vec(1)) == 0.25
+
+
+def test_expired_entries_are_never_returned_and_are_evicted(tmp_path, clock):
+    cache = SharedCache(str(tmp_path / 'cache.db'), ttl=100)
+    cache.put_probability('v', vec(1), 0.5)
+    clock.now += 99
+    cache.put_probability('v', vec(2), 0.5)
+    assert cache.get_probability('v', vec(1)) == 0.5
+    clock.now += 2
+    assert cache.get_probability('v', vec(1)) is None
+    assert cache.get_probability('v', vec(2)) == 0.5
+    assert cache.evict() == 1
+    assert cache.size() == 1
+
+
+def test_eviction_drops_least_recently_used(tmp_path, clock):
+    cache = SharedCache(str(tmp_path / 'cache.db'), max_entries=3)
+    for i in range(4):
+        cache.put_probability('v', vec(i), i / 10)
+        clock.now += TOUCH_SECONDS + 1
+    # A read refreshes an entry's access time once it is TOUCH_SECONDS stale,
+    # but not again straight away.
+    assert cache.get_probability('v', vec(0)) == 0.0
+    touched = clock.now
+    clock.now += 1
+    cache.get_probability('v', vec(0))
+    key = sharedcache.cache_key('prob:v', vec(0))
+    assert cache._conn().execute('SELECT accessed_at FROM cache WHERE key = ?', (key,)).fetchone()[0] == touched
+
+    assert cache.evict() == 1
+    assert cache.get_probability('v', vec(0)) == 0.0
+    assert cache.get_probability('v', vec(1)) is None
+    assert cache.size() == 3
+
+
+def test_puts_trigger_eviction(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(sharedcache, 'EVICT_EVERY', 5)
+    cache = SharedCache(str(tmp_path / 'cache.db'), max_entries=2)
+    for i in range(10):
+        clock.now += 1
+        cache.put_probability('v', vec(i), 0.5)
+    assert cache.size() == 2
+    assert cache.stats['evicted'] == 3 + 5
+    assert cache.get_probability('v', vec(9)) == 0.5
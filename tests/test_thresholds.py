@@ -0,0 +1,48 @@
+import numpy as np
+
+from churnshield.scoring import BANDS, band_codes
+from churnshield.thresholds import curves, optimize
+
+COSTS = {'high_cost': 100.0, 'high_save': 0.35, 'medium_cost': 20.0, 'medium_save': 0.15}
+
+
+def _sample(n, seed):
+    rng = np.random.default_rng(seed)
+    # Rounded scores so many customers tie on a cutoff.
+    scores = np.round(rng.random(n), 2).astype(np.float32)
+    y = (rng.random(n) < scores).astype(np.int8)
+    values = rng.uniform(100, 1500, n)
+    return y, scores, values
+
+
+def _value(y, scores, values, high, medium):
+    """Expected retention value of the bands ``band_codes`` assigns at these cutoffs."""
+    band = BANDS[band_codes(scores, high, medium)]
+    churned = values * y
+    value = 0.0
+    for name, cost, save in (('HIGH', COSTS['high_cost'], COSTS['high_save']),
+                             ('MEDIUM', COSTS['medium_cost'], COSTS['medium_save'])):
+        flagged = band == name
+        value += save * churned[flagged].sum() - cost * flagged.sum()
+    return value
+
+
+def test_optimize_matches_brute_force():
+    for seed in range(5):
+        y, scores, values = _sample(300, seed)
+        result, _ = optimize(y, scores, values, **COSTS)
+        cutoffs = [1.0] + [float(np.nextafter(s, np.float32(-1))) for s in np.unique(scores)[::-1]]
+        best = max(_value(y, scores, values, h, m)
+                   for a, h in enumerate(cutoffs) for m in cutoffs[a:])
+        assert np.isclose(result['expected_value'], best)
+        # The returned cutoffs, applied the way the app bands scores, realise that value.
+        assert np.isclose(_value(y, scores, values, result['high'], result['medium']), best)
+        assert result['high'] >= result['medium']
+
+
+def test_curves_auc_matches_pairwise_count():
+    y, scores, _ = _sample(400, 7)
+    pos, neg = scores[y == 1], scores[y == 0]
+    diff = pos[:, None] - neg[None, :]
+    expected = ((diff > 0).sum() + 0.5 * (diff == 0).sum()) / diff.size
+    assert np.isclose(curves(y, scores)['auc'], expected)
@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pytest
+import xgboost as xgb
+
+from churnshield.features import MODEL_PATH
+from churnshield.model import load_booster
+from churnshield.updater import training_params, warm_start
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_training_params_of_the_served_model():
+    params = training_params(load_booster(os.path.join(ROOT, MODEL_PATH)))
+    assert params['objective'] == 'binary:logistic'
+    assert isinstance(params['max_depth'], int)
+
+
+@pytest.mark.parametrize('tree_method', ['exact', 'hist', 'approx'])
+def test_training_params_for_each_tree_method(tree_method):
+    rng = np.random.default_rng(0)
+    names = ['a', 'b', 'c']
+    X, y = rng.random((200, 3)), rng.integers(0, 2, 200)
+    dtrain = xgb.DMatrix(X, label=y, feature_names=names)
+    booster = xgb.train({'tree_method': tree_method, 'eta': 0.05, 'max_depth': 3,
+                         'objective': 'binary:logistic'}, dtrain, 5)
+
+    params = training_params(booster)
+    assert params['tree_method'] == tree_method
+    assert params['eta'] == pytest.approx(0.05)
+    assert params['max_depth'] == 3
+
+    updated = warm_start(booster, X, y, names, trees=2)
+    assert updated.num_boosted_rounds() == 7
+    assert booster.num_boosted_rounds() == 5
@@ -0,0 +1,81 @@
+import gzip
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from churnshield.writer import ScoredWriter
+
+
+def _chunks(n=5, size=100):
+    return [pd.DataFrame({'customerID': [f'C{i}-{j}' for j in range(size)],
+                          'churn_prob': np.linspace(0, 1, size, dtype=np.float32) + i,
+                          'risk_level': 'LOW'}) for i in range(n)]
+
+
+@pytest.mark.parametrize('suffix', ['csv', 'csv.gz', 'parquet'])
+def test_chunks_are_written_in_order(tmp_path, suffix):
+    if suffix == 'parquet':
+        pytest.importorskip('pyarrow')
+    path = str(tmp_path / f'scored.{suffix}')
+    chunks = _chunks()
+    with ScoredWriter(path) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    # Everything is on disk once the context exits.
+    result = pd.read_parquet(path) if suffix == 'parquet' else pd.read_csv(path)
+    expected = pd.concat(chunks, ignore_index=True)
+    assert writer.rows == len(expected)
+    assert list(result['customerID']) == list(expected['customerID'])
+    np.testing.assert_allclose(result['churn_prob'], expected['churn_prob'], rtol=1e-6)
+
+
+def test_csv_header_written_once(tmp_path):
+    path = str(tmp_path / 'scored.csv.gz')
+    with ScoredWriter(path) as writer:
+        for chunk in _chunks(3, 2):
+            writer.write(chunk)
+    with gzip.open(path, 'rt') as f:
+        lines = f.read().splitlines()
+    assert lines[0] == 'customerID,churn_prob,risk_level'
+    assert len(lines) == 1 + 3 * 2
+
+
+def test_write_blocks_while_writer_is_behind(tmp_path):
+    writer = ScoredWriter(str(tmp_path / 'scored.csv'), max_pending=1)
+    gate = threading.Event()
+    original = writer._append
+
+    def slow_append(sink, chunk):
+        gate.wait()
+        original(sink, chunk)
+
+    writer._append = slow_append
+    chunks = _chunks(4, 10)
+    done = threading.Event()
+
+    def produce():
+        for chunk in chunks:
+            writer.write(chunk)
+        done.set()
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    assert not done.wait(0.2)
+    gate.set()
+    producer.join(5)
+    writer.close()
+    assert done.is_set() and writer.rows == 40
+
+
+def test_writer_errors_reach_the_producer(tmp_path):
+    writer = ScoredWriter(str(tmp_path / 'missing-dir' / 'scored.csv'))
+    writer.write(_chunks(1, 5)[0])
+    with pytest.raises(OSError):
+        writer.close()
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ScoredWriter(str(tmp_path / 'scored.xlsx'))